@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import deque
+
+from anomaly import AnomalyDetector
+
+DEFAULT_LIMITS = {"V_LOW": 90.0, "V_HIGH": 260.0, "I_WARN": 10.0, "I_CUTOFF": 15.0}
+
+# Limites por cômodo (mesclados com "default" e DEFAULT_LIMITS)
+ROOM_LIMITS = {
+    "default": {"V_LOW": 90.0, "V_HIGH": 260.0, "I_WARN": 10.0, "I_CUTOFF": 15.0},
+    "cozinha": {"I_WARN": 13.0, "I_CUTOFF": 18.0},
+    "banheiro": {"I_WARN": 14.0, "I_CUTOFF": 20.0},
+    "area_servico": {"I_WARN": 12.0, "I_CUTOFF": 17.0},
+    "sala": {"I_WARN": 8.0, "I_CUTOFF": 12.0},
+    "quarto": {"I_WARN": 7.0, "I_CUTOFF": 10.0},
+}
+
+
+class RoomLimits:
+    """Limites de um cômodo já mesclados com o "default" e com os pontos de retorno (histerese)."""
+
+    __slots__ = ("v_low", "v_low_clear", "v_high", "v_high_clear",
+                 "i_warn", "i_warn_clear", "i_cutoff", "i_cutoff_clear")
+
+    def __init__(self, limits: dict, v_hyst: float, i_hyst: float):
+        self.v_low = float(limits["V_LOW"])
+        self.v_high = float(limits["V_HIGH"])
+        self.i_warn = float(limits["I_WARN"])
+        self.i_cutoff = float(limits["I_CUTOFF"])
+        self.v_low_clear = self.v_low * (1 + v_hyst)
+        self.v_high_clear = self.v_high * (1 - v_hyst)
+        self.i_warn_clear = self.i_warn * (1 - i_hyst)
+        self.i_cutoff_clear = self.i_cutoff * (1 - i_hyst)
+
+
+class _RoomState:
+    __slots__ = ("active", "last_fired")
+
+    def __init__(self):
+        self.active = {}        # regra -> bool
+        self.last_fired = {}    # regra -> ts
+
+
+class AlertEvent:
+    __slots__ = ("rule", "level", "message", "guidance", "cutoff")
+
+    def __init__(self, rule, level, message, guidance, cutoff=False):
+        self.rule = rule
+        self.level = level
+        self.message = message
+        self.guidance = guidance
+        self.cutoff = cutoff
+
+
+class AlertEngine:
+    """
+    Avaliação de alertas em O(1) por leitura.
+
+    - Limites compilados uma vez por cômodo (RoomLimits) e invalidados com reload().
+    - Cada regra só dispara ao entrar na condição e só é rearmada depois de voltar
+      além do ponto de histerese. Enquanto continua ativa, é repetida no máximo
+      a cada `cooldown_s` (essas repetições são agrupadas no log de avisos).
+    - O corte por sobrecorrente (cutoff=True) só é pedido na transição para ativo.
+    - Picos e derivas de consumo vêm do AnomalyDetector (EWMA + CUSUM por circuito).
+    """
+
+    def __init__(self, room_limits: dict, detector: AnomalyDetector | None = None,
+                 v_hyst: float = 0.02, i_hyst: float = 0.05, cooldown_s: float = 60.0):
+        self.room_limits = room_limits
+        self.detector = detector if detector is not None else AnomalyDetector()
+        self.v_hyst = v_hyst
+        self.i_hyst = i_hyst
+        self.cooldown_s = cooldown_s
+        self._limits = {}
+        self._state = {}
+
+    def reload(self, room_limits: dict | None = None):
+        if room_limits is not None:
+            self.room_limits = room_limits
+        self._limits = {}
+
+    def limits(self, room: str) -> RoomLimits:
+        lim = self._limits.get(room)
+        if lim is None:
+            merged = dict(DEFAULT_LIMITS)
+            merged.update(self.room_limits.get("default", {}))
+            merged.update(self.room_limits.get(room, {}))
+            lim = self._limits[room] = RoomLimits(merged, self.v_hyst, self.i_hyst)
+        return lim
+
+    def _fire(self, st, rule, on, clear, ts, events, make):
+        """Regra com histerese: `on` entra na condição, `clear` sai dela."""
+        active = st.active.get(rule, False)
+        if not active:
+            if on:
+                st.active[rule] = True
+                st.last_fired[rule] = ts
+                events.append(make(True))
+        elif clear:
+            st.active[rule] = False
+        elif ts - st.last_fired.get(rule, 0.0) >= self.cooldown_s:
+            st.last_fired[rule] = ts
+            events.append(make(False))
+
+    def evaluate(self, room: str, v: float, i: float, p: float, ts: float | None = None) -> list:
+        ts = time.time() if ts is None else ts
+        lim = self.limits(room)
+        st = self._state.get(room)
+        if st is None:
+            st = self._state[room] = _RoomState()
+        events = []
+        name = room.title()
+
+        self._fire(st, "v_low", v < lim.v_low, v >= lim.v_low_clear, ts, events, lambda first: AlertEvent(
+            "v_low", "AVISO", f"{name}: Subtensão detectada ({v:.1f} V).",
+            "Evite ligar aparelhos sensíveis. Se persistir, contate a concessionária."))
+        self._fire(st, "v_high", v > lim.v_high, v <= lim.v_high_clear, ts, events, lambda first: AlertEvent(
+            "v_high", "AVISO", f"{name}: Sobretensão detectada ({v:.1f} V).",
+            "Desconecte equipamentos sensíveis. Se continuar, acione a concessionária."))
+
+        self._fire(st, "i_cutoff", i > lim.i_cutoff, i <= lim.i_cutoff_clear, ts, events, lambda first: AlertEvent(
+            "i_cutoff", "CRITICO", f"{name}: Corrente crítica {i:.1f} A. Relé DESLIGADO por segurança.",
+            "Verifique curto-circuito/aquecimento. Religando só após inspeção.", cutoff=first))
+        if not st.active.get("i_cutoff"):
+            self._fire(st, "i_warn", i > lim.i_warn, i <= lim.i_warn_clear, ts, events, lambda first: AlertEvent(
+                "i_warn", "ALERTA", f"{name}: Corrente elevada {i:.1f} A.",
+                "Evite ligar mais aparelhos nesse circuito."))
+
+        a = self.detector.update(room, p, ts)
+        if a is not None:
+            self._fire(st, "spike", a.spike, not a.spike, ts, events, lambda first: AlertEvent(
+                "spike", "AVISO", f"{name}: Consumo elevado agora ({p:.0f} W, recente ~{a.recent:.0f} W).",
+                "Se foi você que ligou algo de alto consumo, ok. Caso contrário, investigue."))
+            self._fire(st, "drift", a.cusum > a.limit, a.cusum <= a.limit / 2, ts, events, lambda first: AlertEvent(
+                "drift", "AVISO",
+                f"{name}: Consumo acima do habitual (média recente {a.recent:.0f} W, habitual ~{a.expected:.0f} W).",
+                "Verifique aparelhos esquecidos ligados ou com defeito (ex.: geladeira sem parar de funcionar)."))
+        return events
+
+
+class AlertEntry:
+    __slots__ = ("id", "key", "level", "message", "guidance", "first_ts", "last_ts", "count")
+
+    def __init__(self, id_, key, level, message, guidance, ts):
+        self.id = id_
+        self.key = key
+        self.level = level
+        self.message = message
+        self.guidance = guidance
+        self.first_ts = self.last_ts = ts
+        self.count = 1
+
+    def render(self) -> str:
+        hhmmss = time.strftime("%H:%M:%S", time.localtime(self.first_ts))
+        line = f"[{hhmmss}] {self.level}: {self.message}"
+        if self.count > 1:
+            last = time.strftime("%H:%M:%S", time.localtime(self.last_ts))
+            line += f"  (x{self.count}, último às {last})"
+        line += "\n"
+        if self.guidance:
+            line += f"   ➜ Orientação: {self.guidance}\n"
+        return line
+
+
+class AlertLog:
+    """
+    Log de avisos limitado (anel de `maxlen` entradas).
+
+    Avisos com a mesma chave dentro de `coalesce_s` viram uma única entrada com
+    contador, em vez de uma linha nova. add() devolve (entrada, nova?).
+    """
+
+    def __init__(self, maxlen: int = 500, coalesce_s: float = 300.0):
+        self.maxlen = maxlen
+        self.coalesce_s = coalesce_s
+        self.entries = deque(maxlen=maxlen)
+        self._by_key = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, level: str, message: str, guidance: str | None = None, key=None,
+            ts: float | None = None) -> tuple[AlertEntry, bool]:
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if key is not None:
+                e = self._by_key.get(key)
+                if e is not None and ts - e.last_ts <= self.coalesce_s:
+                    e.count += 1
+                    e.last_ts = ts
+                    e.message = message
+                    return e, False
+            self._next_id += 1
+            e = AlertEntry(self._next_id, key, level, message, guidance, ts)
+            if len(self.entries) == self.maxlen:
+                old = self.entries[0]
+                if old.key is not None and self._by_key.get(old.key) is old:
+                    del self._by_key[old.key]
+            self.entries.append(e)
+            if key is not None:
+                self._by_key[key] = e
+            return e, True
@@ -0,0 +1,236 @@
+"""
+Detecção de anomalias de consumo por circuito, incremental (O(1) por amostra).
+
+Cada circuito guarda só alguns números, independente do tamanho do buffer:
+- linha de base: média e variância móveis exponenciais (EWMA) da potência, com
+  constante de tempo longa em segundos (não depende da taxa de amostragem);
+- média de curto prazo (EWMA rápida), que alisa o liga/desliga de geladeira e afins;
+- CUSUM: energia (Wh) acumulada enquanto a média curta fica acima da linha de base
+  mais uma folga. Pega subidas lentas e sustentadas que um limite instantâneo não vê.
+
+Pico = amostra `z_spike` desvios-padrão (e pelo menos `min_w`) acima da média curta.
+Como a variância aprende os ciclos normais do circuito, eles deixam de disparar.
+Os desvios entram nas médias limitados a `z_spike` sigmas, para um pico isolado não
+inflar a variância nem virar deriva.
+
+Com perfil por hora do dia (aprendido do histórico, `learn_time_of_day`), o detector
+trabalha sobre o resíduo potência - perfil[hora]: o aumento de todo fim de tarde
+deixa de ser deriva.
+
+O estado é um dict simples (`state`, `snapshot`) e pode ser gravado/recarregado em
+JSON (`save`/`load`) para sobreviver a reinícios sem novo aquecimento.
+"""
+import json
+import math
+import os
+import time
+
+from metrics import ConsoleLog
+
+CHECKPOINT_VERSION = 1
+
+
+class AnomalyScore:
+    __slots__ = ("expected", "recent", "sigma", "z", "spike", "cusum", "limit")
+
+    def __init__(self, expected, recent, sigma, z, spike, cusum, limit):
+        self.expected = expected    # W da linha de base (perfil + média do resíduo)
+        self.recent = recent        # W, média de curto prazo (antes desta amostra)
+        self.sigma = sigma          # W
+        self.z = z                  # desvios-padrão desta amostra acima da linha de base
+        self.spike = spike          # pico nesta amostra
+        self.cusum = cusum          # Wh acumulados acima da linha de base + folga
+        self.limit = limit          # Wh; cusum > limit = deriva
+
+
+class _Baseline:
+    __slots__ = ("n", "last_ts", "mean", "fast", "var", "cusum", "tod", "tod_next", "slot", "slot_start",
+                 "slot_end")
+
+    def __init__(self):
+        self.n = 0
+        self.last_ts = None
+        self.mean = 0.0         # linha de base do resíduo (W)
+        self.fast = 0.0         # média de curto prazo do resíduo (W)
+        self.var = 0.0          # variância do resíduo (W²)
+        self.cusum = 0.0        # Wh
+        self.tod = None         # 24 médias por hora do dia (W) ou None
+        self.tod_next = None    # último perfil aprendido; o worker o aplica se for outro objeto
+        self.slot = 0
+        self.slot_start = self.slot_end = 0.0
+
+    def profile(self, ts: float) -> float:
+        if self.tod is None:
+            return 0.0
+        if not self.slot_start <= ts < self.slot_end:
+            lt = time.localtime(ts)
+            self.slot = lt.tm_hour
+            self.slot_start = ts - lt.tm_min * 60 - lt.tm_sec - (ts % 1.0)
+            self.slot_end = self.slot_start + 3600.0
+        return self.tod[self.slot]
+
+
+class AnomalyDetector:
+    """
+    - tau_s / tau_fast_s: constantes de tempo (s) da linha de base e da média curta.
+    - warmup: amostras antes de começar a avaliar.
+    - z_spike, min_w: pico = potência > média curta + max(z_spike * sigma, min_w).
+    - drift_min_w, cusum_k: folga da deriva = max(drift_min_w, cusum_k * sigma).
+    - cusum_wh: energia acima da folga que caracteriza deriva.
+    - min_sigma_w: piso do desvio-padrão (circuito parado tem variância ~0).
+    - max_gap_s: intervalos maiores (ESP32 desligado, broker fora) contam só até aqui no CUSUM.
+    """
+
+    PARAMS = ("tau_s", "tau_fast_s", "warmup", "z_spike", "min_w", "drift_min_w", "cusum_k", "cusum_wh",
+              "min_sigma_w", "max_gap_s")
+
+    def __init__(self, tau_s: float = 21600.0, tau_fast_s: float = 600.0, warmup: int = 30,
+                 z_spike: float = 4.0, min_w: float = 200.0, drift_min_w: float = 100.0, cusum_k: float = 0.5,
+                 cusum_wh: float = 50.0, min_sigma_w: float = 20.0, max_gap_s: float = 60.0,
+                 log=None):
+        self.tau_s = tau_s
+        self.tau_fast_s = tau_fast_s
+        self.warmup = warmup
+        self.z_spike = z_spike
+        self.min_w = min_w
+        self.drift_min_w = drift_min_w
+        self.cusum_k = cusum_k
+        self.cusum_wh = cusum_wh
+        self.min_sigma_w = min_sigma_w
+        self.max_gap_s = max_gap_s
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+        self._state = {}
+
+    def _get(self, circuit) -> _Baseline:
+        st = self._state.get(circuit)
+        if st is None:
+            st = self._state.setdefault(circuit, _Baseline())   # worker e thread de perfil
+        return st
+
+    # ------------------------- caminho quente ------------------------
+    def update(self, circuit: str, p: float, ts: float) -> AnomalyScore | None:
+        """Atualiza o estado com uma amostra. Devolve None durante o aquecimento."""
+        st = self._get(circuit)
+        if st.tod_next is not st.tod:
+            self._apply_profile(st)
+        base = st.profile(ts)
+        r = p - base
+        if st.last_ts is None:
+            st.n, st.last_ts, st.mean, st.fast, st.var = 1, ts, r, r, 0.0
+            return None
+        dt = ts - st.last_ts
+        if dt <= 0:
+            dt = 0.0
+        else:
+            st.last_ts = ts
+        st.n += 1
+        a = 1.0 - math.exp(-dt / self.tau_s)
+        af = 1.0 - math.exp(-dt / self.tau_fast_s)
+
+        sigma = max(math.sqrt(st.var), self.min_sigma_w)
+        recent = base + st.fast
+        d = r - st.mean
+        z = d / sigma
+        warm = st.n > self.warmup
+        if warm:
+            # desvio limitado: um pico isolado não desloca as médias nem infla a variância
+            lim = self.z_spike * sigma
+            d = min(max(d, -lim), lim)
+        else:
+            a = max(a, 1.0 / st.n)
+            af = max(af, 1.0 / st.n)
+        st.fast += af * (st.mean + d - st.fast)
+        st.mean += a * d
+        st.var = (1.0 - a) * (st.var + a * d * d)
+        if not warm:
+            return None
+
+        slack = max(self.drift_min_w, self.cusum_k * sigma)
+        excess = st.fast - st.mean - slack
+        st.cusum = max(0.0, st.cusum + excess * min(dt, self.max_gap_s) / 3600.0)
+        # pico é salto em relação ao nível recente; subida lenta fica para o CUSUM
+        spike = p > recent + max(self.z_spike * sigma, self.min_w)
+        return AnomalyScore(base + st.mean, recent, sigma, z, spike, st.cusum, self.cusum_wh)
+
+    # ------------------------- perfil por hora ------------------------
+    def learn_time_of_day(self, circuit: str, rows, min_days: int = 3) -> bool:
+        """
+        rows: agregações de 1 h do histórico [(bucket, n, ..., p_mean, ...)] no formato
+        de storage.ROLLUP_FIELDS. Só aceita o perfil se toda hora do dia tiver pelo menos
+        `min_days` amostras. Devolve True se o perfil foi aceito.
+
+        Roda fora do worker do circuito: o perfil só é publicado em tod_next, e o próprio
+        worker o aplica (e ajusta as médias) na próxima amostra, sem disputar o estado.
+        """
+        from storage import ROLLUP_FIELDS
+        i_bucket, i_pmean = ROLLUP_FIELDS.index("bucket"), ROLLUP_FIELDS.index("p_mean")
+        sums, counts = [0.0] * 24, [0] * 24
+        for row in rows:
+            if row[i_pmean] is None:
+                continue
+            h = time.localtime(row[i_bucket]).tm_hour
+            sums[h] += row[i_pmean]
+            counts[h] += 1
+        if min(counts) < min_days:
+            return False
+        self._get(circuit).tod_next = [s / c for s, c in zip(sums, counts)]
+        return True
+
+    @staticmethod
+    def _apply_profile(st: _Baseline):
+        # no worker do circuito, antes de usar o perfil
+        old = 0.0 if st.last_ts is None else st.profile(st.last_ts)
+        st.tod = st.tod_next
+        st.slot_start = st.slot_end = 0.0
+        if st.last_ts is not None:
+            # mantém as médias do resíduo coerentes com o perfil novo
+            shift = old - st.profile(st.last_ts)
+            st.mean += shift
+            st.fast += shift
+
+    # ------------------------- inspeção / checkpoint ------------------------
+    def params(self) -> dict:
+        return {name: getattr(self, name) for name in self.PARAMS}
+
+    def state(self, circuit: str) -> dict | None:
+        st = self._state.get(circuit)
+        if st is None:
+            return None
+        sigma = max(math.sqrt(st.var), self.min_sigma_w)
+        return {"n": st.n, "last_ts": st.last_ts, "mean": st.mean, "fast": st.fast, "var": st.var,
+                "cusum": st.cusum, "tod": st.tod, "sigma": sigma, "warm": st.n > self.warmup,
+                "spike_margin_w": max(self.z_spike * sigma, self.min_w),
+                "drift_slack_w": max(self.drift_min_w, self.cusum_k * sigma)}
+
+    def snapshot(self) -> dict:
+        return {"version": CHECKPOINT_VERSION, "params": self.params(),
+                "circuits": {name: self.state(name) for name in list(self._state)}}
+
+    def restore(self, data: dict) -> int:
+        """Recarrega o estado de snapshot(); os parâmetros atuais são mantidos. Devolve nº de circuitos."""
+        if data.get("version") != CHECKPOINT_VERSION:
+            return 0
+        for name, s in data.get("circuits", {}).items():
+            st = self._get(name)
+            st.n, st.last_ts = int(s["n"]), s["last_ts"]
+            st.mean, st.fast = float(s["mean"]), float(s["fast"])
+            st.var, st.cusum = float(s["var"]), float(s["cusum"])
+            st.tod = st.tod_next = s.get("tod")
+            st.slot_start = st.slot_end = 0.0
+        return len(data.get("circuits", {}))
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> int:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return self.restore(json.load(f))
+        except FileNotFoundError:
+            return 0
+        except (ValueError, KeyError, TypeError) as e:
+            self.log(f"[ANOMALIA] Checkpoint ignorado ({path}): {e}", key="anomaly")
+            return 0
@@ -0,0 +1,417 @@
+"""
+API HTTP + WebSocket para painéis remotos (celular, navegador), só leitura.
+
+Servidor asyncio da biblioteca padrão, numa thread própria, lendo os dados em memória
+(registro de circuitos, buffers circulares, acumuladores de energia) e o histórico
+persistente. Roda junto com a janela Tk ou sozinho (monitor sem GUI).
+
+  GET /api/circuits                               leituras atuais, relé e custos por circuito
+  GET /api/costs                                  totais de potência e custo
+  GET /api/history?circuit=sala&window=3600&points=300&field=power
+                                                  série reduzida no servidor (LTTB)
+  GET /api/anomaly                                linha de base, limites e CUSUM de cada circuito
+  GET /api/events?circuit=cozinha&level=CRITICO&kind=alerta&q=palavra&window=604800&limit=200
+                                                  log de eventos (mais recentes primeiro)
+  GET /ws                                         WebSocket: amostras novas a cada tick
+
+Respostas são montadas uma vez e servidas do cache: o instantâneo atual vale por um
+tick do stream e cada consulta de histórico vale por um passo da série (window/points),
+com pedidos simultâneos iguais esperando o mesmo cálculo. No WebSocket cada tick é
+codificado num único quadro e o mesmo bytes é escrito para todos os clientes; cliente
+lento (buffer de saída cheio) perde o quadro em vez de atrasar os outros.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from graph_renderer import lttb
+from metrics import ConsoleLog
+from storage import ROLLUP_FIELDS
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B11"
+_FIELDS = {"voltage": ("voltage", "v_mean"), "current": ("current", "i_mean"), "power": ("power", "p_mean")}
+# rótulos de api_requests_total: só rotas conhecidas, o resto conta como "other"
+_ROUTES = frozenset(("/", "/api/circuits", "/api/costs", "/api/history", "/api/anomaly", "/api/events", "/ws"))
+_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def _json(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Quadro WebSocket do servidor (FIN, sem máscara)."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+class _WsClient:
+    __slots__ = ("writer", "skipped")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.skipped = 0
+
+
+class DashboardServer:
+    MAX_WS_BUFFER = 256 * 1024      # bytes pendentes por cliente antes de pular quadros
+    MAX_POINTS = 2000
+    MAX_EVENTS = 5000
+
+    def __init__(self, registry, store=None, host: str = "0.0.0.0", port: int = 8080,
+                 stream_hz: float = 2.0, cache_size: int = 256, metrics=None, anomaly=None, events=None,
+                 log=None):
+        self.registry = registry
+        self.store = store
+        self.anomaly = anomaly
+        self.events = events
+        self.host = host
+        self.port = port
+        self.tick_s = 1.0 / stream_hz
+        self.cache_size = cache_size
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+
+        self.clients = set()
+        self._cache = OrderedDict()     # chave -> bytes (resposta JSON pronta)
+        self._inflight = {}             # chave -> Future (mesma consulta em andamento)
+        self._snapshot = (0.0, b"")     # (instante, JSON de /api/circuits)
+        self._last_sent = {}            # circuito -> último timestamp enviado no stream
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+        if metrics is not None:
+            self._c_req = lambda path: metrics.counter("api_requests_total", "Requisições HTTP", path=path).inc()
+            self._c_hit = metrics.counter("api_cache_hits_total", "Respostas servidas do cache")
+            self._c_frames = metrics.counter("ws_frames_total", "Quadros enviados (por cliente)")
+            self._c_skipped = metrics.counter("ws_frames_skipped_total", "Quadros pulados por cliente lento")
+            metrics.gauge("ws_clients", lambda: len(self.clients), "Clientes WebSocket conectados")
+        else:
+            self._c_req = self._c_hit = self._c_frames = self._c_skipped = None
+
+    # ------------------------- ciclo de vida -------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="dashboard-api", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            self._loop.create_task(self._stream_loop())
+        except OSError as e:
+            self.log(f"[API] Não foi possível abrir {self.host}:{self.port}: {e}", key="api")
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for c in list(self.clients):
+                c.writer.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for t in tasks:
+                t.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    # ------------------------- HTTP -------------------------
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, _ = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    k, sep, v = line.partition(":")
+                    if sep:
+                        headers[k.strip().lower()] = v.strip()
+                url = urlsplit(target)
+                if self._c_req is not None:
+                    self._c_req(url.path if url.path in _ROUTES else "other")
+
+                if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers)
+                    return
+                if method != "GET":
+                    status, body = 405, _json({"erro": "somente GET"})
+                else:
+                    status, body = await self._route(url.path, parse_qs(url.query))
+                keep = headers.get("connection", "").lower() != "close"
+                writer.write((f"HTTP/1.1 {status} {_STATUS[status]}\r\n"
+                              "Content-Type: application/json; charset=utf-8\r\n"
+                              "Access-Control-Allow-Origin: *\r\n"
+                              f"Content-Length: {len(body)}\r\n"
+                              f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n").encode() + body)
+                await writer.drain()
+                if not keep:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, path, query):
+        if path == "/api/circuits":
+            return 200, self._circuits_json()
+        if path == "/api/costs":
+            return 200, self._costs_json()
+        if path == "/api/history":
+            try:
+                circuit = query["circuit"][0]
+                window = float(query.get("window", ["3600"])[0])
+                points = min(int(query.get("points", ["300"])[0]), self.MAX_POINTS)
+                field = query.get("field", ["power"])[0]
+            except (KeyError, ValueError):
+                return 400, _json({"erro": "parâmetros: circuit, window (s), points, field"})
+            if field not in _FIELDS or window <= 0 or points < 3:
+                return 400, _json({"erro": f"field deve ser um de {sorted(_FIELDS)}"})
+            if self.registry.get(circuit) is None:
+                return 404, _json({"erro": f"circuito desconhecido: {circuit}"})
+            return 200, await self._history(circuit, window, points, field)
+        if path == "/api/anomaly" and self.anomaly is not None:
+            return 200, _json(self.anomaly.snapshot())
+        if path == "/api/events" and self.events is not None:
+            try:
+                window = float(query.get("window", ["86400"])[0])
+                limit = min(int(query.get("limit", ["200"])[0]), self.MAX_EVENTS)
+            except ValueError:
+                return 400, _json({"erro": "parâmetros: window (s), limit, circuit, level, kind, q"})
+            filters = {name: query[arg][0] for name, arg in (("circuit", "circuit"), ("level", "level"),
+                                                              ("kind", "kind"), ("keyword", "q")) if arg in query}
+            return 200, await self._loop.run_in_executor(None, self._build_events, window, limit, filters)
+        if path == "/":
+            return 200, _json({"endpoints": ["/api/circuits", "/api/costs", "/api/history", "/api/anomaly",
+                                             "/api/events", "/ws"]})
+        return 404, _json({"erro": "não encontrado"})
+
+    # ------------------------- respostas -------------------------
+    def _circuits_json(self) -> bytes:
+        now = time.time()
+        ts, body = self._snapshot
+        if now - ts < self.tick_s:
+            if self._c_hit is not None:
+                self._c_hit.inc()
+            return body
+        out = []
+        for c in self.registry.circuits():
+            acc = c.energy
+            v, i, p = (c.buffer.latest(col) for col in ("voltage", "current", "power"))
+            out.append({
+                "circuito": c.name,
+                "tensao": None if v is None else round(v, 2),
+                "corrente": None if i is None else round(i, 3),
+                "potencia": None if p is None else round(p, 1),
+                "rele": c.relay_on,
+                "ultima_leitura": c.last_seen,
+                "custo_hora": round(acc.cost_per_hour(now), 4),
+                "kwh_hoje": round(acc.day_kwh, 4), "custo_hoje": round(acc.day_cost, 2),
+                "kwh_mes": round(acc.month_kwh, 3), "custo_mes": round(acc.month_cost, 2),
+                "qualidade": None if c.quality is None else {
+                    k: round(val, 4) for k, val in c.quality.as_dict().items()},
+            })
+        body = _json({"t": now, "circuitos": out})
+        self._snapshot = (now, body)
+        return body
+
+    def _costs_json(self) -> bytes:
+        key = ("costs", int(time.time() / self.tick_s))
+        body = self._cache_get(key)
+        if body is None:
+            now = time.time()
+            accs = [c.energy for c in self.registry.circuits() if c.energy.last_ts is not None]
+            body = _json({
+                "t": now,
+                "potencia_total": round(sum(a.last_power for a in accs), 1),
+                "custo_hora": round(sum(a.cost_per_hour(now) for a in accs), 4),
+                "custo_hoje": round(sum(a.day_cost for a in accs), 2),
+                "custo_mes": round(sum(a.month_cost for a in accs), 2),
+                "kwh_mes": round(sum(a.month_kwh for a in accs), 3),
+            })
+            self._cache_put(key, body)
+        return body
+
+    async def _history(self, circuit, window, points, field) -> bytes:
+        # a resposta só muda quando a janela anda um passo da série reduzida
+        step = max(window / points, 1.0)
+        key = ("history", circuit, field, window, points, int(time.time() // step))
+        body = self._cache_get(key)
+        if body is not None:
+            return body
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = self._inflight[key] = self._loop.create_future()
+        try:
+            body = await self._loop.run_in_executor(None, self._build_history, circuit, window, points, field)
+            self._cache_put(key, body)
+            fut.set_result(body)
+            return body
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _build_history(self, circuit, window, points, field) -> bytes:
+        now = time.time()
+        t0 = now - window
+        col, rollup_col = _FIELDS[field]
+        buf = self.registry.get(circuit).buffer
+        oldest = buf.oldest("timestamp")
+        if self.store is None or (oldest is not None and oldest <= t0):
+            # janela inteira no buffer em memória
+            data = buf.since(t0)
+            x = np.frombuffer(data["timestamp"], dtype=np.float64)
+            y = np.frombuffer(data[col], dtype=np.float32)
+            source = "memoria"
+        else:
+            # só o que já foi gravado: sem flush, a ponta da janela pode ficar até
+            # flush_interval atrás, mas o executor nunca espera pelo gravador
+            res = self.store.pick_resolution(window)
+            rows = self.store.query(circuit, t0, now, res)
+            k = ROLLUP_FIELDS.index(rollup_col) if res else 1 + ("voltage", "current", "power").index(col)
+            x = np.fromiter((r[0] for r in rows), dtype=np.float64, count=len(rows))
+            y = np.fromiter((r[k] for r in rows), dtype=np.float64, count=len(rows))
+            source = f"historico_{res}s" if res else "historico"
+        x, y = lttb(x, y, points)
+        return _json({"circuito": circuit, "campo": field, "janela": window, "fonte": source,
+                      "t": np.round(x, 3).tolist(), "v": np.round(y.astype(np.float64), 3).tolist()})
+
+    def _build_events(self, window, limit, filters) -> bytes:
+        now = time.time()
+        for name in ("level", "kind"):
+            if name in filters:
+                filters[name] = filters[name].split(",")
+        rows = self.events.query(now - window, None, limit=limit, **filters)
+        keys = ("id", "t", "tipo", "nivel", "circuito", "fonte", "mensagem", "dados")
+        out = []
+        for row in rows:
+            e = dict(zip(keys, row))
+            e["dados"] = None if e["dados"] is None else json.loads(e["dados"])
+            out.append(e)
+        return _json({"t": now, "janela": window, "eventos": out})
+
+    def _cache_get(self, key):
+        body = self._cache.get(key)
+        if body is not None:
+            self._cache.move_to_end(key)
+            if self._c_hit is not None:
+                self._c_hit.inc()
+        return body
+
+    def _cache_put(self, key, body):
+        self._cache[key] = body
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ------------------------- WebSocket -------------------------
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "").encode()
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        writer.write(ws_frame(self._circuits_json()))
+        client = _WsClient(writer)
+        self.clients.add(client)
+        try:
+            while True:
+                opcode, payload = await self._read_frame(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    break
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+                # mensagens do cliente são ignoradas (API só leitura)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+
+    @staticmethod
+    async def _read_frame(reader):
+        b0, b1 = await reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack("!H", await reader.readexactly(2))
+        elif n == 127:
+            (n,) = struct.unpack("!Q", await reader.readexactly(8))
+        if n > 65536:
+            raise ConnectionError("quadro grande demais")
+        mask = await reader.readexactly(4) if b1 & 0x80 else None
+        data = await reader.readexactly(n)
+        if mask:
+            data = bytes(b ^ mask[k & 3] for k, b in enumerate(data))
+        return b0 & 0x0F, data
+
+    async def _stream_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_s)
+            if not self.clients:
+                continue
+            frame = ws_frame(self._stream_payload())
+            for c in list(self.clients):
+                transport = c.writer.transport
+                if transport.is_closing():
+                    self.clients.discard(c)
+                elif transport.get_write_buffer_size() > self.MAX_WS_BUFFER:
+                    c.skipped += 1
+                    if self._c_skipped is not None:
+                        self._c_skipped.inc()
+                else:
+                    c.writer.write(frame)
+                    if self._c_frames is not None:
+                        self._c_frames.inc()
+
+    def _stream_payload(self) -> bytes:
+        """Amostras chegadas desde o último tick: {circuito: [[ts, V, A, W], ...]} + estado dos relés."""
+        samples = {}
+        relays = {}
+        for c in self.registry.circuits():
+            relays[c.name] = c.relay_on
+            last = self._last_sent.get(c.name)
+            data = c.buffer.since(last + 1e-6) if last is not None else c.buffer.last(1)
+            ts = data["timestamp"]
+            if not len(ts):
+                continue
+            v, i, p = data["voltage"], data["current"], data["power"]
+            samples[c.name] = [[round(ts[k], 3), round(v[k], 2), round(i[k], 3), round(p[k], 1)]
+                               for k in range(len(ts))]
+            self._last_sent[c.name] = ts[-1]
+        return _json({"t": time.time(), "amostras": samples, "reles": relays})
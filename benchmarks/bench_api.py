@@ -0,0 +1,167 @@
+"""
+Benchmark da API de painéis: custo do servidor com 1 e com N clientes.
+
+Cada "celular" mantém um WebSocket aberto e consulta /api/circuits e /api/history
+a cada segundo, como um painel faria. Os clientes rodam num processo separado; mede
+o tempo de CPU do processo do monitor e a latência das consultas (a primeira de
+cada passo é calculada, as demais saem do cache).
+
+Uso:
+    python -m benchmarks.bench_api --clients 50 --duration 5
+"""
+import argparse
+import base64
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_storage import percentile
+from benchmarks.fake_mqtt import FakeBroker, FakeMqttClient
+from benchmarks.loadgen import SyntheticEsp32, publish_synthetic
+
+
+class Phone:
+    """Cliente de painel: WebSocket + consultas HTTP periódicas (keep-alive)."""
+
+    def __init__(self, port):
+        self.port = port
+        self.frames = 0
+        self.bytes = 0
+        self.latencies = []
+        self._stop = False
+
+    def _ws(self):
+        s = self._ws_sock = socket.create_connection(("127.0.0.1", self.port))
+        key = base64.b64encode(os.urandom(16)).decode()
+        s.sendall(f"GET /ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+        f = s.makefile("rb")
+        while f.readline() not in (b"\r\n", b""):
+            pass
+        while not self._stop:
+            try:
+                head = f.read(2)
+            except OSError:
+                break
+            if len(head) < 2:
+                break
+            n = head[1] & 0x7F
+            if n == 126:
+                n = int.from_bytes(f.read(2), "big")
+            elif n == 127:
+                n = int.from_bytes(f.read(8), "big")
+            f.read(n)
+            self.frames += 1
+            self.bytes += n
+        s.close()
+
+    def _poll(self):
+        s = socket.create_connection(("127.0.0.1", self.port))
+        f = s.makefile("rb")
+        paths = ("/api/circuits", "/api/history?circuit=sala&window=60&points=100")
+        while not self._stop:
+            for path in paths:
+                t0 = time.perf_counter()
+                s.sendall(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+                length = 0
+                while True:
+                    line = f.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                f.read(length)
+                self.latencies.append(time.perf_counter() - t0)
+            time.sleep(1.0)
+        s.close()
+
+    def start(self):
+        self.threads = [threading.Thread(target=self._ws, daemon=True),
+                        threading.Thread(target=self._poll, daemon=True)]
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        self._stop = True
+        try:
+            self._ws_sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, OSError):
+            pass
+        for t in self.threads:
+            t.join(2.0)
+
+
+def run_phones(port, n_clients, duration, out):
+    phones = [Phone(port) for _ in range(n_clients)]
+    for p in phones:
+        p.start()
+    time.sleep(0.5)
+    frames0 = sum(p.frames for p in phones)
+    lat0 = [len(p.latencies) for p in phones]
+    time.sleep(duration)
+    # contagens da janela medida, antes de parar os clientes
+    result = ([v for p, k in zip(phones, lat0) for v in p.latencies[k:]], sum(p.frames for p in phones) - frames0)
+    for p in phones:
+        p._stop = True
+    for p in phones:
+        p.stop()
+    out.put(result)
+
+
+def measure(app, n_clients, duration):
+    out = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=run_phones, args=(app.api.port, n_clients, duration, out))
+    proc.start()
+    time.sleep(0.5)
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cpu = (time.process_time() - cpu0) / (time.perf_counter() - t0)
+    latencies, frames = out.get()
+    proc.join()
+    lat = [v * 1000 for v in latencies]
+    return {"clients": n_clients, "cpu": cpu, "frames": frames,
+            "p50_ms": percentile(lat, 50) if lat else 0.0, "p99_ms": percentile(lat, 99) if lat else 0.0}
+
+
+def main():
+    from monitor_core import EnergyMonitorCore
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--circuits", type=int, default=10)
+    ap.add_argument("--rate", type=float, default=100.0, help="leituras/s publicadas durante o teste")
+    ap.add_argument("--duration", type=float, default=5.0)
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    broker = FakeBroker()
+    app = EnergyMonitorCore(client=FakeMqttClient(broker, "monitor"),
+                            db_path=os.path.join(workdir, "api.db"), metrics_port=None, api_port=0)
+    app.console.enabled = False
+    gen = SyntheticEsp32(args.circuits)
+    total = 3 * (args.duration + 1.0) + 1.0
+    pub = threading.Thread(target=publish_synthetic,
+                           args=(FakeMqttClient(broker, "loadgen"), gen, args.rate, total), daemon=True)
+    pub.start()
+    try:
+        base = measure(app, 0, args.duration)
+        one = measure(app, 1, args.duration)
+        many = measure(app, args.clients, args.duration)
+    finally:
+        app.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Circuitos: {args.circuits}  leituras: {args.rate:.0f}/s  stream: {1 / app.api.tick_s:.0f} Hz")
+    for r in (base, one, many):
+        print(f"  {r['clients']:>4} clientes: CPU do monitor {r['cpu'] * 100:5.1f}%  quadros WS {r['frames']:<6} "
+              f"HTTP p50={r['p50_ms']:.2f} ms p99={r['p99_ms']:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Vazão de decodificação por formato de payload (amostras/s, single thread).
+
+Uso:
+    python -m benchmarks.bench_decoders [--batch 50]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.loadgen import SyntheticEsp32
+from decoders import (cbor2, decode_batch, decode_room_json, decode_room_json_full,
+                      encode_batch_cbor, encode_batch_struct)
+
+
+def baseline(payload: bytes):
+    # caminho original do on_message: decode + json.loads + dict inteiro
+    data = json.loads(payload.decode())
+    return float(data.get('tensao', 0)), float(data.get('corrente', 0)), data
+
+
+def bench(fn, payloads, samples_per_payload, min_time=1.0):
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        for p in payloads:
+            fn(p)
+        n += len(payloads)
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            return n * samples_per_payload / elapsed, elapsed / n * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=50, help="amostras por mensagem de lote")
+    ap.add_argument("--time", type=float, default=1.0, help="segundos por formato")
+    args = ap.parse_args()
+
+    gen = SyntheticEsp32(5, fault_rate=0.0)
+    singles = [gen.room_payload(k % 5, k)[1] for k in range(1000)]
+    rows = [(k * 200, 127.0 + k % 3, 1.5, 1, 0) for k in range(args.batch)]
+
+    cases = [
+        ("json (original: decode + json.loads)", baseline, singles, 1),
+        ("json tipado (json.loads)", decode_room_json_full, singles, 1),
+        ("json tipado (layout fixo, padrão)", decode_room_json, singles, 1),
+        (f"lote struct ({args.batch}/msg)", decode_batch, [encode_batch_struct(rows)], args.batch),
+    ]
+    if cbor2 is not None:
+        cases.append((f"lote CBOR ({args.batch}/msg)", decode_batch, [encode_batch_cbor(rows)], args.batch))
+
+    print(f"{'formato':<40} {'bytes/amostra':>14} {'amostras/s':>14} {'µs/msg':>10}")
+    for name, fn, payloads, per in cases:
+        size = sum(len(p) for p in payloads) / len(payloads) / per
+        rate, us = bench(fn, payloads, per, args.time)
+        print(f"{name:<40} {size:>14.1f} {rate:>14,.0f} {us:>10.2f}")
+    if cbor2 is None:
+        print("(CBOR omitido: pip install cbor2)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark ponta a ponta do monitor com broker MQTT em processo.
+
+Mede vazão, latência por estágio (broker -> callback, fila -> worker, processamento,
+fila de UI -> tela) e crescimento de memória. Por padrão roda só o núcleo
+(monitor_core, sem Tk), como no CI; com --gui abre a interface Tk (precisa de DISPLAY, p.ex. xvfb-run).
+
+Uso:
+    python -m benchmarks.bench_e2e --circuits 20 --rate 500 --duration 10
+    python -m benchmarks.bench_e2e --rate 0 --duration 5 --min-rate 2000   # falha (exit 1) abaixo disso
+    python -m benchmarks.bench_e2e --fault-rate 0.01 --max-trip-ms 0   # falha se o corte passar do limite
+    python -m benchmarks.bench_e2e --replay captura.jsonl --speed 0
+    python -m benchmarks.bench_e2e --record 192.168.0.10:1883 --duration 600 --out captura.jsonl
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_storage import percentile
+from benchmarks.fake_mqtt import FakeBroker, FakeMqttClient
+from benchmarks.loadgen import (SyntheticEsp32, attach_fake_esp32, load_capture, publish_synthetic,
+                                record_capture, replay_capture)
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def summarize(name, values_s):
+    if not values_s:
+        return {"stage": name, "n": 0}
+    ms = [v * 1000.0 for v in values_s]
+    return {"stage": name, "n": len(ms), "p50_ms": percentile(ms, 50), "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99), "max_ms": max(ms)}
+
+
+def run(args) -> dict:
+    from monitor_core import EnergyMonitorCore
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    broker = FakeBroker()
+    gen = SyntheticEsp32(args.circuits, fault_rate=args.fault_rate)
+    esp = FakeMqttClient(broker, "esp32")
+    attach_fake_esp32(esp, gen)
+    esp.connect("fake")
+    esp.loop_start()
+
+    lat_broker, lat_queue, lat_handler, lat_ui = [], [], [], []
+    rss = [rss_mb()]
+
+    mon_client = FakeMqttClient(broker, "monitor")
+    devnull = open(os.devnull, "w")
+    out = devnull if args.quiet else sys.stdout
+    with contextlib.redirect_stdout(out):
+        if args.gui:
+            from cod_monitor import SimplifiedEnergyMonitor as monitor_cls
+        else:
+            monitor_cls = EnergyMonitorCore
+        app = monitor_cls(client=mon_client, db_path=os.path.join(workdir, "bench.db"), metrics_port=None)
+        on_message = mon_client.on_message
+
+        def traced_on_message(c, u, msg):
+            lat_broker.append(time.perf_counter() - msg.timestamp)
+            on_message(c, u, msg)
+
+        mon_client.on_message = traced_on_message
+        app.pipeline.trace = lambda t_in, t_s, t_e: (lat_queue.append(t_s - t_in),
+                                                     lat_handler.append(t_e - t_s))
+        app.pipeline.ui_trace = lambda t_p, t_a: lat_ui.append(t_a - t_p)
+        time.sleep(0.2)     # on_connect / subscribe
+
+        pub = FakeMqttClient(broker, "loadgen")
+        result = {}
+
+        def publisher():
+            if args.replay:
+                result["sent"] = replay_capture(pub, load_capture(args.replay), args.speed)
+            else:
+                result["sent"] = publish_synthetic(pub, gen, args.rate, args.duration, batch=args.batch)
+
+        t_start = time.perf_counter()
+        th = threading.Thread(target=publisher, daemon=True)
+        th.start()
+        last_sample = 0.0
+        while th.is_alive():
+            if args.gui:
+                app.root.update()
+            now = time.perf_counter()
+            if now - last_sample >= 0.5:
+                rss.append(rss_mb())
+                last_sample = now
+            time.sleep(0.001 if args.gui else 0.05)
+        t_published = time.perf_counter()
+
+        # espera esvaziar as filas (rede fake -> pipeline -> UI)
+        deadline = t_published + args.drain_timeout
+        while time.perf_counter() < deadline:
+            if args.gui:
+                app.root.update()
+            inbox, ui = app.pipeline.queue_depths()
+            if mon_client.pending() == 0 and inbox == 0 and (ui == 0 or not args.gui):
+                break
+            time.sleep(0.005)
+        t_drained = time.perf_counter()
+        rss.append(rss_mb())
+
+        stats = app.pipeline.stats.snapshot()
+        rtts = list(app.dispatcher.rtts)
+        trips = list(app.protection.latencies)
+        trip_bound_ms = app.PROTECTION_BOUND_MS
+        app.shutdown()
+        if args.gui:
+            app.root.destroy()
+    esp.loop_stop()
+    devnull.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    elapsed = t_drained - t_start
+    report = {
+        "mode": "gui" if args.gui else "headless",
+        "circuits": args.circuits,
+        "target_rate": args.rate,
+        "sent": result.get("sent", 0),
+        "pipeline": stats,
+        "publish_s": round(t_published - t_start, 3),
+        "drain_s": round(t_drained - t_published, 3),
+        "batch": args.batch,
+        "throughput_msg_s": round(stats["processed"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "throughput_samples_s": round(result.get("sent", 0) / elapsed, 1) if elapsed > 0 else 0.0,
+        "commands_published": sum(n for t, n in broker.topics.items() if t.startswith("energy/control/")),
+        "latency": [summarize("broker->callback", lat_broker), summarize("fila->worker", lat_queue),
+                    summarize("processamento", lat_handler), summarize("fila UI->tela", lat_ui),
+                    summarize("comando->status", rtts), summarize("chegada->corte", trips)],
+        "protection_bound_ms": trip_bound_ms,
+        "rss_mb": {"start": round(rss[0], 1), "peak": round(max(rss), 1), "end": round(rss[-1], 1),
+                   "growth": round(rss[-1] - rss[0], 1)},
+    }
+    return report
+
+
+def print_report(r):
+    print(f"Modo: {r['mode']}  circuitos: {r['circuits']}  taxa alvo: {r['target_rate'] or 'máx'} msg/s")
+    p = r["pipeline"]
+    print(f"Enviadas: {r['sent']}  recebidas: {p['received']}  processadas: {p['processed']}  "
+          f"descartadas: {p['dropped']}  erros: {p['errors']}")
+    print(f"Vazão: {r['throughput_msg_s']:.0f} msg/s, {r['throughput_samples_s']:.0f} leituras/s"
+          f"{' (lotes de %d)' % r['batch'] if r['batch'] else ''}  "
+          f"(publicação {r['publish_s']} s, drenagem {r['drain_s']} s)")
+    print(f"Comandos publicados: {r['commands_published']}")
+    for s in r["latency"]:
+        if s["n"]:
+            print(f"  {s['stage']:<18} n={s['n']:<7} p50={s['p50_ms']:8.3f} ms  p95={s['p95_ms']:8.3f} ms  "
+                  f"p99={s['p99_ms']:8.3f} ms  max={s['max_ms']:8.3f} ms")
+    m = r["rss_mb"]
+    print(f"Memória (RSS): início {m['start']} MB, pico {m['peak']} MB, fim {m['end']} MB "
+          f"(+{m['growth']} MB)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--circuits", type=int, default=5)
+    ap.add_argument("--rate", type=float, default=200.0, help="msg/s; 0 = o mais rápido possível")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--fault-rate", type=float, default=0.001)
+    ap.add_argument("--batch", type=int, default=0, help="leituras por mensagem (tópico /batch)")
+    ap.add_argument("--replay", help="arquivo de captura JSON Lines")
+    ap.add_argument("--speed", type=float, default=1.0, help="velocidade do replay (0 = sem espera)")
+    ap.add_argument("--gui", action="store_true", help="abre a janela Tk (precisa de DISPLAY)")
+    ap.add_argument("--drain-timeout", type=float, default=30.0)
+    ap.add_argument("--verbose", dest="quiet", action="store_false", help="mostra os prints do monitor")
+    ap.add_argument("--json", help="grava o relatório em JSON neste arquivo")
+    ap.add_argument("--min-rate", type=float, default=0.0, help="falha se a vazão ficar abaixo")
+    ap.add_argument("--max-drop", type=int, default=-1, help="falha se descartar mais que isso")
+    ap.add_argument("--max-trip-ms", type=float, default=-1.0,
+                    help="falha se o p99 chegada->corte passar disso (0 = PROTECTION_BOUND_MS do monitor)")
+    ap.add_argument("--record", metavar="HOST:PORT", help="grava captura de um broker real")
+    ap.add_argument("--out", default="captura.jsonl")
+    args = ap.parse_args()
+
+    if args.record:
+        host, _, port = args.record.partition(":")
+        record_capture(host, int(port or 1883), args.out, args.duration)
+        print(f"Captura gravada em {args.out}")
+        return 0
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = False
+    if args.min_rate and report["throughput_msg_s"] < args.min_rate:
+        print(f"FALHA: vazão abaixo de {args.min_rate} msg/s")
+        failed = True
+    if args.max_drop >= 0 and report["pipeline"]["dropped"] > args.max_drop:
+        print(f"FALHA: {report['pipeline']['dropped']} mensagens descartadas (máx {args.max_drop})")
+        failed = True
+    if args.max_trip_ms >= 0:
+        bound = args.max_trip_ms or report["protection_bound_ms"]
+        trip = next(s for s in report["latency"] if s["stage"] == "chegada->corte")
+        if not trip["n"]:
+            print("FALHA: nenhum corte medido (aumente --fault-rate)")
+            failed = True
+        elif trip["p99_ms"] > bound:
+            print(f"FALHA: p99 chegada->corte {trip['p99_ms']:.3f} ms acima de {bound} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark do log de eventos (eventlog.py): custo de add() para quem chama, vazão da
+gravação em lotes e tempo das consultas sobre meses de eventos.
+
+Gera `--months` meses no ritmo de uma casa com `--circuits` circuitos: um status do
+ESP32 por minuto (EVENT_STATUS_EVERY_S), logs do dispositivo, avisos e cortes por
+circuito, comandos de relé e algumas quedas de conexão por dia. Depois mede:
+- CRITICO de um circuito na última semana;
+- busca por palavra na mensagem no último mês;
+- tudo da última hora;
+- quedas do último mês com o RSSI antes e depois de cada uma.
+
+Uso:
+    python -m benchmarks.bench_eventlog --months 6 --circuits 5
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_storage import percentile
+from eventlog import EventLog
+
+
+def generate(months: float, n_circuits: int, seed: int = 1):
+    rnd = random.Random(seed)
+    circuits = ["sala", "quarto", "cozinha", "banheiro", "area_servico"][:n_circuits] + \
+        [f"circuito{k}" for k in range(5, n_circuits)]
+    t_end = time.time()
+    t = t_end - months * 30 * 86400
+    rssi = -65.0
+    while t < t_end:
+        rssi = max(-90.0, min(-45.0, rssi + rnd.gauss(0, 1.5)))
+        yield (t, "status", "INFO", f"online, RSSI {rssi:.0f} dBm, uptime 0 s, versão 3.7", None, "esp32",
+               {"sistema": "online", "wifi_rssi": round(rssi), "versao": "3.7"})
+        if rnd.random() < 0.03:
+            yield (t + 1, "log", "INFO", rnd.choice(("MQTT conectado", "Ganhos salvos", "WiFi reconectado")),
+                   None, "esp32", None)
+        if rnd.random() < 0.06:
+            c = rnd.choice(circuits)
+            yield (t + 2, "alerta", "AVISO", f"{c}: Consumo elevado agora ({rnd.uniform(800, 3000):.0f} W).",
+                   c, "monitor", {"regra": "spike"})
+        if rnd.random() < 0.03:
+            c = rnd.choice(circuits)
+            on = rnd.random() < 0.5
+            yield (t + 3, "comando", "INFO", f"energy/control/{c} {'ON' if on else 'OFF'}", c, "monitor", {"qos": 1})
+        if rnd.random() < 0.0015:
+            c = rnd.choice(circuits)
+            yield (t + 4, "alerta", "CRITICO", f"{c}: Corrente crítica {rnd.uniform(15, 25):.1f} A. Relé DESLIGADO "
+                   "por segurança.", c, "monitor", {"regra": "i_cutoff"})
+        if rnd.random() < 0.002:
+            source = rnd.choice(("monitor", "esp32"))
+            dur = rnd.uniform(5, 300)
+            yield (t + 5, "conexao", "AVISO", "queda", None, source, {"online": False})
+            yield (t + 5 + dur, "conexao", "INFO", "volta", None, source, {"online": True})
+        t += 60.0
+
+
+def timed(fn, runs: int) -> tuple[float, int]:
+    times, n = [], 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        n = len(fn())
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times), n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--months", type=float, default=6.0)
+    ap.add_argument("--circuits", type=int, default=5)
+    ap.add_argument("--runs", type=int, default=20, help="repetições de cada consulta (mediana)")
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "eventos.db")
+    events = list(generate(args.months, args.circuits))
+    events.sort(key=lambda e: e[0])
+    gc.freeze()     # a lista gerada não deve pesar nas coletas medidas em add()
+    log = EventLog(path, max_pending=len(events) + 1)
+
+    add_us = []
+    t0 = time.perf_counter()
+    for ts, kind, level, message, circuit, source, data in events:
+        a = time.perf_counter()
+        log.add(kind, level, message, circuit, source, data, ts)
+        add_us.append((time.perf_counter() - a) * 1e6)
+    t1 = time.perf_counter()
+    log.flush(600.0)
+    t2 = time.perf_counter()
+    size = os.path.getsize(path) + (os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0)
+    print(f"{log.count():,} eventos ({args.months:g} meses, {args.circuits} circuitos), "
+          f"{size / 1e6:.1f} MB, FTS5 {'sim' if log.fts else 'não'}")
+    print(f"  add(): p50 {percentile(add_us, 50):.1f} µs  p99 {percentile(add_us, 99):.1f} µs  "
+          f"p99.9 {percentile(add_us, 99.9):.1f} µs   (enfileirar {len(events) / (t1 - t0):,.0f}/s)")
+    print(f"  gravação em lotes: {len(events) / (t2 - t0):,.0f} eventos/s, descartados {log.dropped}")
+
+    now = time.time()
+    week, month = now - 7 * 86400, now - 30 * 86400
+
+    def rssi_around_outages():
+        out = []
+        for source, start, end in log.outages(month, now):
+            before = log.series("wifi_rssi", start - 300, start)
+            after = log.series("wifi_rssi", end, end + 300) if end is not None else []
+            out.append((source, start, end, before[-1:], after[:1]))
+        return out
+
+    queries = (
+        ("CRITICO da cozinha na última semana",
+         lambda: log.query(week, None, circuit="cozinha", level="CRITICO")),
+        ("palavra 'corrente' no último mês (200)",
+         lambda: log.query(month, None, keyword="corrente", limit=200)),
+        ("prefixo 'deslig*' em todo o período (200)",
+         lambda: log.query(keyword="deslig*", limit=200)),
+        ("tudo da última hora",
+         lambda: log.query(now - 3600, None)),
+        ("comandos OFF de um circuito no mês",
+         lambda: log.query(month, None, circuit="sala", kind="comando", keyword="off")),
+        ("quedas do mês com RSSI antes/depois", rssi_around_outages),
+    )
+    for label, fn in queries:
+        ms, n = timed(fn, args.runs)
+        print(f"  {label:<45} {ms:8.2f} ms   ({n} resultados)")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
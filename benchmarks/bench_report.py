@@ -0,0 +1,144 @@
+"""
+Benchmark dos relatórios (report.py): agregação diária sobre os arquivos colunares.
+
+Gera direto os arquivos .npy (sem passar pelo SQLite) para N circuitos × D dias a 2 Hz
+e mede a agregação com 1 processo e com o pool. À parte, mede sync_columns num banco
+SQLite com `--sync-circuits` circuitos × `--sync-days` dias (amostras e agregações de
+1 h): exportação inicial, nova sincronização sem mudanças e depois de um lote
+retroativo no meio do primeiro mês. A passada sem mudanças só lê as agregações de 1 h,
+então o tempo dela vale para qualquer taxa de amostragem.
+
+Uso:
+    python -m benchmarks.bench_report --circuits 24 --days 31
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from report import COLUMNS, build_report, month_of, month_start, next_month, sync_columns
+from storage import SCHEMA
+
+
+def write_month(path, t0, t1, hz, rnd):
+    n = int((t1 - t0) * hz)
+    os.makedirs(path)
+    ts = t0 + np.arange(n) / hz
+    v = (127.0 + rnd.normal(0, 2.0, n)).astype(np.float32)
+    v[rnd.integers(0, n, 20)] = 85.0                           # subtensões isoladas
+    i = (2.0 + 1.5 * np.sin(ts / 3600.0) + rnd.uniform(0, 0.2, n)).astype(np.float32)
+    relay = np.ones(n, np.int8)
+    for k in rnd.integers(0, n - 100, 5):                       # cortes
+        i[k] = 30.0
+        relay[k + 1:k + 60] = 0
+    data = {"ts": ts, "voltage": v, "current": i, "power": v * i * np.float32(0.85), "relay": relay}
+    for name, dt in COLUMNS:
+        col = open_memmap(os.path.join(path, name + ".npy"), mode="w+", dtype=dt, shape=(n,))
+        col[:] = data[name]
+        col.flush()
+    return n
+
+
+def bench_sync(root, t0, days, n_circuits, hz, rnd):
+    """Banco com amostras e agregações de 1 h (n por hora, como o TimeSeriesStore grava)."""
+    db = os.path.join(root, "energia.db")
+    conn = sqlite3.connect(db)
+    conn.executescript(SCHEMA)
+    rooms = [f"circuito_{c:02d}" for c in range(n_circuits)]
+    ts = t0 + np.arange(int(days * 86400 * hz)) / hz
+    hole = (ts >= t0 + 86400) & (ts < t0 + 90000)                # 1 h que chega depois
+    v = 127.0 + rnd.normal(0, 2.0, len(ts))
+    i = 2.0 + rnd.uniform(0, 0.2, len(ts))
+
+    def insert(room, sel):
+        conn.executemany("INSERT INTO samples VALUES (?,?,?,?,?,1,0)",
+                         ((room, t, a, b, a * b * 0.85) for t, a, b in zip(ts[sel].tolist(), v[sel].tolist(),
+                                                                            i[sel].tolist())))
+        buckets, counts = np.unique(ts[sel] - ts[sel] % 3600, return_counts=True)
+        conn.executemany("INSERT OR REPLACE INTO rollups (res, room, bucket, n) VALUES (3600, ?, ?, "
+                         "COALESCE((SELECT n FROM rollups WHERE res = 3600 AND room = ? AND bucket = ?), 0) + ?)",
+                         ((room, b, room, b, n) for b, n in zip(buckets.tolist(), counts.tolist())))
+
+    t = time.perf_counter()
+    for room in rooms:
+        insert(room, ~hole)
+    conn.commit()
+    (hours,) = conn.execute("SELECT COUNT(*) FROM rollups").fetchone()
+    print(f"  banco para sync_columns: {n_circuits} circuitos × {days:g} dias a {hz:g} Hz, "
+          f"{int((~hole).sum()) * n_circuits:,} amostras, {hours:,} horas agregadas "
+          f"({time.perf_counter() - t:.1f} s)")
+    cols = os.path.join(root, "colunas")
+    for label in ("exportação inicial", "sem mudanças"):
+        t = time.perf_counter()
+        out = sync_columns(db, cols, rooms, log=lambda line: None)
+        print(f"  sync_columns, {label:<28} {time.perf_counter() - t:6.2f} s  ({len(out)} meses)")
+    insert(rooms[0], hole)
+    conn.commit()
+    conn.close()
+    exported = []
+    t = time.perf_counter()
+    sync_columns(db, cols, rooms, log=exported.append)
+    print(f"  sync_columns, {'após lote retroativo':<28} {time.perf_counter() - t:6.2f} s  "
+          f"({len(exported)} mês(es) reexportado(s), esperado 1)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--circuits", type=int, default=24)
+    ap.add_argument("--days", type=float, default=31.0)
+    ap.add_argument("--hz", type=float, default=2.0)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--dir", default=None)
+    ap.add_argument("--sync-circuits", type=int, default=24, help="circuitos no teste de sync_columns (0 = pular)")
+    ap.add_argument("--sync-days", type=float, default=365.0)
+    ap.add_argument("--sync-hz", type=float, default=0.01,
+                    help="amostras/s no banco do sync (a marca por mês lê as horas, que não dependem disso)")
+    args = ap.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix="bench_report_")
+    rnd = np.random.default_rng(42)
+    t_start = month_start(2026, 1)
+    t_end = t_start + args.days * 86400
+    tasks, total = [], 0
+    t0 = time.perf_counter()
+    for c in range(args.circuits):
+        room = f"circuito_{c:02d}"
+        ym = month_of(t_start)
+        while month_start(*ym) < t_end:
+            a, b = month_start(*ym), min(month_start(*next_month(*ym)), t_end)
+            path = os.path.join(root, room, f"{ym[0]:04d}-{ym[1]:02d}")
+            total += write_month(path, a, b, args.hz, rnd)
+            tasks.append((room, ym, path))
+            ym = next_month(*ym)
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs)
+    print(f"Gerados {total:,} amostras ({args.circuits} circuitos × {args.days:g} dias a {args.hz:g} Hz, "
+          f"{size / 1e9:.2f} GB) em {time.perf_counter() - t0:.1f} s")
+
+    try:
+        results = {}
+        for workers in sorted({1, args.workers}):
+            t0 = time.perf_counter()
+            rows = build_report(tasks, workers)
+            dt = time.perf_counter() - t0
+            results[workers] = dt
+            year = dt * (365 * 86400 * args.hz * args.circuits) / total
+            print(f"  {workers:>2} processo(s): {dt:6.2f} s  {total / dt / 1e6:6.1f} M amostras/s  "
+                  f"({len(rows)} linhas; um ano destes circuitos levaria ~{year:.0f} s)")
+        cuts = sum(r["cortes"] for r in rows)
+        print(f"  cortes encontrados: {cuts} (gerados: {5 * len(tasks)})")
+        if args.sync_circuits > 0:
+            bench_sync(root, t_start, args.sync_days, args.sync_circuits, args.sync_hz, rnd)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Benchmark de inicialização: tempo de import, construção e primeira leitura processada.
+
+Cada medida roda num interpretador novo (sem cache de módulos). Compara:
+- import do núcleo (monitor_core) e da janela (cod_monitor) — nenhum dos dois pode
+  carregar matplotlib, e o núcleo também não carrega tkinter;
+- o custo de matplotlib + backend TkAgg, que agora só entra depois da primeira tela;
+- construção com broker inacessível (o connect é assíncrono: não pode travar);
+- sem janela: do início do processo até a primeira leitura processada;
+- com janela (só com DISPLAY): primeira tela, primeira leitura e gráfico pronto.
+
+Uso:
+    python -m benchmarks.bench_startup --runs 5
+    xvfb-run python -m benchmarks.bench_startup      # inclui a janela Tk
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+print(json.dumps({{"s": t1 - t0, "heavy": sorted(m for m in ("tkinter", "matplotlib") if m in sys.modules)}}))
+"""
+
+CONSTRUCT = """
+import contextlib, io, json, os, tempfile, time
+from monitor_core import EnergyMonitorCore
+
+class Unreachable(EnergyMonitorCore):
+    def connect_mqtt(self):
+        self.mqtt_broker = {host!r}
+        super().connect_mqtt()
+
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    app = Unreachable(db_path=os.path.join(tempfile.mkdtemp(), "s.db"), metrics_port=None, api_port=None)
+t1 = time.perf_counter()
+print(json.dumps({{"s": t1 - t0}}), flush=True)
+os._exit(0)     # o paho ainda está tentando conectar; não espera o timeout
+"""
+
+FIRST_MESSAGE = """
+import contextlib, io, json, os, tempfile, time
+t0 = time.perf_counter()
+{import_monitor}
+from benchmarks.fake_mqtt import FakeBroker, FakeMqttClient
+from benchmarks.loadgen import SyntheticEsp32
+
+broker = FakeBroker()
+with contextlib.redirect_stdout(io.StringIO()):
+    app = Monitor(client=FakeMqttClient(broker, "monitor"), db_path=os.path.join(tempfile.mkdtemp(), "s.db"),
+                  metrics_port=None, api_port=None)
+app.console.enabled = False
+t_built = time.perf_counter()
+esp = FakeMqttClient(broker, "esp32")
+esp.connect("fake")
+esp.loop_start()
+topic, payload = SyntheticEsp32(1).room_payload(0, 0)
+gui = hasattr(app, "root")
+t_window = t_first = t_graph = None
+deadline = t_built + 30.0
+while time.perf_counter() < deadline:
+    if gui:
+        app.root.update()
+        now = time.perf_counter()
+        if t_window is None and app.root.winfo_viewable():
+            t_window = now
+        if t_graph is None and app.renderer is not None:
+            t_graph = now
+    if t_first is None:
+        if app.pipeline.stats.processed:
+            t_first = time.perf_counter()
+        else:
+            esp.publish(topic, payload)     # repete até o monitor estar inscrito
+    if t_first is not None and (not gui or (t_window is not None and t_graph is not None)):
+        break
+    time.sleep(0.001)
+res = {{"built": t_built - t0}}
+for name, t in (("window", t_window), ("first", t_first), ("graph", t_graph)):
+    if t is not None:
+        res[name] = t - t0
+print(json.dumps(res), flush=True)
+os._exit(0)
+"""
+
+CORE = "from monitor_core import EnergyMonitorCore as Monitor"
+GUI = "from cod_monitor import SimplifiedEnergyMonitor as Monitor"
+
+
+def child(code: str, timeout: float = 60.0) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True,
+                         timeout=timeout)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "falhou")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def median_runs(code: str, runs: int) -> dict:
+    results = [child(code) for _ in range(runs)]
+    out = {}
+    for key in results[0]:
+        values = [r[key] for r in results if key in r]
+        out[key] = statistics.median(values) if isinstance(values[0], float) else values[0]
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5, help="repetições (mediana)")
+    ap.add_argument("--host", default="10.255.255.1", help="broker inacessível para o teste de construção")
+    ap.add_argument("--max-construct-ms", type=float, default=-1.0,
+                    help="falha se a construção com broker inacessível passar disso")
+    args = ap.parse_args()
+
+    failed = False
+    print(f"Mediana de {args.runs} processos novos")
+    for module in ("monitor_core", "cod_monitor", "matplotlib.pyplot, matplotlib.backends.backend_tkagg"):
+        r = median_runs(IMPORT.format(module=module), args.runs)
+        heavy = ", ".join(r["heavy"]) or "nenhum"
+        print(f"  import {module:<55} {r['s'] * 1000:8.1f} ms   (carregados: {heavy})")
+        if module == "monitor_core" and r["heavy"]:
+            print("FALHA: o núcleo importou módulos de interface")
+            failed = True
+        if module == "cod_monitor" and "matplotlib" in r["heavy"]:
+            print("FALHA: cod_monitor importou matplotlib antes da primeira tela")
+            failed = True
+
+    r = median_runs(CONSTRUCT.format(host=args.host), args.runs)
+    label = f"construção com broker inacessível ({args.host})"
+    print(f"  {label:<62} {r['s'] * 1000:8.1f} ms")
+    if 0 <= args.max_construct_ms < r["s"] * 1000:
+        print(f"FALHA: construção acima de {args.max_construct_ms} ms")
+        failed = True
+
+    r = median_runs(FIRST_MESSAGE.format(import_monitor=CORE), args.runs)
+    print(f"  sem janela: pronto {r['built'] * 1000:.1f} ms, primeira leitura {r['first'] * 1000:.1f} ms")
+
+    if not os.environ.get("DISPLAY"):
+        print("  com janela: ignorado (sem DISPLAY; use xvfb-run)")
+    else:
+        r = median_runs(FIRST_MESSAGE.format(import_monitor=GUI), args.runs)
+        print(f"  com janela: pronto {r['built'] * 1000:.1f} ms, primeira tela {r['window'] * 1000:.1f} ms, "
+              f"primeira leitura {r['first'] * 1000:.1f} ms, gráfico {r['graph'] * 1000:.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark do histórico persistente (storage.TimeSeriesStore).
+
+Uso:
+    python -m benchmarks.bench_storage                 # 30 dias, 5 cômodos, 2 Hz
+    python -m benchmarks.bench_storage --days 1 --keep-db
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+from storage import TimeSeriesStore
+
+ROOMS = ('sala', 'quarto', 'cozinha', 'banheiro', 'area_servico')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=float, default=30.0)
+    ap.add_argument("--rooms", type=int, default=5)
+    ap.add_argument("--hz", type=float, default=2.0)
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--keep-db", action="store_true")
+    args = ap.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    rooms = [ROOMS[k % len(ROOMS)] + ("" if k < len(ROOMS) else f"_{k}") for k in range(args.rooms)]
+    step = 1.0 / args.hz
+    n_ticks = int(args.days * 86400 * args.hz)
+    t_start = 1_700_000_000.0
+    rnd = random.Random(42)
+
+    store = TimeSeriesStore(path, batch_size=5000)
+    print(f"Ingerindo {n_ticks * len(rooms):,} amostras ({args.days} dias, {len(rooms)} cômodos, {args.hz} Hz)...")
+    t0 = time.perf_counter()
+    for k in range(n_ticks):
+        ts = t_start + k * step
+        for room in rooms:
+            v = 127.0 + rnd.uniform(-3, 3)
+            i = 2.0 + 1.5 * math.sin(k / 3600.0) + rnd.uniform(0, 0.2)
+            store.add(room, ts, v, i, v * i * 0.85, 1, 0)
+        if k % 20000 == 0:
+            store.flush(timeout=60)   # evita a fila crescer sem limite
+    store.flush(timeout=600)
+    elapsed = time.perf_counter() - t0
+    total = n_ticks * len(rooms)
+    print(f"  ingestão: {elapsed:.1f} s  ({total / elapsed:,.0f} amostras/s)")
+    print(f"  arquivo: {os.path.getsize(path) / 1e6:.1f} MB")
+
+    t_end = t_start + n_ticks * step
+    queries = {
+        "mês inteiro (1 h)": lambda r: store.query(r, t_start, t_end),
+        "último dia (1 min)": lambda r: store.query(r, t_end - 86400, t_end),
+        "última hora (1 s)": lambda r: store.query(r, t_end - 3600, t_end),
+        "últimos 5 min (bruto)": lambda r: store.query(r, t_end - 300, t_end),
+        "energia do mês": lambda r: store.energy_wh(r, t_start + 0.5, t_end - 0.5),
+    }
+    for name, fn in queries.items():
+        lat = []
+        for _ in range(20):
+            for room in rooms:
+                q0 = time.perf_counter()
+                fn(room)
+                lat.append((time.perf_counter() - q0) * 1000.0)
+        print(f"  {name:<24} p50={percentile(lat, 50):7.2f} ms  p99={percentile(lat, 99):7.2f} ms")
+
+    store.close()
+    if not args.keep_db and args.db is None:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark do modelo de tela (viewmodel.py): operações de widget por segundo.
+
+Simula em tempo acelerado N circuitos (uma fração com carga variando, o resto parado),
+mensagens de status de relé e o indicador de potência, e conta as operações de
+widget que a tela faria:
+- antes: a tabela de custos apagada e refeita a cada 5 s (N deletes + N inserts +
+  4 rótulos), todos os N rótulos de relé a cada quadro com mensagem de status, e
+  texto + cor do indicador a cada segundo;
+- agora: só as chaves que DashboardView.take() devolve.
+Mede também o tempo de CPU do modelo (refresh + take) por quadro. Não precisa de Tk.
+
+Uso:
+    python -m benchmarks.bench_viewmodel --circuits 1000 --active 0.2 --relay-rate 20
+"""
+import argparse
+import random
+import time
+
+from energy import TariffSchedule
+from registry import DeviceRegistry
+from viewmodel import DashboardView
+
+FRAME_S = 0.1
+COSTS_S = 5.0
+GRAPH_S = 1.0
+READING_S = 0.5
+
+
+def run(n_circuits: int, active: float, relay_rate: float, duration: float, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    registry = DeviceRegistry(1000, TariffSchedule(0.65), max_circuits=n_circuits)
+    circuits = [registry.ensure(f"circuito{k}") for k in range(n_circuits)]
+    base = {c.name: (rnd.uniform(50, 2000) if k < n_circuits * active else 0.0) for k, c in enumerate(circuits)}
+    view = DashboardView()
+    t0 = time.time()
+    frames = int(duration / FRAME_S)
+    old_ops = new_ops = 0
+    cpu = 0.0
+    for f in range(frames):
+        now = t0 + f * FRAME_S
+        if f % int(READING_S / FRAME_S) == 0:
+            # só os circuitos ativos variam
+            for c in circuits:
+                p = base[c.name]
+                c.energy.add(now, p * rnd.uniform(0.9, 1.1) if p else 0.0)
+        # mensagens de status de relé neste quadro
+        expected = relay_rate * FRAME_S
+        msgs = int(expected) + (rnd.random() < expected % 1)
+        t = time.perf_counter()
+        for _ in range(msgs):
+            c = rnd.choice(circuits)
+            if rnd.random() < 0.1:
+                c.relay_on = not c.relay_on
+            view.refresh_relays((c,))
+        if f % int(COSTS_S / FRAME_S) == 0:
+            view.refresh_costs(circuits, now)
+            old_ops += 2 * n_circuits + 4
+        if f % int(GRAPH_S / FRAME_S) == 0:
+            view.set_power(circuits[0].energy.last_power)
+            old_ops += 2
+        new_ops += len(view.take())
+        cpu += time.perf_counter() - t
+        if msgs:
+            old_ops += n_circuits
+    return {"circuits": n_circuits, "old_ops_s": old_ops / duration, "new_ops_s": new_ops / duration,
+            "cpu_ms_frame": cpu / frames * 1000, "writes": view.writes}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--circuits", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--active", type=float, default=0.2, help="fração de circuitos com carga variando")
+    ap.add_argument("--relay-rate", type=float, default=5.0, help="mensagens de status de relé por segundo")
+    ap.add_argument("--duration", type=float, default=60.0, help="segundos simulados")
+    args = ap.parse_args()
+
+    print(f"{args.duration:.0f} s simulados, {args.active:.0%} dos circuitos ativos, "
+          f"{args.relay_rate:g} status de relé/s, quadro de {FRAME_S * 1000:.0f} ms")
+    for n in args.circuits:
+        r = run(n, args.active, args.relay_rate, args.duration)
+        print(f"  {n:5d} circuitos: antes {r['old_ops_s']:9.1f} ops de widget/s   agora {r['new_ops_s']:7.1f} ops/s"
+              f"   ({r['old_ops_s'] / max(r['new_ops_s'], 1e-9):6.1f}x)   modelo {r['cpu_ms_frame']:.3f} ms/quadro")
+
+
+if __name__ == "__main__":
+    main()
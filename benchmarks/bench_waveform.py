@@ -0,0 +1,121 @@
+"""
+Benchmark da análise de forma de onda.
+
+1) Vazão da análise em bloco (uma FFT 2D por lote) contra um burst por vez.
+2) Monitor completo: leituras normais + bursts de vários circuitos; mede se a ingestão
+   continua rápida enquanto o pool analisa e quanto tempo leva para analisar tudo.
+
+Uso:
+    python -m benchmarks.bench_waveform --circuits 20 --burst-hz 10 --duration 5
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_storage import percentile
+from benchmarks.fake_mqtt import FakeBroker, FakeMqttClient
+from benchmarks.loadgen import SyntheticEsp32, publish_synthetic
+from waveform import analyze_payloads
+
+
+def bench_block(gen, n_bursts, samples):
+    items = []
+    for k in range(n_bursts):
+        topic, payload = gen.waveform_payload(k % len(gen.circuits), samples)
+        items.append((topic, 0.0, payload))
+    analyze_payloads(items[:8])     # aquece
+
+    t0 = time.perf_counter()
+    for item in items:
+        analyze_payloads([item])
+    single = n_bursts / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    analyze_payloads(items)
+    block = n_bursts / (time.perf_counter() - t0)
+    return single, block
+
+
+def bench_monitor(args, gen):
+    from monitor_core import EnergyMonitorCore
+
+    workdir = tempfile.mkdtemp(prefix="bench_wave_")
+    broker = FakeBroker()
+    handler = []
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        app = EnergyMonitorCore(client=FakeMqttClient(broker, "monitor"),
+                                db_path=os.path.join(workdir, "w.db"), metrics_port=None)
+    app.console.enabled = False
+    app.pipeline.trace = lambda t_in, t_s, t_e: handler.append(t_e - t_in)
+    time.sleep(0.2)
+
+    bursts = FakeMqttClient(broker, "esp32-wave")
+    payloads = [gen.waveform_payload(k, args.samples) for k in range(len(gen.circuits))]
+    sent = [0]
+
+    def publish_bursts():
+        period = 1.0 / (args.burst_hz * len(payloads))
+        start = time.perf_counter()
+        k = 0
+        while time.perf_counter() - start < args.duration:
+            bursts.publish(*payloads[k % len(payloads)])
+            k += 1
+            delay = start + k * period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent[0] = k
+
+    th = threading.Thread(target=publish_bursts, daemon=True)
+    th.start()
+    t0 = time.perf_counter()
+    readings = publish_synthetic(FakeMqttClient(broker, "loadgen"), gen, args.rate, args.duration)
+    th.join()
+    t_pub = time.perf_counter()
+    while app.pipeline.queue_depths()[0]:
+        time.sleep(0.005)
+    app.waveform.flush(30.0)
+    t_done = time.perf_counter()
+    lat = [v * 1000 for v in handler]
+    sample = next((c.quality for c in app.registry.circuits() if c.quality is not None), None)
+    result = {"bursts": sent[0], "analyzed": app.waveform.analyzed, "dropped": app.waveform.dropped,
+              "readings": readings, "lag_s": t_done - t_pub, "elapsed": t_done - t0,
+              "p50": percentile(lat, 50) if lat else 0.0, "p99": percentile(lat, 99) if lat else 0.0,
+              "sample": sample}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        app.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--circuits", type=int, default=20)
+    ap.add_argument("--samples", type=int, default=256, help="amostras por canal em cada burst")
+    ap.add_argument("--burst-hz", type=float, default=10.0, help="bursts/s por circuito")
+    ap.add_argument("--rate", type=float, default=200.0, help="leituras normais/s")
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--block", type=int, default=2000, help="bursts no teste de análise em bloco")
+    args = ap.parse_args()
+
+    gen = SyntheticEsp32(args.circuits)
+    single, block = bench_block(gen, args.block, args.samples)
+    print(f"Análise ({args.samples} amostras/canal): um por vez {single:,.0f} bursts/s, "
+          f"em bloco {block:,.0f} bursts/s ({block / single:.1f}x)")
+
+    r = bench_monitor(args, gen)
+    print(f"Monitor: {r['bursts']} bursts ({args.circuits} circuitos × {args.burst_hz:g}/s) + "
+          f"{r['readings']} leituras em {args.duration:g} s")
+    print(f"  analisados {r['analyzed']}  descartados {r['dropped']}  "
+          f"atraso após o fim da publicação {r['lag_s']:.2f} s")
+    print(f"  ingestão (chegada->fim do worker): p50={r['p50']:.3f} ms  p99={r['p99']:.3f} ms")
+    if r["sample"] is not None:
+        print(f"  exemplo: {r['sample']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
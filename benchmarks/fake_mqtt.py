@@ -0,0 +1,139 @@
+"""
+Broker MQTT em processo e cliente com a mesma interface usada do paho
+(on_connect / on_message / on_publish, connect, connect_async, loop_start, subscribe, publish...).
+
+Cada cliente tem uma thread de rede própria, como o loop_start() do paho: as
+mensagens entregues a ele são chamadas em on_message a partir dessa thread.
+"""
+import itertools
+import queue
+import threading
+import time
+
+from paho.mqtt.client import topic_matches_sub
+
+
+class FakeMessage:
+    __slots__ = ("topic", "payload", "qos", "retain", "timestamp", "mid")
+
+    def __init__(self, topic, payload, qos=0, retain=False, mid=0):
+        self.topic = topic
+        self.payload = payload if isinstance(payload, bytes) else str(payload).encode()
+        self.qos = qos
+        self.retain = retain
+        self.timestamp = time.perf_counter()   # instante da publicação
+        self.mid = mid
+
+
+class FakeBroker:
+    def __init__(self):
+        self._subs = []          # (filtro, cliente)
+        self._retained = {}
+        self._lock = threading.Lock()
+        self._route_cache = {}   # tópico -> [clientes]
+        self.published = 0
+        self.topics = {}         # contagem de publicações por tópico (comandos etc.)
+
+    def subscribe(self, client, topic_filter):
+        with self._lock:
+            self._subs.append((topic_filter, client))
+            self._route_cache.clear()
+            retained = [m for t, m in self._retained.items() if topic_matches_sub(topic_filter, t)]
+        for m in retained:
+            client._deliver(m)
+
+    def publish(self, msg: FakeMessage, sender=None):
+        self.published += 1
+        self.topics[msg.topic] = self.topics.get(msg.topic, 0) + 1
+        with self._lock:
+            if msg.retain:
+                self._retained[msg.topic] = msg
+            targets = self._route_cache.get(msg.topic)
+            if targets is None:
+                seen = []
+                for f, c in self._subs:
+                    if c not in seen and topic_matches_sub(f, msg.topic):
+                        seen.append(c)
+                targets = self._route_cache[msg.topic] = seen
+        for c in targets:
+            c._deliver(msg)
+
+
+class FakeMqttClient:
+    """Substituto do paho.mqtt.client.Client ligado a um FakeBroker."""
+
+    def __init__(self, broker: FakeBroker, client_id: str = "", inbox_size: int = 0):
+        self.broker = broker
+        self.client_id = client_id
+        self.on_connect = None
+        self.on_message = None
+        self.on_publish = None
+        self.userdata = None
+        self._inbox = queue.Queue(maxsize=inbox_size)
+        self._thread = None
+        self._running = False
+        self._mid = itertools.count(1)
+        self.connected = False
+
+    # --- interface do paho usada pelo monitor ---
+    def enable_logger(self, logger=None):
+        pass
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def connect(self, host, port=1883, keepalive=60):
+        self.connected = True
+        return 0
+
+    def connect_async(self, host, port=1883, keepalive=60):
+        self.connected = True
+
+    def loop_start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"fake-mqtt-{self.client_id}", daemon=True)
+        self._thread.start()
+        if self.on_connect:
+            self._inbox.put(("connect",))
+
+    def loop_stop(self):
+        self._running = False
+        self._inbox.put(None)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+
+    def disconnect(self):
+        self.connected = False
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+        return 0, next(self._mid)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        mid = next(self._mid)
+        self.broker.publish(FakeMessage(topic, payload if payload is not None else b"", qos, retain, mid), self)
+        if self.on_publish:
+            self.on_publish(self, self.userdata, mid)
+        return 0, mid
+
+    # --- thread de rede ---
+    def _deliver(self, msg):
+        self._inbox.put(msg)
+
+    def _loop(self):
+        while self._running:
+            item = self._inbox.get()
+            if item is None:
+                break
+            if isinstance(item, tuple):
+                self.on_connect(self, self.userdata, {}, 0)
+            elif self.on_message:
+                self.on_message(self, self.userdata, item)
+
+    def pending(self) -> int:
+        return self._inbox.qsize()
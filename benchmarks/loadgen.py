@@ -0,0 +1,233 @@
+"""
+Gerador de carga: payloads sintéticos no mesmo formato do ESP32
+(sendRoomData / sendSystemStatus em cod_arduino_esp_monitor) e replay de capturas.
+
+Formato de captura (JSON Lines): {"t": segundos desde o início, "topic": ..., "payload": "..."}
+"""
+import json
+import math
+import random
+import time
+
+ESP_ROOMS = (
+    # nome, canal_tensao, pino_corrente, is20A
+    ("sala", 0, 32, False),
+    ("quarto", 1, 33, False),
+    ("cozinha", 2, 36, True),
+    ("banheiro", 3, 34, False),
+    ("area_servico", 4, 35, False),
+)
+
+
+def circuit_table(n_circuits: int):
+    """Os 5 cômodos do ESP32 e, além deles, circuitos extras <cômodo>_<n>."""
+    table = []
+    for k in range(n_circuits):
+        name, ch, pin, is20 = ESP_ROOMS[k % len(ESP_ROOMS)]
+        if k >= len(ESP_ROOMS):
+            name = f"{name}_{k // len(ESP_ROOMS)}"
+        table.append((name, ch, pin, is20))
+    return table
+
+
+class SyntheticEsp32:
+    """
+    Gera leituras plausíveis por circuito: tensão ~127 V com ruído, corrente com
+    ciclo lento + ruído e, com probabilidade `fault_rate`, um pico acima do corte.
+    """
+
+    def __init__(self, n_circuits: int = 5, seed: int = 1, fault_rate: float = 0.001):
+        self.circuits = circuit_table(n_circuits)
+        self.rnd = random.Random(seed)
+        self.fault_rate = fault_rate
+        self.t0 = time.monotonic()
+        self.relay = {c[0]: True for c in self.circuits}
+        self._last_ms = {}
+
+    def millis(self) -> int:
+        return int((time.monotonic() - self.t0) * 1000)
+
+    def sample_ms(self, name: str) -> int:
+        # como no ESP32, duas leituras do mesmo cômodo nunca têm o mesmo millis()
+        ms = max(self.millis(), self._last_ms.get(name, -1) + 1)
+        self._last_ms[name] = ms
+        return ms
+
+    def room_payload(self, idx: int, k: int) -> tuple[str, bytes]:
+        name, ch, pin, is20 = self.circuits[idx]
+        rnd = self.rnd
+        v = 127.0 + rnd.uniform(-2.5, 2.5)
+        i = max(0.0, 2.0 + 1.5 * math.sin(k / 50.0 + idx) + rnd.uniform(-0.2, 0.2))
+        if rnd.random() < self.fault_rate:
+            i = 25.0
+        d = {
+            "comodo": name,
+            "tensao": round(v * 100.0) / 100.0,
+            "corrente": round(i * 1000.0) / 1000.0,
+            "timestamp": self.sample_ms(name),
+            "relay_estado": self.relay[name],
+            "canal_tensao": ch,
+            "pino_corrente": pin,
+            "falha_corrente": False,
+            "falha_tensao": False,
+            "sensor_tipo": "ACS712_20A" if is20 else "ACS712_5A",
+        }
+        return f"energy/room/{name}", json.dumps(d, separators=(",", ":")).encode()
+
+    def batch_payload(self, idx: int, k: int, n: int) -> tuple[str, bytes]:
+        """n leituras do circuito idx num lote struct (energy/room/<cômodo>/batch)."""
+        from decoders import encode_batch_struct
+        from ringbuffer import FAULT_CURRENT, FAULT_VOLTAGE
+
+        name = self.circuits[idx][0]
+        rows = []
+        for j in range(n):
+            d = json.loads(self.room_payload(idx, k * n + j)[1])
+            rows.append((d["timestamp"], d["tensao"], d["corrente"], int(d["relay_estado"]),
+                         (FAULT_CURRENT if d["falha_corrente"] else 0)
+                         | (FAULT_VOLTAGE if d["falha_tensao"] else 0)))
+        return f"energy/room/{name}/batch", encode_batch_struct(rows)
+
+    def waveform_payload(self, idx: int, n: int = 256, rate: float = 1500.0) -> tuple[str, bytes]:
+        """
+        Burst de ADC do circuito idx (energy/room/<cômodo>/waveform): 60 Hz, defasagem e
+        3ª/5ª harmônicas fixas por circuito, com ruído de quantização de 12 bits.
+        """
+        import numpy as np
+        from decoders import encode_waveform
+
+        name = self.circuits[idx][0]
+        rnd = self.rnd
+        phi = 0.1 + 0.6 * (idx % 7) / 6            # 0,1 a 0,7 rad (FP 0,99 a 0,76)
+        h3, h5 = 0.05 * (idx % 5), 0.03 * (idx % 3)
+        skew = 25e-6
+        t = np.arange(n) / rate + rnd.uniform(0, 1 / 60)
+        v = 127.0 * np.sqrt(2) * np.sin(2 * np.pi * 60 * t)
+        ti = t + skew
+        amp = 2.0 * np.sqrt(2)
+        i = amp * (np.sin(2 * np.pi * 60 * ti - phi) + h3 * np.sin(3 * 2 * np.pi * 60 * ti)
+                   + h5 * np.sin(5 * 2 * np.pi * 60 * ti))
+        v_gain, i_gain = 0.25, 0.008
+        vc = np.clip(np.rint(v / v_gain) + 2048, 0, 4095).astype(np.uint16)
+        ic = np.clip(np.rint(i / i_gain) + 2048, 0, 4095).astype(np.uint16)
+        return f"energy/room/{name}/waveform", encode_waveform(self.millis(), rate, skew, v_gain, i_gain,
+                                                               vc.tolist(), ic.tolist())
+
+    def status_payload(self) -> tuple[str, bytes]:
+        d = {
+            "sistema": "online", "wifi_rssi": -60 + self.rnd.randint(-5, 5), "wifi_ip": "192.168.0.50",
+            "uptime": self.millis(), "versao": "3.7-hyst-grace",
+            "sim_fault_I": False, "sim_fault_V": False,
+            "reles": [{"comodo": name, "estado": self.relay[name], "pino": 4, "canal_tensao": ch,
+                       "pino_corrente": pin, "sensor": "20A" if is20 else "5A"}
+                      for name, ch, pin, is20 in self.circuits],
+        }
+        return "energy/system/status", json.dumps(d, separators=(",", ":")).encode()
+
+    def relay_payload(self, name: str) -> tuple[str, bytes]:
+        d = {"comodo": name, "relay_estado": self.relay[name], "timestamp": self.millis()}
+        return f"energy/relay/status/{name}", json.dumps(d, separators=(",", ":")).encode()
+
+
+def publish_synthetic(client, gen: SyntheticEsp32, rate: float, duration: float,
+                      status_every: float = 5.0, batch: int = 0) -> int:
+    """
+    Publica leituras em `rate` msg/s (0 = o mais rápido possível) por `duration` s.
+    Com batch > 0 cada mensagem é um lote de `batch` leituras. Devolve o nº de leituras.
+    """
+    n = len(gen.circuits)
+    sent = 0
+    k = 0
+    start = time.perf_counter()
+    next_status = start
+    period = 1.0 / rate if rate > 0 else 0.0
+    while True:
+        now = time.perf_counter()
+        if now - start >= duration:
+            break
+        if now >= next_status:
+            client.publish(*gen.status_payload())
+            next_status += status_every
+        if batch:
+            topic, payload = gen.batch_payload(k % n, k // n, batch)
+        else:
+            topic, payload = gen.room_payload(k % n, k // n)
+        client.publish(topic, payload)
+        k += 1
+        sent += batch or 1
+        if period:
+            target = start + k * period
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return sent
+
+
+def load_capture(path: str) -> list[tuple[float, str, bytes]]:
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                out.append((float(rec["t"]), rec["topic"], rec["payload"].encode()))
+    return out
+
+
+def replay_capture(client, records, speed: float = 1.0) -> int:
+    """Republica uma captura. speed=1 tempo real, 10 = 10x mais rápido, 0 = sem espera."""
+    start = time.perf_counter()
+    for t, topic, payload in records:
+        if speed > 0:
+            delay = t / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        client.publish(topic, payload)
+    return len(records)
+
+
+def record_capture(host: str, port: int, path: str, duration: float, topics=("energy/#",)):
+    """Grava o tráfego de um broker real no formato de captura (requer paho)."""
+    import paho.mqtt.client as mqtt
+
+    f = open(path, "w", encoding="utf-8")
+    start = time.monotonic()
+
+    def on_message(client, userdata, msg):
+        f.write(json.dumps({"t": round(time.monotonic() - start, 4), "topic": msg.topic,
+                            "payload": msg.payload.decode(errors="replace")}) + "\n")
+
+    client = mqtt.Client(clean_session=True)
+    client.on_connect = lambda c, u, fl, rc: [c.subscribe(t) for t in topics]
+    client.on_message = on_message
+    client.connect(host, port, keepalive=60)
+    client.loop_start()
+    try:
+        time.sleep(duration)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        f.close()
+
+
+def attach_fake_esp32(client, gen: SyntheticEsp32):
+    """
+    Faz um cliente responder como o ESP32 aos comandos energy/control/<cômodo>:
+    atualiza o relé e publica o status retido em energy/relay/status/<cômodo>.
+    """
+    def on_message(c, userdata, msg):
+        room = msg.topic.rsplit("/", 1)[-1]
+        cmd = msg.payload.decode(errors="replace")
+        if room in gen.relay and cmd in ("ON", "OFF"):
+            gen.relay[room] = cmd == "ON"
+            topic, payload = gen.relay_payload(room)
+            c.publish(topic, payload, retain=True)
+        elif room in ("relay", "emergency"):
+            on = room == "relay" and cmd == "ON"
+            for name in gen.relay:
+                gen.relay[name] = on
+                topic, payload = gen.relay_payload(name)
+                c.publish(topic, payload, retain=True)
+
+    client.on_connect = lambda c, u, fl, rc: c.subscribe("energy/control/#")
+    client.on_message = on_message
@@ -0,0 +1,219 @@
+"""
+Linha do tempo por dispositivo: relógio do ESP32 -> horário do host, reordenação e
+deduplicação de amostras.
+
+O ESP32 manda millis() (32 bits, volta a zero a cada ~49,7 dias e no reinício). Para
+cada circuito o modelo é  host ≈ t_disp + offset + deriva · (t_disp - ref):
+- atraso de rede e de fila só somam, então o offset é a envoltória inferior de
+  (chegada - t_disp): mínimo por janela de `window_s`, com reta ajustada sobre as
+  últimas `windows` janelas (a inclinação é a deriva do cristal, em ppm);
+- chegada abaixo da reta corrige o offset na hora (o host nunca vê a amostra antes
+  de ela existir); janela inteira acima da reta por mais de `step_s` reinicia o
+  ajuste (relógio do host ajustado, NTP). Janela só com amostras de lote chegadas
+  atrasadas (reenvio depois de uma queda) não entra no ajuste se o dispositivo
+  também manda leituras avulsas.
+Leitura avulsa com millis() bem menor que a anterior = ESP32 reiniciou: começa uma
+época nova (lotes podem trazer amostras antigas sem isso significar reinício).
+
+A chave de deduplicação é (época, millis contínuos). As últimas `max_keys` chaves
+ficam num array ordenado: amostra nova entra no fim em O(1), reenvio de um lote é
+busca binária. Chave mais antiga que todas as guardadas não dá para checar e é
+descartada.
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+WRAP_MS = 1 << 32
+_HALF_WRAP = 1 << 31
+_EPOCH = 1 << 48            # chave = época * _EPOCH + ms contínuos
+
+
+class DeviceClock:
+    def __init__(self, window_s: float = 60.0, windows: int = 30, step_s: float = 2.0, reboot_s: float = 10.0):
+        self.window_s = window_s
+        self.step_s = step_s
+        self.reboot_ms = reboot_s * 1000.0
+        self.epoch = 0
+        self._points = deque(maxlen=windows)    # (t_disp, menor chegada - t_disp) por janela fechada
+        self._last_ms = None
+        self._wraps = 0
+        self._reset_model()
+
+    def _reset_model(self):
+        self._points.clear()
+        self._win = None
+        self._win_t = self._win_min = 0.0
+        self._win_live = False
+        self._live_seen = False
+        self._a = None              # offset em _ref (s)
+        self._b = 0.0               # deriva (s/s)
+        self._ref = 0.0
+
+    # ------------------------- millis() -------------------------
+    def unwrap(self, ms: int, live: bool = True) -> int:
+        """millis() de 32 bits -> ms contínuos da época atual."""
+        last = self._last_ms
+        if last is None:
+            self._last_ms = ms
+        else:
+            d = ms - last
+            if d < -_HALF_WRAP:             # passou de 2^32 e voltou a zero
+                self._wraps += 1
+                self._last_ms = ms
+            elif d > _HALF_WRAP:            # amostra atrasada de antes da virada
+                return (self._wraps - 1) * WRAP_MS + ms
+            elif d > 0:
+                self._last_ms = ms
+            elif live and -d > self.reboot_ms:
+                self.epoch += 1
+                self._wraps = 0
+                self._last_ms = ms
+                self._reset_model()
+        return self._wraps * WRAP_MS + ms
+
+    def key(self, unwrapped_ms: int) -> int:
+        return self.epoch * _EPOCH + unwrapped_ms
+
+    # ------------------------- modelo -------------------------
+    def offset_at(self, t: float) -> float:
+        return self._a + self._b * (t - self._ref)
+
+    def observe(self, t: float, arrival: float, live: bool = True):
+        """t: tempo do dispositivo (s, contínuo); arrival: time.time() na chegada."""
+        o = arrival - t
+        win = int(t // self.window_s)
+        if win != self._win:
+            if self._win is not None and (self._win_live or not self._live_seen):
+                self._close_window()
+            self._win, self._win_t, self._win_min, self._win_live = win, t, o, live
+        else:
+            if o < self._win_min:
+                self._win_t, self._win_min = t, o
+            self._win_live |= live
+        self._live_seen |= live
+        if self._a is None:
+            self._a, self._ref = o, t
+        elif o < self.offset_at(t):
+            self._a += o - self.offset_at(t)
+
+    def _close_window(self):
+        t, o = self._win_t, self._win_min
+        if self._points and o - self.offset_at(t) > self.step_s:
+            self._points.clear()
+        self._points.append((t, o))
+        n = len(self._points)
+        if n == 1:
+            self._a, self._b, self._ref = o, 0.0, t
+            return
+        mt = sum(p[0] for p in self._points) / n
+        mo = sum(p[1] for p in self._points) / n
+        stt = sum((p[0] - mt) ** 2 for p in self._points)
+        self._b = sum((p[0] - mt) * (p[1] - mo) for p in self._points) / stt if stt > 0 else 0.0
+        # reta apoiada no menor resíduo: continua sendo envoltória inferior
+        self._a = min(p[1] - self._b * (p[0] - mt) for p in self._points)
+        self._ref = mt
+
+    def to_host(self, t: float, arrival: float) -> float:
+        if self._a is None:
+            return arrival
+        return min(t + self.offset_at(t), arrival)
+
+    @property
+    def offset(self) -> float | None:
+        return None if self._a is None else self._a
+
+    @property
+    def drift_ppm(self) -> float:
+        """Positivo: o relógio do dispositivo adianta em relação ao host (o offset cai)."""
+        return -self._b * 1e6
+
+
+class SeenKeys:
+    """Chaves (época, ms) já aceitas, ordenadas; guarda as `max_keys` mais recentes."""
+
+    def __init__(self, max_keys: int = 8192):
+        self.max_keys = max_keys
+        self._keys = array("q")
+
+    def add(self, key: int) -> bool | None:
+        """True = nova; False = duplicada; None = mais antiga que tudo o que está guardado."""
+        keys = self._keys
+        if not keys or key > keys[-1]:
+            keys.append(key)
+        else:
+            if key < keys[0] and len(keys) >= self.max_keys:
+                return None
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                return False
+            keys.insert(i, key)
+        if len(keys) > self.max_keys + 1024:    # apara em blocos (del no início é memmove)
+            del keys[:len(keys) - self.max_keys]
+        return True
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class DeviceTimeline:
+    """
+    Estado de ingestão de um circuito (usado só pelo worker dono do circuito).
+
+    place() dá o horário do host de uma amostra (ou None se duplicada / antiga demais).
+    push() segura a amostra por `hold_s` para as atrasadas entrarem na ordem;
+    pop_due() libera em ordem de tempo. Amostra anterior à última liberada não entra
+    mais na sequência ao vivo: push() devolve False e ela vai para o preenchimento
+    retroativo (histórico e lacunas de energia).
+    """
+
+    def __init__(self, hold_s: float = 0.5, window_s: float = 60.0, windows: int = 30, max_keys: int = 8192):
+        self.hold_s = hold_s
+        self.clock = DeviceClock(window_s, windows)
+        self.seen = SeenKeys(max_keys)
+        self._heap = []
+        self._seq = 0
+        self._newest = -math.inf
+        self.released_ts = -math.inf
+        self.duplicates = 0
+        self.stale = 0
+        self.reordered = 0
+        self.late = 0
+
+    def place(self, device_ms: int, arrival: float, live: bool = True) -> float | None:
+        ms = self.clock.unwrap(device_ms, live)
+        new = self.seen.add(self.clock.key(ms))
+        if not new:
+            if new is None:
+                self.stale += 1
+            else:
+                self.duplicates += 1
+            return None
+        t = ms / 1000.0
+        self.clock.observe(t, arrival, live)
+        return self.clock.to_host(t, arrival)
+
+    def push(self, ts: float, item) -> bool:
+        if ts <= self.released_ts:
+            self.late += 1
+            return False
+        if ts < self._newest:
+            self.reordered += 1
+        else:
+            self._newest = ts
+        self._seq += 1
+        heapq.heappush(self._heap, (ts, self._seq, item))
+        return True
+
+    def pop_due(self, now: float) -> list:
+        heap, limit, out = self._heap, now - self.hold_s, []
+        while heap and heap[0][0] <= limit:
+            ts, _, item = heapq.heappop(heap)
+            self.released_ts = ts
+            out.append((ts, item))
+        return out
+
+    def pending(self) -> int:
+        return len(self._heap)
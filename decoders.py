@@ -0,0 +1,190 @@
+"""
+Decodificação dos payloads de leitura direto para o registro numérico da amostra.
+
+Formatos:
+  JSON (energy/room/<cômodo>)          – uma leitura por mensagem, como o ESP32 publica hoje.
+                                         Só os campos numéricos são extraídos; os constantes
+                                         (comodo, canal_tensao, pino_corrente, sensor_tipo) são ignorados.
+                                         Chaves na ordem do firmware: comodo, tensao, corrente,
+                                         timestamp, relay_estado, canal_tensao, pino_corrente,
+                                         falha_corrente, falha_tensao, sensor_tipo.
+  Lote (energy/room/<cômodo>/batch)    – várias leituras por mensagem, em struct empacotado
+                                         ou CBOR (se o pacote cbor2 estiver instalado).
+
+Lote struct (little-endian):
+  cabeçalho  "EB" | versão u8 (=1) | n u16
+  n registros de 14 bytes: timestamp u32 (millis do ESP32) | tensao f32 | corrente f32 |
+                           relay_estado i8 (1/0/-1) | falhas u8 (bit0 corrente, bit1 tensão)
+
+Lote CBOR: array de arrays [timestamp, tensao, corrente, relay_estado, falhas].
+
+Burst de forma de onda (energy/room/<cômodo>/waveform), little-endian:
+  cabeçalho  "WF" | versão u8 (=1) | reservado u8 | n u16 | timestamp u32 (millis) |
+             taxa f32 (amostras/s por canal) | atraso_i f32 (s entre a leitura de V e a de I) |
+             ganho_v f32 (V por contagem) | ganho_i f32 (A por contagem)
+  n × u16 tensão (contagens do ADC) seguidos de n × u16 corrente
+"""
+import json
+import re
+import struct
+
+from ringbuffer import FAULT_CURRENT, FAULT_VOLTAGE
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class RoomSample:
+    __slots__ = ("device_ms", "voltage", "current", "relay", "faults")
+
+    def __init__(self, device_ms, voltage, current, relay=-1, faults=0):
+        self.device_ms = device_ms      # millis() do ESP32 (ou None)
+        self.voltage = voltage
+        self.current = current
+        self.relay = relay              # 1 ligado, 0 desligado, -1 desconhecido
+        self.faults = faults
+
+    def __repr__(self):
+        return (f"RoomSample(device_ms={self.device_ms}, voltage={self.voltage}, "
+                f"current={self.current}, relay={self.relay}, faults={self.faults})")
+
+
+# ------------------------------ JSON ---------------------------------------
+# gramática de número do JSON; strings só ASCII imprimível sem escapes
+_INT = rb'-?(?:0|[1-9][0-9]*)'
+_NUM = rb'(' + _INT + rb'(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)'
+_STR = rb'"[ !#-\[\]-~]*"'
+_LAYOUT = re.compile(
+    rb'\{"comodo":' + _STR + rb',"tensao":' + _NUM + rb',"corrente":' + _NUM
+    + rb',"timestamp":(0|[1-9][0-9]*),"relay_estado":(true|false),"canal_tensao":' + _INT
+    + rb',"pino_corrente":' + _INT + rb',"falha_corrente":(true|false),"falha_tensao":(true|false)'
+    rb'(?:,"sensor_tipo":' + _STR + rb')?\}')
+
+
+def decode_room_json(payload: bytes) -> RoomSample:
+    """
+    Um único match, do primeiro ao último byte, contra o layout exato que o ESP32
+    serializa (ArduinoJson, sem espaços), sem montar o dict nem decodificar para str.
+    Qualquer outra forma (ordem, espaços, escapes, null, campos faltando, lixo depois
+    do objeto) cai em decode_room_json_full, então os dois decodificadores dão o mesmo
+    resultado.
+    """
+    m = _LAYOUT.fullmatch(payload)
+    if m is None:
+        return decode_room_json_full(payload)
+    v, i, ts, relay, fault_i, fault_v = m.groups()
+    voltage, current = float(v), float(i)
+    if (not voltage and v[:1] == b"-") or (not current and i[:1] == b"-"):
+        return decode_room_json_full(payload)     # "-0" é int 0 no json.loads, não -0.0
+    return RoomSample(int(ts), voltage, current, 1 if relay == b"true" else 0,
+                      (FAULT_CURRENT if fault_i == b"true" else 0)
+                      | (FAULT_VOLTAGE if fault_v == b"true" else 0))
+
+
+def decode_room_json_full(payload: bytes) -> RoomSample:
+    data = json.loads(payload.decode())
+    relay = data.get('relay_estado')
+    ts = data.get('timestamp')
+    return RoomSample(
+        int(ts) if ts is not None else None,
+        float(data.get('tensao', 0)),
+        float(data.get('corrente', 0)),
+        -1 if relay is None else int(bool(relay)),
+        (FAULT_CURRENT if data.get('falha_corrente') else 0)
+        | (FAULT_VOLTAGE if data.get('falha_tensao') else 0))
+
+
+# ------------------------------ LOTE ---------------------------------------
+BATCH_MAGIC = b"EB"
+BATCH_VERSION = 1
+_HEADER = struct.Struct("<2sBH")
+_RECORD = struct.Struct("<IffbB")
+
+
+def encode_batch_struct(samples) -> bytes:
+    """samples: iterável de (device_ms, tensao, corrente, relay, falhas)."""
+    samples = list(samples)
+    return _HEADER.pack(BATCH_MAGIC, BATCH_VERSION, len(samples)) + b"".join(
+        _RECORD.pack(int(ms) & 0xFFFFFFFF, v, i, relay, faults) for ms, v, i, relay, faults in samples)
+
+
+def decode_batch_struct(payload: bytes) -> list[RoomSample]:
+    magic, version, n = _HEADER.unpack_from(payload)
+    if magic != BATCH_MAGIC or version != BATCH_VERSION:
+        raise ValueError("lote struct com cabeçalho inválido")
+    body = memoryview(payload)[_HEADER.size:_HEADER.size + n * _RECORD.size]
+    if len(body) != n * _RECORD.size:
+        raise ValueError("lote struct truncado")
+    return [RoomSample(ms, v, i, relay, faults) for ms, v, i, relay, faults in _RECORD.iter_unpack(body)]
+
+
+def encode_batch_cbor(samples) -> bytes:
+    if cbor2 is None:
+        raise RuntimeError("cbor2 não instalado (pip install cbor2)")
+    return cbor2.dumps([list(s) for s in samples])
+
+
+def decode_batch_cbor(payload: bytes) -> list[RoomSample]:
+    if cbor2 is None:
+        raise RuntimeError("cbor2 não instalado (pip install cbor2)")
+    return [RoomSample(int(ms), float(v), float(i), int(relay), int(faults))
+            for ms, v, i, relay, faults in cbor2.loads(payload)]
+
+
+def decode_batch(payload: bytes) -> list[RoomSample]:
+    """Detecta o formato pelo primeiro byte: "EB" = struct, 0x80-0x9f = array CBOR."""
+    if payload[:2] == BATCH_MAGIC:
+        return decode_batch_struct(payload)
+    if payload and 0x80 <= payload[0] <= 0x9f:
+        return decode_batch_cbor(payload)
+    raise ValueError("formato de lote desconhecido")
+
+
+# ------------------------------ FORMA DE ONDA ------------------------------
+WAVEFORM_MAGIC = b"WF"
+WAVEFORM_VERSION = 1
+_WF_HEADER = struct.Struct("<2sBBHIffff")
+
+
+class WaveformBurst:
+    __slots__ = ("device_ms", "sample_rate", "skew_s", "v_gain", "i_gain", "v_counts", "i_counts")
+
+    def __init__(self, device_ms, sample_rate, skew_s, v_gain, i_gain, v_counts, i_counts):
+        self.device_ms = device_ms
+        self.sample_rate = sample_rate
+        self.skew_s = skew_s
+        self.v_gain = v_gain
+        self.i_gain = i_gain
+        self.v_counts = v_counts        # memoryview u16 (sem cópia)
+        self.i_counts = i_counts
+
+
+def encode_waveform(device_ms, sample_rate, skew_s, v_gain, i_gain, v_counts, i_counts) -> bytes:
+    n = len(v_counts)
+    if len(i_counts) != n:
+        raise ValueError("tensão e corrente com tamanhos diferentes")
+    return (_WF_HEADER.pack(WAVEFORM_MAGIC, WAVEFORM_VERSION, 0, n, int(device_ms) & 0xFFFFFFFF,
+                            sample_rate, skew_s, v_gain, i_gain)
+            + struct.pack(f"<{n}H", *v_counts) + struct.pack(f"<{n}H", *i_counts))
+
+
+def decode_waveform(payload: bytes) -> WaveformBurst:
+    if len(payload) < _WF_HEADER.size:
+        raise ValueError("burst de forma de onda truncado")
+    magic, version, _, n, ms, rate, skew, v_gain, i_gain = _WF_HEADER.unpack_from(payload)
+    if magic != WAVEFORM_MAGIC or version != WAVEFORM_VERSION:
+        raise ValueError("burst de forma de onda com cabeçalho inválido")
+    body = memoryview(payload)[_WF_HEADER.size:]
+    if len(body) != 4 * n:
+        raise ValueError("burst de forma de onda truncado")
+    counts = body.cast("H")     # ESP32 e PCs são little-endian
+    return WaveformBurst(ms, rate, skew, v_gain, i_gain, counts[:n], counts[n:])
+
+
+# Decodificadores de leitura única por nome (seleção em EnergyMonitorCore.ROOM_DECODER)
+ROOM_DECODERS = {
+    "json": decode_room_json,
+    "json_full": decode_room_json_full,
+}
@@ -0,0 +1,190 @@
+import time
+from collections import deque
+
+# Intervalo máximo entre duas leituras que ainda é integrado. O ESP32 publica a cada
+# ~5 s; acima disso (queda de Wi-Fi / broker) o trecho é tratado como lacuna.
+MAX_GAP_S = 60.0
+
+
+class TariffSchedule:
+    """
+    Tarifa em R$/kWh, fixa ou por posto horário (ex.: tarifa branca).
+
+    Os postos são definidos por hora cheia para dias úteis; fins de semana usam
+    sempre o posto fora de ponta. rate_at() é O(1): o posto da hora corrente fica
+    em cache, numa tupla (início, fim, posto) trocada numa única atribuição, porque o
+    mesmo objeto é lido por todos os workers. Para mudar a tarifa, crie um novo
+    objeto e troque a referência (o worker pode estar lendo este ao mesmo tempo).
+    """
+
+    OFF_PEAK = "fora_ponta"
+    INTERMEDIATE = "intermediario"
+    PEAK = "ponta"
+
+    def __init__(self, flat_rate: float = 0.65):
+        self.rates = {self.OFF_PEAK: flat_rate}
+        self.weekday_bands = [self.OFF_PEAK] * 24
+        self._cache = (0.0, 0.0, self.OFF_PEAK)
+
+    @classmethod
+    def tarifa_branca(cls, off_peak: float = 0.55, intermediate: float = 0.80,
+                      peak: float = 1.25, peak_start: int = 18, peak_hours: int = 3):
+        """Ponta de 3 h (padrão 18h-21h) com 1 h intermediária antes e depois, em dias úteis."""
+        s = cls(off_peak)
+        s.rates.update({cls.INTERMEDIATE: intermediate, cls.PEAK: peak})
+        for h in range(peak_start, peak_start + peak_hours):
+            s.weekday_bands[h % 24] = cls.PEAK
+        s.weekday_bands[(peak_start - 1) % 24] = cls.INTERMEDIATE
+        s.weekday_bands[(peak_start + peak_hours) % 24] = cls.INTERMEDIATE
+        return s
+
+    @property
+    def is_flat(self) -> bool:
+        return len(self.rates) == 1
+
+    def band_at(self, ts: float) -> str:
+        start, end, band = self._cache
+        if start <= ts < end:
+            return band
+        lt = time.localtime(ts)
+        band = self.OFF_PEAK if lt.tm_wday >= 5 else self.weekday_bands[lt.tm_hour]
+        start = ts - lt.tm_min * 60 - lt.tm_sec - (ts % 1.0)
+        self._cache = (start, start + 3600.0, band)
+        return band
+
+    def rate_at(self, ts: float) -> float:
+        return self.rates[self.band_at(ts)]
+
+
+class EnergyAccumulator:
+    """
+    Integrador de energia de um circuito, atualizado em O(1) por leitura.
+
+    Usa a regra do trapézio entre leituras consecutivas; lacunas maiores que
+    MAX_GAP_S não são integradas e, com o relé desligado, a potência conta como zero
+    (o ACS712 tem ruído de fundo). Mantém totais do dia e do mês correntes,
+    em kWh e em R$ por posto tarifário.
+
+    As últimas lacunas ficam guardadas; leituras que chegam depois (lote reenviado
+    pelo ESP32 ao reconectar) são integradas dentro delas por backfill().
+    """
+
+    def __init__(self, schedule: TariffSchedule, max_gap_s: float = MAX_GAP_S):
+        self.schedule = schedule
+        self.max_gap_s = max_gap_s
+        self.total_kwh = 0.0
+        self.day_kwh = 0.0
+        self.day_cost = 0.0
+        self.month_kwh = 0.0
+        self.month_cost = 0.0
+        self.month_kwh_by_band = {}
+        self.gaps = 0
+        self.open_gaps = deque(maxlen=16)   # (t0, p0, t1, p1) não integrados
+        self.last_ts = None
+        self.last_power = 0.0
+        self._day_start = self._day_end = 0.0
+        self._month_start = self._month_end = 0.0
+
+    def add(self, ts: float, power: float, relay: int = -1):
+        if relay == 0:
+            power = 0.0
+        prev_ts = self.last_ts
+        if prev_ts is not None and ts <= prev_ts:
+            return          # fora de ordem / duplicada
+        if ts >= self._day_end:
+            self._roll_period(ts)
+        if prev_ts is not None:
+            dt = ts - prev_ts
+            if dt > self.max_gap_s:
+                self.gaps += 1
+                self.open_gaps.append((prev_ts, self.last_power, ts, power))
+            else:
+                kwh = (self.last_power + power) * 0.5 * dt / 3_600_000.0
+                schedule = self.schedule
+                band = schedule.band_at(prev_ts)
+                cost = kwh * schedule.rates[band]
+                self.total_kwh += kwh
+                self.day_kwh += kwh
+                self.day_cost += cost
+                self.month_kwh += kwh
+                self.month_cost += cost
+                self.month_kwh_by_band[band] = self.month_kwh_by_band.get(band, 0.0) + kwh
+        self.last_ts = ts
+        self.last_power = power
+
+    def backfill(self, points) -> float:
+        """
+        points: [(ts, potência)] em ordem de tempo, chegados fora da sequência.
+        Só os que caem numa lacuna guardada são integrados (o resto já foi coberto
+        pelo trapézio ao vivo); o que sobrar de lacuna > max_gap_s continua aberto.
+        Devolve os kWh acrescentados.
+        """
+        if not self.open_gaps or not points:
+            return 0.0
+        added = 0.0
+        remaining = []
+        for t0, p0, t1, p1 in self.open_gaps:
+            seq = [(t0, p0)] + [(t, p) for t, p in points if t0 < t < t1] + [(t1, p1)]
+            if len(seq) == 2:
+                remaining.append((t0, p0, t1, p1))
+                continue
+            for (ta, pa), (tb, pb) in zip(seq, seq[1:]):
+                dt = tb - ta
+                if dt > self.max_gap_s:
+                    remaining.append((ta, pa, tb, pb))
+                    continue
+                kwh = (pa + pb) * 0.5 * dt / 3_600_000.0
+                band = self.schedule.band_at(ta)
+                cost = kwh * self.schedule.rates[band]
+                self.total_kwh += kwh
+                added += kwh
+                if ta >= self._day_start:
+                    self.day_kwh += kwh
+                    self.day_cost += cost
+                if ta >= self._month_start:
+                    self.month_kwh += kwh
+                    self.month_cost += cost
+                    self.month_kwh_by_band[band] = self.month_kwh_by_band.get(band, 0.0) + kwh
+        self.open_gaps.clear()
+        self.open_gaps.extend(remaining)
+        return added
+
+    def seed(self, hours, now: float | None = None):
+        """
+        Retoma os totais do dia e do mês depois de reiniciar o monitor.
+        hours: [(início da hora, Wh)] das agregações de 1 h do histórico; o custo usa o
+        posto tarifário de cada hora.
+        """
+        now = time.time() if now is None else now
+        self._roll_period(now)
+        schedule = self.schedule
+        for start, wh in hours:
+            if not wh or start < self._month_start or start >= self._day_end:
+                continue
+            kwh = wh / 1000.0
+            band = schedule.band_at(start)
+            cost = kwh * schedule.rates[band]
+            self.month_kwh += kwh
+            self.month_cost += cost
+            self.month_kwh_by_band[band] = self.month_kwh_by_band.get(band, 0.0) + kwh
+            if start >= self._day_start:
+                self.day_kwh += kwh
+                self.day_cost += cost
+
+    def _roll_period(self, ts: float):
+        lt = time.localtime(ts)
+        midnight = self._day_start = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1))
+        self._day_end = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        if self.last_ts is not None and self.last_ts < midnight:
+            self.day_kwh = self.day_cost = 0.0
+        if ts >= self._month_end:
+            if self._month_end:
+                self.month_kwh = self.month_cost = 0.0
+                self.month_kwh_by_band = {}
+            self._month_start = time.mktime((lt.tm_year, lt.tm_mon, 1, 0, 0, 0, 0, 0, -1))
+            self._month_end = time.mktime((lt.tm_year, lt.tm_mon + 1, 1, 0, 0, 0, 0, 0, -1))
+
+    def cost_per_hour(self, ts: float | None = None) -> float:
+        """Custo por hora na potência atual, com a tarifa do posto vigente."""
+        ts = time.time() if ts is None else ts
+        return self.last_power / 1000.0 * self.schedule.rate_at(ts)
@@ -0,0 +1,325 @@
+"""
+Log de eventos persistente: logs e status do ESP32, alertas (do ESP32 e do monitor),
+comandos de relé e quedas de conexão, num SQLite próprio (<db>_eventos.db, separado
+do histórico para as duas gravações não disputarem o mesmo lock).
+
+add() só enfileira numa fila limitada: fila cheia descarta e conta, nunca bloqueia
+quem chamou (callback MQTT, workers de ingestão). Uma thread grava em lotes, uma
+transação por lote. Índices por tempo, (circuito, tempo), (nível, tempo) e
+(tipo, tempo); as palavras da mensagem vão para um índice FTS5 (sem acento, sem
+diferença de maiúsculas). Sem FTS5 no SQLite a busca por palavra vira LIKE sobre o
+trecho já filtrado pelos outros índices.
+
+Uso:
+    python eventlog.py --circuit cozinha --level CRITICO --since 7d
+    python eventlog.py --search "desligamento emergencia" --since 30d
+    python eventlog.py --outages --since 30d          # quedas com o RSSI antes e depois
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from metrics import ConsoleLog
+
+LEVELS = ("INFO", "AVISO", "ALERTA", "CRITICO")
+KINDS = ("log", "status", "alerta", "comando", "conexao")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL    NOT NULL,
+    kind    TEXT    NOT NULL,   -- log, status, alerta, comando, conexao
+    level   TEXT    NOT NULL,   -- INFO, AVISO, ALERTA, CRITICO
+    circuit TEXT,               -- NULL = dispositivo / sistema inteiro
+    source  TEXT    NOT NULL,   -- esp32 ou monitor
+    message TEXT    NOT NULL,
+    data    TEXT                -- JSON (payload do ESP32, orientação, detalhes do comando)
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_circuit_ts ON events(circuit, ts);
+CREATE INDEX IF NOT EXISTS idx_events_level_ts ON events(level, ts);
+CREATE INDEX IF NOT EXISTS idx_events_kind_ts ON events(kind, ts);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    message, content='events', content_rowid='id', tokenize='unicode61 remove_diacritics 2');
+CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts(rowid, message) VALUES (new.id, new.message);
+END;
+"""
+
+EVENT_FIELDS = ("id", "ts", "kind", "level", "circuit", "source", "message", "data")
+
+
+class EventLog:
+    def __init__(self, path: str = "energia_eventos.db", batch_size: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 100_000, log=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.dropped = 0
+
+        self._read_conn = self._connect()
+        self._read_conn.executescript(SCHEMA)
+        try:
+            self._read_conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False        # SQLite compilado sem FTS5
+        self._read_lock = threading.Lock()
+
+        self._running = True
+        self._writer = threading.Thread(target=self._write_loop, name="event-log-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ----------------------------- gravação -----------------------------
+    def add(self, kind: str, level: str, message: str, circuit: str | None = None, source: str = "monitor",
+            data: dict | None = None, ts: float | None = None) -> bool:
+        """Enfileira um evento; False se a fila estava cheia (evento descartado)."""
+        try:
+            self._queue.put_nowait((time.time() if ts is None else ts, kind, level, circuit, source, message, data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = 5.0):
+        """Bloqueia até tudo que foi enfileirado até agora estar gravado."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self):
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._writer.join(10.0)
+        self._read_conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ()
+
+            if item is None or isinstance(item, threading.Event):
+                self._write_batch(conn, batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                if item is None:
+                    break
+                item.set()
+                continue
+
+            if item:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write_batch(conn, batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        if not batch:
+            return
+        rows = [(ts, kind, level, circuit, source, message,
+                 None if data is None else json.dumps(data, ensure_ascii=False, default=str))
+                for ts, kind, level, circuit, source, message, data in batch]
+        try:
+            with conn:
+                conn.executemany("INSERT INTO events (ts, kind, level, circuit, source, message, data) "
+                                 "VALUES (?,?,?,?,?,?,?)", rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            self.log(f"[EVENTOS] Erro ao gravar lote: {e}", key="events")
+
+    # ----------------------------- consultas -----------------------------
+    def query(self, t0: float | None = None, t1: float | None = None, circuit: str | None = None,
+              level=None, kind=None, keyword: str | None = None, limit: int = 1000,
+              newest_first: bool = True) -> list:
+        """
+        Eventos com os filtros dados -> [(id, ts, kind, level, circuit, source, message, data_json), ...].
+        level e kind aceitam um valor ou uma lista; keyword são palavras da mensagem (todas
+        precisam aparecer; "palavra*" casa pelo prefixo).
+        """
+        where, args = [], []
+        if t0 is not None:
+            where.append("ts >= ?")
+            args.append(t0)
+        if t1 is not None:
+            where.append("ts < ?")
+            args.append(t1)
+        if circuit is not None:
+            where.append("circuit = ?")
+            args.append(circuit)
+        for col, value in (("level", level), ("kind", kind)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            where.append(f"{col} IN ({', '.join('?' * len(values))})")
+            args.extend(values)
+        if keyword:
+            words = keyword.split()
+            if self.fts:
+                where.append("id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+                args.append(" ".join(_fts_term(w) for w in words))
+            else:
+                for w in words:
+                    where.append("message LIKE ?")
+                    args.append(f"%{w.rstrip('*')}%")
+        sql = f"SELECT {', '.join(EVENT_FIELDS)} FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY ts {'DESC' if newest_first else 'ASC'} LIMIT ?"
+        args.append(limit)
+        with self._read_lock:
+            return self._read_conn.execute(sql, args).fetchall()
+
+    def series(self, field: str, t0: float, t1: float, kind: str = "status") -> list:
+        """Campo numérico do JSON dos eventos (ex.: wifi_rssi dos status) -> [(ts, valor), ...]."""
+        with self._read_lock:
+            return self._read_conn.execute(
+                "SELECT ts, json_extract(data, ?) AS v FROM events "
+                "WHERE kind = ? AND ts >= ? AND ts < ? AND v IS NOT NULL ORDER BY ts",
+                (f"$.{field}", kind, t0, t1)).fetchall()
+
+    def outages(self, t0: float, t1: float) -> list:
+        """
+        Quedas a partir dos eventos de conexão -> [(fonte, início, fim ou None), ...].
+        fonte "monitor" = o monitor perdeu o broker; "esp32" = o broker avisou que o ESP32 caiu.
+        """
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT ts, source, json_extract(data, '$.online') FROM events "
+                "WHERE kind = 'conexao' AND ts >= ? AND ts < ? ORDER BY ts", (t0, t1)).fetchall()
+        out, start = [], {}
+        for ts, source, online in rows:
+            if online is None:
+                continue
+            if not online:
+                start.setdefault(source, ts)
+            elif source in start:
+                out.append((source, start.pop(source), ts))
+        out.extend((source, ts, None) for source, ts in start.items())
+        return sorted(out, key=lambda o: o[1])
+
+    def count(self) -> int:
+        with self._read_lock:
+            (n,) = self._read_conn.execute("SELECT COUNT(*) FROM events").fetchone()
+        return n
+
+
+def _fts_term(word: str) -> str:
+    prefix = word.endswith("*")
+    word = word.rstrip("*").replace('"', '""')
+    return f'"{word}"' + ("*" if prefix else "")
+
+
+# ------------------------------ linha de comando ------------------------------
+def _since_arg(text):
+    units = {"m": 60, "h": 3600, "d": 86400}
+    try:
+        return float(text[:-1]) * units[text[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise argparse.ArgumentTypeError("use N seguido de m, h ou d (ex.: 30m, 12h, 7d)")
+
+
+def _date_arg(text):
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError("use AAAA-MM-DD ou \"AAAA-MM-DD HH:MM\"")
+
+
+def _end_arg(text):
+    """Limite exclusivo de --to: só a data inclui o dia inteiro (vai até a meia-noite seguinte)."""
+    try:
+        lt = time.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        return _date_arg(text)
+    return time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+
+def _fmt_ts(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Consulta ao log de eventos do monitor")
+    ap.add_argument("--db", default="energia_eventos.db")
+    start = ap.add_mutually_exclusive_group()
+    start.add_argument("--since", type=_since_arg, default=None, metavar="N[m|h|d]", help="últimos N minutos/horas/dias")
+    start.add_argument("--from", dest="first", type=_date_arg, default=None, metavar="AAAA-MM-DD")
+    ap.add_argument("--to", dest="last", type=_end_arg, default=None, metavar="AAAA-MM-DD",
+                    help="até o fim deste dia (ou até \"AAAA-MM-DD HH:MM\", exclusivo)")
+    ap.add_argument("--circuit", default=None)
+    ap.add_argument("--level", default=None, help="um ou mais separados por vírgula: " + ", ".join(LEVELS))
+    ap.add_argument("--kind", default=None, help="um ou mais separados por vírgula: " + ", ".join(KINDS))
+    ap.add_argument("--search", default=None, help="palavras da mensagem (\"palavra*\" = prefixo)")
+    ap.add_argument("--limit", type=int, default=200)
+    ap.add_argument("--outages", action="store_true", help="lista as quedas com o RSSI do ESP32 antes e depois")
+    ap.add_argument("--field", default="wifi_rssi", help="campo dos status mostrado com --outages")
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"Banco não encontrado: {args.db}")
+        return 1
+    now = time.time()
+    t0 = now - args.since if args.since is not None else args.first
+    t1 = args.last
+    log = EventLog(args.db)
+    try:
+        t_q = time.perf_counter()
+        if args.outages:
+            lo, hi = t0 if t0 is not None else 0.0, t1 if t1 is not None else now
+            outages = log.outages(lo, hi)
+            for source, start, end in outages:
+                before = log.series(args.field, start - 300, start)
+                after = log.series(args.field, end, end + 300) if end is not None else []
+                dur = "em andamento" if end is None else f"{end - start:7.0f} s"
+                print(f"{_fmt_ts(start)}  {source:<7} {dur}   {args.field} antes "
+                      f"{before[-1][1] if before else '-'}  depois {after[0][1] if after else '-'}")
+            n = len(outages)
+        else:
+            split = lambda s: s.split(",") if s else None
+            rows = log.query(t0, t1, args.circuit, split(args.level), split(args.kind), args.search, args.limit)
+            for _, ts, kind, level, circuit, source, message, _ in reversed(rows):
+                print(f"{_fmt_ts(ts)}  {level:<7} {circuit or '-':<14} {kind:<8} {source:<7} {message}")
+            n = len(rows)
+        print(f"{n} resultado(s) em {(time.perf_counter() - t_q) * 1000:.1f} ms")
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets: reduz a série para n_out pontos preservando picos
+    e vales. O laço é sobre os buckets (n_out), o trabalho por bucket é vetorizado.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    every = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.intp)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        nend = min(int((i + 2) * every) + 1, n)
+        if nend > end:
+            avg_x = x[end:nend].mean()
+            avg_y = y[end:nend].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        xa, ya = x[a], y[a]
+        area = np.abs((xa - avg_x) * (y[start:end] - ya) - (xa - x[start:end]) * (avg_y - ya))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+class PowerGraphRenderer:
+    """
+    Gráfico de potência com artistas persistentes e blitting.
+
+    Cada cômodo tem um Line2D fixo (animated=True). A cada quadro só os dados das
+    linhas mudam: o fundo (eixos, grade, legenda) é restaurado do cache e apenas
+    a área dos eixos é copiada para a tela. O redesenho completo só acontece quando
+    o conjunto de cômodos, a escala Y ou o tamanho da janela mudam.
+
+    O eixo X é "segundos atrás" (-janela .. 0), por isso os limites não mudam
+    entre quadros. Janelas longas são reduzidas com LTTB para max_points por linha.
+    """
+
+    def __init__(self, fig, ax, canvas, window_s: float = 60.0, max_points: int = 400):
+        self.fig = fig
+        self.ax = ax
+        self.canvas = canvas
+        self.window_s = window_s
+        self.max_points = max_points
+        self.lines = {}
+        self._background = None
+        self._ymax = 100.0
+        self.full_draws = 0
+        self.blits = 0
+
+        ax.set_ylabel('Potência (W)')
+        ax.set_xlabel('Tempo (s)')
+        ax.grid(True, alpha=0.3)
+        ax.set_xlim(-window_s, 0)
+        ax.set_ylim(0, self._ymax)
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    # ------------------------- configuração -------------------------
+    def set_rooms(self, rooms: list[str]):
+        if list(self.lines) == list(rooms):
+            return
+        for room in list(self.lines):
+            if room not in rooms:
+                self.lines.pop(room).remove()
+        for room in rooms:
+            if room not in self.lines:
+                (line,) = self.ax.plot([], [], linewidth=2, label=room.title(), animated=True)
+                self.lines[room] = line
+        self.lines = {room: self.lines[room] for room in rooms}
+        self.ax.set_title(f"{', '.join(r.title() for r in rooms)} - Potência em Tempo Real")
+        self.ax.legend(handles=list(self.lines.values()), loc='upper left')
+        self._full_draw()
+
+    def set_window(self, window_s: float):
+        if window_s == self.window_s:
+            return
+        self.window_s = window_s
+        self.ax.set_xlim(-window_s, 0)
+        self._full_draw()
+
+    # --------------------------- quadros ----------------------------
+    def update(self, series: dict, now: float):
+        """series: {cômodo: (timestamps, potências)} com arrays/memoryviews do buffer."""
+        peak = 0.0
+        for room, line in self.lines.items():
+            ts, ps = series.get(room, ((), ()))
+            if len(ts) < 2:
+                line.set_data([], [])
+                continue
+            x = np.frombuffer(ts, dtype=np.float64) - now
+            y = np.frombuffer(ps, dtype=np.float32)
+            x, y = lttb(x, y, self.max_points)
+            line.set_data(x, y)
+            peak = max(peak, float(y.max()))
+
+        if self._rescale(peak) or self._background is None:
+            self._full_draw()
+        self._blit()
+
+    def _rescale(self, peak: float) -> bool:
+        # cresce com folga de 20%; só encolhe quando o pico cai abaixo de 40% da escala
+        if peak > self._ymax or (self._ymax > 100.0 and peak < 0.4 * self._ymax):
+            self._ymax = max(100.0, peak * 1.2)
+            self.ax.set_ylim(0, self._ymax)
+            return True
+        return False
+
+    def _full_draw(self):
+        self.full_draws += 1
+        self.canvas.draw()      # dispara draw_event -> _on_draw recaptura o fundo
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def _blit(self):
+        if self._background is None:
+            return
+        self.canvas.restore_region(self._background)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+        self.blits += 1
@@ -0,0 +1,246 @@
+"""
+Instrumentação leve do caminho quente, exposta em formato texto do Prometheus.
+
+Contadores e histogramas são agregados por thread: cada thread escreve só na sua
+própria célula (sem lock, sem disputa) e a leitura soma as células no momento da
+coleta. Gauges são funções avaliadas na coleta (ex.: profundidade das filas).
+"""
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+class Counter:
+    __slots__ = ("_local", "_cells", "_lock")
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells = []
+        self._lock = threading.Lock()
+
+    def _cell(self):
+        cell = [0]
+        with self._lock:
+            self._cells.append(cell)
+        self._local.cell = cell
+        return cell
+
+    def inc(self, n=1):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cell()
+        cell[0] += n
+
+    @property
+    def value(self):
+        return sum(c[0] for c in self._cells)
+
+
+class Histogram:
+    __slots__ = ("buckets", "_local", "_cells", "_lock")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._cells = []
+        self._lock = threading.Lock()
+
+    def _cell(self):
+        # [contagem por bucket..., +Inf, soma]
+        cell = [0] * (len(self.buckets) + 1) + [0.0]
+        with self._lock:
+            self._cells.append(cell)
+        self._local.cell = cell
+        return cell
+
+    def observe(self, value: float):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        n = len(self.buckets) + 1
+        counts = [0] * n
+        total = 0.0
+        for c in list(self._cells):
+            for k in range(n):
+                counts[k] += c[k]
+            total += c[-1]
+        return counts, total
+
+
+class _Timer:
+    __slots__ = ("h", "t0")
+
+    def __init__(self, h):
+        self.h = h
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.h.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    """Registro de métricas. counter()/histogram() devolvem sempre a mesma instância por (nome, rótulos)."""
+
+    def __init__(self, prefix: str = "energy_monitor_"):
+        self.prefix = prefix
+        self._counters = {}     # nome -> {rótulos: Counter}
+        self._histograms = {}
+        self._gauges = {}       # nome -> fn() -> número ou {rótulos: número}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        key = _labels_key(labels)
+        family = self._counters.get(name)
+        c = family.get(key) if family is not None else None
+        if c is None:
+            with self._lock:
+                family = self._counters.setdefault(name, {})
+                c = family.get(key)
+                if c is None:
+                    c = family[key] = Counter()
+                    if help:
+                        self._help[name] = help
+        return c
+
+    def histogram(self, name: str, help: str = "", buckets=LATENCY_BUCKETS, **labels) -> Histogram:
+        key = _labels_key(labels)
+        family = self._histograms.get(name)
+        h = family.get(key) if family is not None else None
+        if h is None:
+            with self._lock:
+                family = self._histograms.setdefault(name, {})
+                h = family.get(key)
+                if h is None:
+                    h = family[key] = Histogram(buckets)
+                    if help:
+                        self._help[name] = help
+        return h
+
+    def gauge(self, name: str, fn, help: str = ""):
+        self._gauges[name] = fn
+        if help:
+            self._help[name] = help
+
+    # ------------------------------ exposição ------------------------------
+    def render(self) -> str:
+        out = []
+        p = self.prefix
+        for name, family in sorted(self._counters.items()):
+            full = f"{p}{name}"
+            out.append(f"# HELP {full} {self._help.get(name, name)}")
+            out.append(f"# TYPE {full} counter")
+            for key, c in sorted(family.items()):
+                out.append(f"{full}{_fmt_labels(key)} {c.value}")
+        for name, family in sorted(self._histograms.items()):
+            full = f"{p}{name}"
+            out.append(f"# HELP {full} {self._help.get(name, name)}")
+            out.append(f"# TYPE {full} histogram")
+            for key, h in sorted(family.items()):
+                counts, total = h.snapshot()
+                acc = 0
+                for le, n in zip(h.buckets + ("+Inf",), counts):
+                    acc += n
+                    out.append(f"{full}_bucket{_fmt_labels(key, (('le', le),))} {acc}")
+                out.append(f"{full}_sum{_fmt_labels(key)} {total}")
+                out.append(f"{full}_count{_fmt_labels(key)} {acc}")
+        for name, fn in sorted(self._gauges.items()):
+            full = f"{p}{name}"
+            try:
+                value = fn()
+            except Exception:
+                continue
+            out.append(f"# HELP {full} {self._help.get(name, name)}")
+            out.append(f"# TYPE {full} gauge")
+            if isinstance(value, dict):
+                for labels, v in sorted(value.items()):
+                    out.append(f"{full}{_fmt_labels(labels)} {v}")
+            else:
+                out.append(f"{full} {value}")
+        return "\n".join(out) + "\n"
+
+
+def start_http_server(metrics: Metrics, port: int = 9108, host: str = "127.0.0.1"):
+    """Serve GET /metrics numa thread daemon. Devolve o servidor (server.shutdown() para parar)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class ConsoleLog:
+    """
+    print() opcional e limitado: no máximo `max_per_s` linhas por segundo por chave.
+    As linhas suprimidas são contadas e resumidas na próxima linha liberada.
+    """
+
+    def __init__(self, enabled: bool = True, max_per_s: float = 5.0):
+        self.enabled = enabled
+        self.max_per_s = max_per_s
+        self._windows = {}      # chave -> [início da janela, linhas na janela, suprimidas]
+        self._lock = threading.Lock()
+
+    def log(self, line: str, key: str = ""):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            w = self._windows.get(key)
+            if w is None or now - w[0] >= 1.0:
+                suppressed = w[2] if w else 0
+                w = self._windows[key] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if w[1] >= self.max_per_s:
+                w[2] += 1
+                return
+            w[1] += 1
+        if suppressed:
+            print(f"[LOG] ({suppressed} mensagens '{key or 'geral'}' suprimidas)")
+        print(line)
@@ -0,0 +1,662 @@
+"""
+Núcleo do monitor, sem interface gráfica: MQTT, ingestão, cálculo de potência,
+alertas, custos, proteção, comandos de relé, histórico, log de eventos, métricas e API.
+
+Importa só a biblioteca padrão, numpy e paho (nada de tkinter/matplotlib), então
+roda em servidor sem tela (`python cod_monitor.py --headless`) e sobe rápido.
+A janela Tk (cod_monitor.SimplifiedEnergyMonitor) é uma subclasse que sobrescreve
+os ganchos de interface (run_on_ui, on_new_circuit, on_relays_changed, on_alert).
+"""
+import json
+import math
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from pipeline import IngestPipeline
+from decoders import ROOM_DECODERS, decode_batch
+from storage import TimeSeriesStore
+from energy import TariffSchedule
+from registry import DeviceRegistry
+from alerts import AlertEngine, AlertLog, ROOM_LIMITS
+from anomaly import AnomalyDetector
+from metrics import Metrics, ConsoleLog, start_http_server
+from relay_dispatcher import RelayDispatcher
+from protection import ProtectionFastPath
+from api_server import DashboardServer
+from waveform import WaveformAnalyzer
+from clocksync import DeviceTimeline
+from eventlog import EventLog
+
+
+class EnergyMonitorCore:
+    # --------- LIMITES / POLÍTICAS DE ALERTA ----------
+    V_LOW = 90.0
+    V_HIGH = 260.0
+    I_WARN = 10.0
+    I_CUTOFF = 15.0
+    SPIKE_MIN_W = 200.0             # pico precisa passar do esperado por pelo menos isso
+    SPIKE_Z = 4.0                   # ... e por SPIKE_Z desvios-padrão
+    DRIFT_MIN_W = 100.0             # subidas sustentadas menores que isso não são deriva
+    DRIFT_WH = 50.0                 # ... e só viram deriva depois de acumular essa energia extra
+    ANOMALY_TAU_S = 21600.0         # constante de tempo da linha de base (s)
+    ANOMALY_TOD_DAYS = 14           # dias de histórico para o perfil por hora (0 desliga)
+    ANOMALY_CHECKPOINT_S = 300.0    # gravação periódica do estado do detector
+    # ---------------------------------------------------
+
+    # Histórico em memória por cômodo (5 h a 2 Hz, ~44 bytes/amostra)
+    HISTORY_CAPACITY = 36000
+
+    # Cômodos conhecidos de antemão; outros circuitos são descobertos via MQTT
+    DEFAULT_ROOMS = ('sala', 'quarto', 'cozinha', 'banheiro', 'area_servico')
+    INGEST_WORKERS = 4
+    ROOM_DECODER = "json"       # ver decoders.ROOM_DECODERS
+
+    # Linha do tempo por circuito (clocksync.py): amostras posicionadas pelo millis() do ESP32,
+    # seguradas REORDER_S para as atrasadas entrarem na ordem; as que chegam depois disso
+    # (lote reenviado após queda) vão só para o histórico e as lacunas de energia
+    REORDER_S = 0.5
+    CLOCK_WINDOW_S = 60.0
+    DEDUP_KEYS = 8192               # chaves (época, millis) guardadas por circuito
+
+    # Log de eventos (eventlog.py): status do ESP32 (a cada 5 s) entra no máximo uma vez
+    # a cada EVENT_STATUS_EVERY_S; mudança online/offline entra sempre
+    EVENT_STATUS_EVERY_S = 60.0
+
+    # Métricas em http://127.0.0.1:<porta>/metrics (None desliga)
+    METRICS_PORT = 9108
+    # Console: VERBOSE mostra cada publicação MQTT; avisos limitados a N linhas/s por nível
+    VERBOSE = False
+    CONSOLE_MAX_PER_S = 5
+
+    # Comandos de relé: reenvio sem confirmação e prazo para escalar à emergência (s)
+    RELAY_ACK_TIMEOUT = 1.0
+    RELAY_MAX_RETRIES = 3
+    RELAY_DEADLINE = 10.0
+
+    # Proteção rápida: limite (ms) entre a chegada da leitura e o OFF publicado
+    PROTECTION_BOUND_MS = 5.0
+
+    # API HTTP/WebSocket para painéis remotos (None = desligada; --api na linha de comando)
+    API_HOST = "0.0.0.0"
+    API_PORT = None
+
+    # Análise de forma de onda (bursts em energy/room/<cômodo>/waveform)
+    WAVEFORM_WORKERS = 2
+    WAVEFORM_PROCESSES = True       # False = pool de threads
+    WAVEFORM_MIN_CURRENT = 0.2      # A; abaixo disso o FP medido não substitui o configurado
+    WAVEFORM_MAX_AGE = 60.0         # s; FP medido mais velho que isso volta ao configurado
+
+    def __init__(self, client=None, db_path: str = "energia.db",
+                 metrics_port: int | None = METRICS_PORT, api_port: int | None = API_PORT):
+        # Instrumentação e console
+        self.metrics = Metrics()
+        self.console = ConsoleLog(max_per_s=self.CONSOLE_MAX_PER_S)
+        self._topic_counters = {}
+        self._connected_once = False
+        self._h_decode = self.metrics.histogram("decode_seconds", "Decodificação de payload de leitura")
+        self._h_alerts = self.metrics.histogram("alert_eval_seconds", "Avaliação de alertas por leitura")
+        self._c_disconnects = self.metrics.counter("mqtt_disconnects_total", "Desconexões do broker")
+        self._c_reconnects = self.metrics.counter("mqtt_reconnects_total", "Reconexões ao broker")
+
+        # Configurações MQTT
+        self.mqtt_broker = "seu ip da rede"
+        self.mqtt_port = 1883
+        self.mqtt_user = ""            # deixe vazio se não usa auth
+        self.mqtt_password = ""
+
+        # Cliente MQTT
+        self.client = client if client is not None else mqtt.Client(clean_session=True)
+        self.client.enable_logger()  # log básico no console
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.on_publish = self.on_publish
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_connect_fail = self.on_connect_fail
+        self.client.reconnect_delay_set(min_delay=1, max_delay=10)
+
+        # Fator de potência por cômodo (circuitos novos usam 0.85)
+        self.power_factors = {
+            'sala': 0.85,
+            'quarto': 0.90,
+            'cozinha': 0.80,
+            'banheiro': 0.95,
+            'area_servico': 0.75
+        }
+
+        # Limites por cômodo (alerts.ROOM_LIMITS, compartilhados com report.py)
+        self.room_limits = {room: dict(lim) for room, lim in ROOM_LIMITS.items()}
+
+        # Linha de base por circuito (EWMA + CUSUM), recarregada do último checkpoint
+        self.anomaly = AnomalyDetector(tau_s=self.ANOMALY_TAU_S, z_spike=self.SPIKE_Z, min_w=self.SPIKE_MIN_W,
+                                       drift_min_w=self.DRIFT_MIN_W, cusum_wh=self.DRIFT_WH,
+                                       log=self.console.log)
+        self.anomaly_path = os.path.splitext(db_path)[0] + "_anomalia.json"
+        self.anomaly.load(self.anomaly_path)
+        self._stop_event = threading.Event()
+
+        # Regras de alerta (limites compilados por cômodo) e log de avisos limitado
+        self.alert_engine = AlertEngine(self.room_limits, self.anomaly)
+        self.alert_log = AlertLog(maxlen=500)
+
+        # Tarifa elétrica (R$/kWh)
+        self.tariff = 0.65
+
+        # Histórico persistente (SQLite/WAL, gravação em lotes + agregações 1 s/1 min/1 h)
+        self.store = TimeSeriesStore(db_path, log=self.console.log)
+
+        # Registro de circuitos: buffer, energia e estado do relé alocados sob demanda;
+        # os totais do dia/mês de cada circuito novo são retomados do histórico
+        self.registry = DeviceRegistry(self.HISTORY_CAPACITY, TariffSchedule(self.tariff),
+                                       self.power_factors, on_new=self.on_new_circuit,
+                                       seed=self.seed_energy)
+        for room in self.DEFAULT_ROOMS:
+            self.registry.ensure(room, "config")
+
+        # Log de eventos (logs/status do ESP32, alertas, comandos, quedas) em arquivo próprio
+        self.events = EventLog(os.path.splitext(db_path)[0] + "_eventos.db", log=self.console.log)
+        self._device_online = None
+        self._last_status_event = 0.0
+        threading.Thread(target=self.anomaly_loop, name="anomaly", daemon=True).start()
+
+        self.decode_room = ROOM_DECODERS[self.ROOM_DECODER]
+
+        # Pipeline de ingestão: callback MQTT -> workers (um shard por circuito) -> Tk (em lotes)
+        self._held = [set() for _ in range(self.INGEST_WORKERS)]   # circuitos com amostras seguradas, por worker
+        self.pipeline = IngestPipeline(self.process_message, maxsize=5000, policy="drop_oldest",
+                                       workers=self.INGEST_WORKERS, shard_key=self.circuit_key,
+                                       idle=self.release_held, metrics=self.metrics,
+                                       log=self.console.log)
+        self.pipeline.start()
+        self.setup_metrics(metrics_port)
+
+        # Comandos de relé com confirmação pelo status retido do ESP32
+        self.dispatcher = RelayDispatcher(
+            lambda topic, payload: self.mqtt_publish(topic, payload, qos=1),
+            ack_timeout=self.RELAY_ACK_TIMEOUT, max_retries=self.RELAY_MAX_RETRIES,
+            deadline_s=self.RELAY_DEADLINE, on_event=self.on_relay_event, metrics=self.metrics,
+            log=self.console.log)
+        self.dispatcher.start()
+
+        # Corte por sobrecorrente direto no callback MQTT, fora do pipeline genérico
+        self.protection = ProtectionFastPath(
+            lambda topic, payload: self.client.publish(topic, payload=payload, qos=1),
+            lambda room: self.alert_engine.limits(room).i_cutoff, i_hyst=self.alert_engine.i_hyst,
+            on_trip=self.on_protection_trip, metrics=self.metrics,
+            log=self.console.log)
+        self.protection.start()
+
+        # RMS verdadeiro, P/Q/S, FP e THD a partir dos bursts de ADC, num pool separado
+        self.waveform = WaveformAnalyzer(self.on_power_quality, workers=self.WAVEFORM_WORKERS,
+                                         processes=self.WAVEFORM_PROCESSES, metrics=self.metrics,
+                                         log=self.console.log)
+        self.waveform.start()
+
+        # API para celular/navegador, lendo os mesmos dados em memória
+        self.api = None
+        if api_port is not None:
+            self.api = DashboardServer(self.registry, self.store, self.API_HOST, api_port, metrics=self.metrics,
+                                       anomaly=self.anomaly, events=self.events,
+                                       log=self.console.log)
+            self.api.start()
+
+        # Interface (subclasse com janela) antes da conexão, para não perder avisos
+        self.setup_ui()
+
+        # Conectar MQTT (em segundo plano: broker fora do ar não atrasa a partida)
+        self.connect_mqtt()
+
+    # -------------- GANCHOS DA INTERFACE (a janela Tk sobrescreve) --------------
+    def setup_ui(self):
+        """Monta a interface; sem janela não há nada a montar."""
+
+    def run_on_ui(self, fn, *args, key=None):
+        """Executa fn na thread da interface; sem janela as atualizações de tela são descartadas."""
+
+    def on_new_circuit(self, circuit):
+        """Circuito novo no registro (possivelmente num worker)."""
+
+    def on_relays_changed(self, circuits=None):
+        """Estado do relé destes circuitos mudou (None = de qualquer um)."""
+
+    def on_alert(self, entry, is_new: bool):
+        """Aviso novo (ou repetição agrupada de um anterior) no log."""
+
+    # ---------------------------- MÉTRICAS --------------------------------
+    def setup_metrics(self, port):
+        m = self.metrics
+        m.gauge("ingest_queue_depth", lambda: self.pipeline.queue_depths()[0], "Mensagens nas filas dos workers")
+        m.gauge("ui_queue_depth", lambda: self.pipeline.queue_depths()[1], "Atualizações de tela pendentes")
+        m.gauge("store_queue_depth", self.store.pending, "Amostras aguardando gravação no SQLite")
+        m.gauge("circuits", lambda: len(self.registry), "Circuitos conhecidos")
+        m.gauge("anomaly_cusum_ratio",
+                lambda: {(("circuit", name),): st["cusum"] / self.anomaly.cusum_wh
+                         for name, st in self.anomaly.snapshot()["circuits"].items()},
+                "CUSUM / limite de deriva por circuito (> 1 = deriva)")
+        m.gauge("device_clock_offset_seconds",
+                lambda: {(("circuit", c.name),): c.timeline.clock.offset for c in self.registry.circuits()
+                         if c.timeline is not None and c.timeline.clock.offset is not None},
+                "Horário do host - millis() do ESP32, por circuito")
+        m.gauge("device_clock_drift_ppm",
+                lambda: {(("circuit", c.name),): c.timeline.clock.drift_ppm for c in self.registry.circuits()
+                         if c.timeline is not None},
+                "Deriva estimada do relógio do ESP32 em relação ao host (positivo = ESP32 adiantado)")
+        m.gauge("device_timeline_events",
+                lambda: {(("circuit", c.name), ("event", ev)): getattr(c.timeline, ev)
+                         for c in self.registry.circuits() if c.timeline is not None
+                         for ev in ("duplicates", "stale", "reordered", "late")},
+                "Amostras duplicadas, antigas demais, reordenadas e atrasadas (retroativas)")
+        m.gauge("event_log_events",
+                lambda: {(("event", "written"),): self.events.written, (("event", "dropped"),): self.events.dropped,
+                         (("event", "pending"),): self.events.pending()},
+                "Log de eventos: gravados, descartados (fila cheia) e na fila")
+        m.gauge("pipeline_events", lambda: {(("event", k),): v for k, v in self.pipeline.stats.snapshot().items()},
+                "Contadores do pipeline (recebidas, processadas, descartadas...)")
+        self.metrics_server = None
+        if port:
+            try:
+                self.metrics_server = start_http_server(m, port)
+            except OSError as e:
+                self.add_alert("AVISO", f"Endpoint de métricas indisponível na porta {port}: {e}")
+
+    # ------------------------ MQTT / PROCESSAMENTO ------------------------
+    def calculate_power(self, voltage, current, room):
+        if voltage <= 0 or current <= 0:
+            return 0.0
+        apparent_power = voltage * current
+        circuit = self.registry.get(room)
+        if circuit is None:
+            pf = self.power_factors.get(room, 0.85)
+        else:
+            # FP medido pela forma de onda, enquanto recente; senão o configurado
+            q = circuit.quality
+            pf = q.pf if q is not None and time.time() - q.ts < self.WAVEFORM_MAX_AGE else circuit.power_factor
+        return round(apparent_power * pf, 2)
+
+    def on_power_quality(self, room, quality):
+        # thread do pool de forma de onda
+        circuit = self.registry.get(room)
+        if circuit is not None and quality.irms >= self.WAVEFORM_MIN_CURRENT:
+            circuit.quality = quality
+
+    def connect_mqtt(self):
+        try:
+            if self.mqtt_user:
+                self.client.username_pw_set(self.mqtt_user, self.mqtt_password)
+            self.client.connect_async(self.mqtt_broker, self.mqtt_port, keepalive=60)
+            self.client.loop_start()
+            self.add_alert("INFO", f"Conectando ao MQTT em {self.mqtt_broker}:{self.mqtt_port}...")
+        except Exception as e:
+            self.add_alert("ALERTA", f"Erro MQTT: {e}",
+                           "Verifique IP/porta do broker, usuário/senha e se o serviço está ativo.")
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            if self._connected_once:
+                self._c_reconnects.inc()
+            self._connected_once = True
+            self.add_alert("INFO", "MQTT conectado com sucesso", kind="conexao", data={"online": True})
+            client.subscribe("energy/room/+")
+            client.subscribe("energy/room/+/batch")
+            client.subscribe("energy/room/+/waveform")
+            client.subscribe("energy/relay/status/+")
+            client.subscribe("energy/system/status")
+            client.subscribe("energy/system/log")
+            client.subscribe("energy/system/sim_fault")
+            client.subscribe("energy/alert/+")
+        else:
+            self.add_alert("ALERTA", f"Falha na conexão MQTT: {rc}",
+                           "Cheque as credenciais e tente novamente.", kind="conexao", data={"online": False})
+
+    def on_connect_fail(self, client, userdata):
+        # thread do paho; ele mesmo tenta de novo (reconnect_delay_set)
+        self.add_alert("ALERTA", f"Broker MQTT {self.mqtt_broker}:{self.mqtt_port} indisponível, tentando novamente...",
+                       "Verifique IP/porta do broker, usuário/senha e se o serviço está ativo.", key="mqtt_fail",
+                       kind="conexao", data={"online": False})
+
+    def on_disconnect(self, client, userdata, rc, *args):
+        self._c_disconnects.inc()
+        self.events.add("conexao", "AVISO", f"MQTT desconectado ({rc})", data={"online": False})
+
+    def on_publish(self, client, userdata, mid, *args):
+        # feedback quando algo foi realmente enviado
+        if self.VERBOSE:
+            self.console.log(f"[MQTT] Publicado (mid={mid})", key="mqtt")
+
+    def mqtt_publish(self, topic: str, payload: str, qos: int = 0, retain: bool = False):
+        """Helper com log e try/except."""
+        try:
+            if self.VERBOSE:
+                self.console.log(f"[PUB] {topic} => {payload}", key="pub")
+            self.client.publish(topic, payload=payload, qos=qos, retain=retain)
+            self.metrics.counter("commands_published_total", "Comandos publicados", topic=topic).inc()
+            target = topic.rsplit('/', 1)[-1]
+            self.events.add("comando", "INFO", f"{topic} {payload}",
+                            circuit=target if target in self.registry else None, data={"qos": qos})
+        except Exception as e:
+            self.add_alert("ALERTA", f"Falha ao publicar em {topic}: {e}")
+
+    def on_message(self, client, userdata, msg):
+        # Roda na thread do paho: proteção rápida e enfileiramento; o resto fica no worker
+        t_arrival = time.perf_counter()
+        self.protection.check(msg.topic, msg.payload, t_arrival)
+        c = self._topic_counters.get(msg.topic)
+        if c is None:
+            c = self._topic_counters[msg.topic] = self.metrics.counter(
+                "mqtt_messages_total", "Mensagens recebidas por tópico", topic=msg.topic)
+        c.inc()
+        self.pipeline.submit(msg.topic, msg.payload)
+
+    def process_message(self, topic: str, payload: bytes):
+        try:
+            topic_parts = topic.split('/')
+
+            if topic_parts[1] == 'room':
+                room = topic_parts[2]
+                circuit = self.registry.ensure(room, "room")
+                if circuit is None:
+                    return
+                if len(topic_parts) == 3:
+                    t0 = time.perf_counter()
+                    sample = self.decode_room(payload)
+                    self._h_decode.observe(time.perf_counter() - t0)
+                    self.ingest_timed(circuit, (sample,), live=True)
+                elif topic_parts[3] == 'waveform':
+                    self.waveform.submit(room, payload, time.time())
+                elif topic_parts[3] == 'batch':
+                    t0 = time.perf_counter()
+                    samples = decode_batch(payload)
+                    self._h_decode.observe(time.perf_counter() - t0)
+                    if samples:
+                        self.ingest_timed(circuit, samples, live=False)
+                return
+
+            payload_text = payload.decode()
+            if topic_parts[1] == 'relay' and topic_parts[2] == 'status':
+                # Espera JSON com {"relay_estado": true/false}
+                room = topic_parts[3]
+                try:
+                    data = json.loads(payload_text)
+                    circuit = self.registry.ensure(room, "status")
+                    if circuit is not None:
+                        circuit.relay_on = bool(data.get('relay_estado', False))
+                        self.dispatcher.acknowledge(room, circuit.relay_on)
+                        self.on_relays_changed((circuit,))
+                except Exception:
+                    # se vier string simples, ignora
+                    pass
+
+            elif topic_parts[1] == 'system' and topic_parts[2] == 'status':
+                # {"sistema": "online", ..., "reles": [{"comodo": ..., "estado": ...}, ...]}
+                data = json.loads(payload_text)
+                if self.registry.update_from_status(data):
+                    self.on_relays_changed()
+                self.record_status(data)
+
+            elif topic_parts[1] == 'system' and topic_parts[2] == 'log':
+                # {"log": "...", "timestamp": millis, "uptime": ..., "fonte": "esp32"}
+                data = json.loads(payload_text)
+                self.events.add("log", "INFO", str(data.get("log", "")), source="esp32", data=data)
+
+            elif topic_parts[1] == 'system' and topic_parts[2] == 'sim_fault':
+                data = json.loads(payload_text)
+                active = [name for field, name in (("simulacao_falha_corrente", "corrente"),
+                                                   ("simulacao_falha_tensao", "tensão")) if data.get(field)]
+                message = ("Simulação de falha ativa: " + ", ".join(active)) if active else "Simulações de falha desligadas"
+                self.events.add("log", "AVISO" if active else "INFO", message, source="esp32", data=data)
+
+            elif topic_parts[1] == 'alert':
+                self.device_alert(topic_parts[2], json.loads(payload_text))
+
+        except Exception as e:
+            self.add_alert("ALERTA", f"Erro ao processar mensagem: {e}",
+                           "Formato do payload pode estar incorreto (JSON).")
+
+    def ingest_timed(self, circuit, samples, live: bool):
+        """Posiciona pelo relógio do ESP32, descarta duplicadas e segura para reordenar."""
+        arrival = time.time()
+        tl = circuit.timeline
+        if tl is None:
+            tl = circuit.timeline = DeviceTimeline(self.REORDER_S, self.CLOCK_WINDOW_S, max_keys=self.DEDUP_KEYS)
+        late = []
+        for sample in samples:
+            if sample.device_ms is None:
+                ts = arrival
+            else:
+                ts = tl.place(sample.device_ms, arrival, live)
+                if ts is None:
+                    continue
+            if not tl.push(ts, sample):
+                late.append((ts, sample))
+        self.release_samples(circuit, arrival)
+        if tl.pending():
+            self._held[self.pipeline.worker_of(circuit.name)].add(circuit.name)
+        if late:
+            self.backfill_samples(circuit, late)
+
+    def release_samples(self, circuit, now: float):
+        for ts, sample in circuit.timeline.pop_due(now):
+            self.ingest_sample(circuit, sample, ts)
+
+    def release_held(self, worker: int):
+        # idle do pipeline, na thread do worker dono destes circuitos
+        held = self._held[worker]
+        if not held:
+            return
+        now = time.time()
+        for name in list(held):
+            circuit = self.registry.get(name)
+            self.release_samples(circuit, now)
+            if not circuit.timeline.pending():
+                held.discard(name)
+
+    def backfill_samples(self, circuit, late):
+        """Leituras anteriores à sequência ao vivo: histórico (agregações refeitas) e lacunas de energia."""
+        room = circuit.name
+        rows, points = [], []
+        for ts, s in late:
+            power = self.calculate_power(s.voltage, s.current, room)
+            rows.append((ts, s.voltage, s.current, power, s.relay, s.faults))
+            points.append((ts, 0.0 if s.relay == 0 else power))
+        points.sort()
+        self.store.add_backfill(room, rows)
+        circuit.energy.backfill(points)
+
+    def ingest_sample(self, circuit, sample, ts: float):
+        room = circuit.name
+        voltage, current, relay, faults = sample.voltage, sample.current, sample.relay, sample.faults
+        power = self.calculate_power(voltage, current, room)
+        circuit.last_seen = ts
+        circuit.buffer.append(ts, voltage, current, power, relay, faults)
+        self.store.add(room, ts, voltage, current, power, relay, faults)
+        circuit.energy.add(ts, power, relay)
+        self.check_alerts(room, voltage, current, power, ts)
+
+    @staticmethod
+    def circuit_key(topic: str) -> str:
+        # energy/room/<c>, energy/room/<c>/batch|waveform e energy/relay/status/<c> caem no mesmo worker
+        parts = topic.split('/')
+        return parts[2] if len(parts) > 2 and parts[1] == 'room' else parts[-1]
+
+    # ------------------------ ALERTAS E AÇÕES -----------------------------
+    def device_alert(self, name, data):
+        """Alertas publicados pelo próprio ESP32 (energy/alert/<nome>)."""
+        if name == "auto_shutdown":
+            room = data.get("comodo")
+            self.add_alert("CRITICO", f"{room}: carga desligada pelo ESP32 ({data.get('motivo', '?')}, "
+                           f"{data.get('tensao', 0):.1f} V, {data.get('corrente', 0):.2f} A).",
+                           "Verifique o circuito antes de religar.", key=(room, "esp32_auto_shutdown"),
+                           source="esp32", data=data)
+        elif name == "emergency":
+            self.add_alert("CRITICO", "ESP32 confirmou o desligamento de emergência (todas as cargas OFF).",
+                           key="esp32_emergency", source="esp32", data=data)
+        else:
+            self.add_alert("ALERTA", f"Alerta do ESP32: {name}", key=("esp32", name), circuit=None,
+                           source="esp32", data=data)
+
+    def record_status(self, data):
+        # worker do tópico energy/system/status (sempre o mesmo)
+        now = time.time()
+        online = data.get("sistema") == "online"
+        if online != self._device_online:
+            if self._device_online is not None or not online:
+                self.events.add("conexao", "INFO" if online else "AVISO",
+                                "ESP32 online" if online else "ESP32 offline", source="esp32",
+                                data={"online": online})
+            self._device_online = online
+            self._last_status_event = 0.0
+        if online and now - self._last_status_event >= self.EVENT_STATUS_EVERY_S:
+            self._last_status_event = now
+            snapshot = {k: v for k, v in data.items() if k != "reles"}
+            message = (f"{data.get('sistema', '?')}, RSSI {data.get('wifi_rssi', '?')} dBm, "
+                       f"uptime {data.get('uptime', 0) / 1000:.0f} s, versão {data.get('versao', '?')}")
+            self.events.add("status", "INFO", message, source="esp32", data=snapshot)
+
+    def check_alerts(self, room, v, i, p, ts=None):
+        t0 = time.perf_counter()
+        events = self.alert_engine.evaluate(room, v, i, p, ts)
+        self._h_alerts.observe(time.perf_counter() - t0)
+        for ev in events:
+            # leituras únicas já foram cortadas pela proteção rápida; aqui só os lotes
+            if ev.cutoff and not self.protection.tripped(room):
+                self.control_relay(room, False)
+            self.add_alert(ev.level, ev.message, ev.guidance, key=(room, ev.rule))
+
+    def anomaly_loop(self):
+        """Perfil por hora do dia (do histórico, uma vez por dia) e checkpoint periódico do detector."""
+        next_learn = time.time()
+        while True:
+            now = time.time()
+            if self.ANOMALY_TOD_DAYS and now >= next_learn:
+                next_learn = now + 86400
+                t0 = now - self.ANOMALY_TOD_DAYS * 86400
+                try:
+                    for room in self.store.rooms():
+                        self.anomaly.learn_time_of_day(room, self.store.query(room, t0, now, 3600))
+                except Exception as e:
+                    self.console.log(f"[ANOMALIA] Perfil por hora indisponível: {e}", key="anomaly")
+            if self._stop_event.wait(self.ANOMALY_CHECKPOINT_S):
+                return
+            self.save_anomaly_state()
+
+    def save_anomaly_state(self):
+        try:
+            self.anomaly.save(self.anomaly_path)
+        except OSError as e:
+            self.console.log(f"[ANOMALIA] Falha ao gravar {self.anomaly_path}: {e}", key="anomaly")
+
+    # Comandos passam pelo dispatcher: repetidos são coalescidos e cada um espera a confirmação
+    def control_relay(self, room, turn_on: bool):
+        if self.dispatcher.command(room, turn_on):
+            action = "ligado" if turn_on else "desligado"
+            self.add_alert("INFO", f"Comando enviado: {room} {action}", circuit=room)
+
+    def control_all_relays(self, turn_on: bool):
+        self.dispatcher.command_all(self.registry.names(), turn_on)
+        action = "ligados" if turn_on else "desligados"
+        self.add_alert("INFO", f"Comando enviado: Todos os relés {action}")
+
+    def on_protection_trip(self, room, current, latency):
+        # OFF já publicado pela thread de proteção: só contabiliza e acompanha a confirmação
+        self.metrics.counter("commands_published_total", "Comandos publicados",
+                             topic=f"energy/control/{room}").inc()
+        self.dispatcher.track(room, False)
+        self.events.add("comando", "CRITICO", f"energy/control/{room} OFF (proteção rápida, {current:.2f} A)",
+                        circuit=room, data={"latencia_ms": round(latency * 1000, 3)})
+        if latency * 1000 > self.PROTECTION_BOUND_MS:
+            self.console.log(f"[PROTEÇÃO] Corte de {room} levou {latency * 1000:.1f} ms "
+                             f"(limite {self.PROTECTION_BOUND_MS} ms)", key="protection")
+
+    def on_relay_event(self, kind, room, turn_on, detail):
+        action = "ligar" if turn_on else "desligar"
+        if kind == "acked":
+            self.add_alert("INFO", f"{room}: comando confirmado pelo ESP32 em {detail * 1000:.0f} ms",
+                           key=(room, "relay_ack"))
+        elif kind == "retry":
+            self.add_alert("AVISO", f"{room}: sem confirmação, reenviando comando para {action} "
+                           f"(tentativa {detail})", key=(room, "relay_retry"))
+        elif kind == "escalated":
+            self.add_alert("CRITICO", f"{room}: desligamento não confirmado em {self.RELAY_DEADLINE:.0f} s. "
+                           "Enviado SHUTDOWN de emergência.",
+                           "Verifique o ESP32 e a rede; o relé pode continuar ligado.", circuit=room)
+        elif kind == "failed":
+            self.add_alert("ALERTA", f"{room}: comando para {action} não confirmado pelo ESP32.",
+                           "Confira se o dispositivo está online.", circuit=room)
+
+    def emergency_shutdown(self):
+        self.mqtt_publish("energy/control/emergency", "SHUTDOWN")
+        self.control_all_relays(False)
+        self.add_alert("CRITICO", "DESLIGAMENTO DE EMERGÊNCIA ATIVADO! (cargas OFF)")
+
+    # ------------------------------ CUSTOS --------------------------------
+    def set_tariff(self, rate: float, time_of_use: bool = False):
+        self.tariff = rate
+        if time_of_use:
+            schedule = TariffSchedule.tarifa_branca()
+            self.add_alert("INFO", "Tarifa Branca ativada: " + ", ".join(
+                f"{band} R$ {r:.3f}/kWh" for band, r in schedule.rates.items()))
+        else:
+            schedule = TariffSchedule(rate)
+            self.add_alert("INFO", f"Tarifa atualizada: R$ {rate:.3f}/kWh")
+        # vale a partir de agora; o custo já acumulado não é recalculado
+        self.registry.set_schedule(schedule)
+
+    def seed_energy(self, circuit):
+        """Consumo de hoje e do mês já gravado (agregações de 1 h), para não zerar ao reiniciar."""
+        now = time.time()
+        lt = time.localtime(now)
+        month_start = time.mktime((lt.tm_year, lt.tm_mon, 1, 0, 0, 0, 0, 0, -1))
+        rows = self.store.query(circuit.name, month_start, now + 3600, 3600)
+        circuit.energy.seed([(r[0], r[-1]) for r in rows], now)
+
+    # ------------------------------ AVISOS --------------------------------
+    def add_alert(self, level: str, message: str, guidance: str | None = None, key=None,
+                  kind: str = "alerta", **event):
+        """event: circuit, source e data do log de eventos (circuito padrão: o da chave (cômodo, regra))."""
+        entry, is_new = self.alert_log.add(level, message, guidance, key)
+        if "circuit" not in event and isinstance(key, tuple):
+            event["circuit"] = key[0]
+        if guidance:
+            event["data"] = dict(event.get("data") or {}, orientacao=guidance)
+        self.events.add(kind, level, message, **event)
+        self.on_alert(entry, is_new)
+        if is_new:
+            self.console.log(entry.render().strip(), key=level)
+
+    # ---------------------------- SISTEMA ---------------------------------
+    def shutdown(self):
+        try:
+            self._stop_event.set()
+            self.protection.stop()
+            self.waveform.stop()
+            if self.api is not None:
+                self.api.stop()
+            self.dispatcher.stop()
+            self.client.loop_stop()
+            self.client.disconnect()
+            self.pipeline.stop()
+            for circuit in self.registry.circuits():
+                if circuit.timeline is not None:
+                    self.release_samples(circuit, math.inf)
+            self.save_anomaly_state()
+            if self.metrics_server is not None:
+                self.metrics_server.shutdown()
+            self.events.close()
+            self.store.close()
+        except:
+            pass
+
+    def run(self):
+        print("Sistema de Monitoramento Simplificado iniciado!")
+        self.add_alert("INFO", "Sistema iniciado")
+        if self.api is not None:
+            self.add_alert("INFO", f"API disponível em http://{self.API_HOST}:{self.api.port}/api/circuits")
+        # sem janela: só ingestão, proteção, métricas e API
+        try:
+            self._stop_event.wait()
+        except KeyboardInterrupt:
+            self.add_alert("AVISO", "Sistema encerrado pelo usuário")
+        finally:
+            self.shutdown()
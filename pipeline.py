@@ -0,0 +1,250 @@
+import queue
+import threading
+import time
+
+from metrics import ConsoleLog, Counter
+
+
+class PipelineStats:
+    """
+    Contadores do pipeline (lidos pela GUI / benchmark como atributos: stats.processed).
+
+    São incrementados ao mesmo tempo pela thread do paho, pelos workers e pela thread
+    do Tk; cada thread soma na sua própria célula (metrics.Counter), sem += compartilhado.
+    """
+
+    FIELDS = ("received", "processed", "dropped", "errors",
+              "ui_posted", "ui_applied", "ui_coalesced", "ui_dropped")
+
+    def __init__(self):
+        self.counters = {name: Counter() for name in self.FIELDS}
+
+    def inc(self, name: str, n: int = 1):
+        self.counters[name].inc(n)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["counters"][name].value
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def snapshot(self) -> dict:
+        return {name: c.value for name, c in self.counters.items()}
+
+
+class IngestPipeline:
+    """
+    Pipeline em estágios:
+      1) callback MQTT (thread do paho)  -> submit(): só enfileira tópico + payload
+      2) workers                         -> handler(topic, payload): decodifica e avalia
+      3) thread do Tk                    -> drain_ui(): aplica as atualizações de tela em lotes
+
+    Com workers > 1 cada worker tem a sua fila e as mensagens são distribuídas por
+    shard_key(topic) (padrão: o próprio tópico, isto é, um circuito por fila). Assim
+    um circuito é sempre processado pelo mesmo worker, em ordem, sem lock no estado dele.
+
+    idle(k), se dado, roda na thread do worker k pelo menos a cada `idle_interval` s,
+    com ou sem mensagens (liberar amostras seguradas para reordenação, por exemplo).
+
+    Políticas quando uma fila de entrada enche:
+      "drop_oldest" descarta a mensagem mais antiga (padrão, mantém o dado mais recente)
+      "drop_newest" descarta a mensagem que acabou de chegar
+      "block"       segura o callback do paho até abrir espaço (backpressure no broker)
+    """
+
+    POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, handler, maxsize: int = 5000, ui_maxsize: int = 2000,
+                 policy: str = "drop_oldest", ui_batch: int = 200, ui_interval_ms: int = 50,
+                 block_timeout: float = 1.0, workers: int = 1, shard_key=None,
+                 idle=None, idle_interval: float = 0.25, trace=None, ui_trace=None, metrics=None,
+                 log=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política inválida: {policy}")
+        self.handler = handler
+        self.policy = policy
+        self.ui_batch = ui_batch
+        self.ui_interval_ms = ui_interval_ms
+        self.block_timeout = block_timeout
+        self.shard_key = shard_key
+        self.idle = idle
+        self.idle_interval = idle_interval
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+        # ganchos de medição (benchmark): trace(t_in, t_start, t_end) por mensagem,
+        # ui_trace(t_posted, t_applied) por atualização de tela (perf_counter)
+        self.trace = trace
+        self.ui_trace = ui_trace
+        # métricas (metrics.Metrics): espera na fila, tempo no worker e por atualização de tela
+        if metrics is not None:
+            self._h_wait = metrics.histogram("ingest_queue_wait_seconds", "Espera na fila de entrada")
+            self._h_handler = metrics.histogram("ingest_handler_seconds", "Processamento por mensagem no worker")
+            self._h_ui = metrics.histogram("ui_update_seconds", "Duração de cada atualização de tela")
+        else:
+            self._h_wait = self._h_handler = self._h_ui = None
+
+        self.inboxes = [queue.Queue(maxsize=maxsize) for _ in range(max(1, workers))]
+        self.ui_queue = queue.Queue(maxsize=ui_maxsize)
+        # chaves já pendentes na fila da UI (coalescência de redesenhos repetidos)
+        self._ui_pending = {}
+        self._ui_lock = threading.Lock()
+
+        self.stats = PipelineStats()
+        self._running = False
+        self._workers = []
+        self._root = None
+
+    # ------------------------- ciclo de vida -------------------------
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for k, inbox in enumerate(self.inboxes):
+            t = threading.Thread(target=self._work_loop, args=(k, inbox),
+                                 name=f"ingest-worker-{k}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        for inbox in self.inboxes:
+            try:
+                inbox.put_nowait(None)
+            except queue.Full:
+                pass
+        for t in self._workers:
+            t.join(timeout)
+        self._workers = []
+
+    def attach_tk(self, root):
+        """Começa a drenar a fila de UI periodicamente via root.after."""
+        self._root = root
+        root.after(self.ui_interval_ms, self._tk_tick)
+
+    # ------------------------- estágio 1 -----------------------------
+    def submit(self, topic: str, payload: bytes):
+        self.stats.inc("received")
+        item = (topic, payload, time.perf_counter())
+        if len(self.inboxes) == 1:
+            inbox = self.inboxes[0]
+        else:
+            inbox = self.inboxes[self.worker_of(topic if self.shard_key is None else self.shard_key(topic))]
+        if self.policy == "block":
+            try:
+                inbox.put(item, timeout=self.block_timeout)
+            except queue.Full:
+                self.stats.inc("dropped")
+            return
+        try:
+            inbox.put_nowait(item)
+        except queue.Full:
+            if self.policy == "drop_newest":
+                self.stats.inc("dropped")
+                return
+            try:
+                inbox.get_nowait()
+                self.stats.inc("dropped")
+            except queue.Empty:
+                pass
+            try:
+                inbox.put_nowait(item)
+            except queue.Full:
+                self.stats.inc("dropped")
+
+    def worker_of(self, key) -> int:
+        """Índice do worker que processa a chave de shard `key`."""
+        return hash(key) % len(self.inboxes) if len(self.inboxes) > 1 else 0
+
+    # ------------------------- estágio 2 -----------------------------
+    def _work_loop(self, k, inbox):
+        next_idle = time.monotonic() + self.idle_interval
+        while self._running:
+            if self.idle is not None:
+                now = time.monotonic()
+                if now >= next_idle:
+                    next_idle = now + self.idle_interval
+                    try:
+                        self.idle(k)
+                    except Exception as e:
+                        self.log(f"[PIPELINE] Erro no worker (idle): {e}", key="pipeline")
+                try:
+                    item = inbox.get(timeout=max(0.0, next_idle - now))
+                except queue.Empty:
+                    continue
+            else:
+                item = inbox.get()
+            if item is None:
+                break
+            topic, payload, t_in = item
+            t_start = time.perf_counter()
+            try:
+                self.handler(topic, payload)
+                self.stats.inc("processed")
+            except Exception as e:
+                self.stats.inc("errors")
+                self.log(f"[PIPELINE] Erro no worker: {e}", key="pipeline")
+            if self._h_wait is not None:
+                t_end = time.perf_counter()
+                self._h_wait.observe(t_start - t_in)
+                self._h_handler.observe(t_end - t_start)
+            if self.trace is not None:
+                self.trace(t_in, t_start, time.perf_counter())
+
+    # ------------------------- estágio 3 -----------------------------
+    def post_ui(self, fn, *args, key=None):
+        """
+        Agenda fn(*args) na thread do Tk. Com `key`, chamadas repetidas ainda
+        pendentes são fundidas: só a última chamada com aquela chave é executada.
+        """
+        if key is not None:
+            with self._ui_lock:
+                if key in self._ui_pending:
+                    self._ui_pending[key] = (fn, args)
+                    self.stats.inc("ui_coalesced")
+                    return
+                self._ui_pending[key] = (fn, args)
+        try:
+            self.ui_queue.put_nowait((key, fn, args, time.perf_counter()))
+            self.stats.inc("ui_posted")
+        except queue.Full:
+            self.stats.inc("ui_dropped")
+            if key is not None:
+                with self._ui_lock:
+                    self._ui_pending.pop(key, None)
+
+    def drain_ui(self, max_items: int | None = None) -> int:
+        """Aplica até `max_items` atualizações pendentes. Deve rodar na thread do Tk."""
+        limit = self.ui_batch if max_items is None else max_items
+        done = 0
+        while done < limit:
+            try:
+                key, fn, args, t_posted = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if key is not None:
+                with self._ui_lock:
+                    fn, args = self._ui_pending.pop(key, (fn, args))
+            t_start = time.perf_counter()
+            try:
+                fn(*args)
+            except Exception as e:
+                self.log(f"[PIPELINE] Erro na atualização da UI: {e}", key="pipeline_ui")
+            if self._h_ui is not None:
+                self._h_ui.observe(time.perf_counter() - t_start)
+            if self.ui_trace is not None:
+                self.ui_trace(t_posted, time.perf_counter())
+            done += 1
+        self.stats.inc("ui_applied", done)
+        return done
+
+    def _tk_tick(self):
+        if self._root is None:
+            return
+        self.drain_ui()
+        try:
+            self._root.after(self.ui_interval_ms, self._tk_tick)
+        except Exception:
+            # janela já destruída
+            self._root = None
+
+    def queue_depths(self) -> tuple[int, int]:
+        return sum(q.qsize() for q in self.inboxes), self.ui_queue.qsize()
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from energy import EnergyAccumulator, TariffSchedule
+from ringbuffer import RoomBuffer
+
+
+class Circuit:
+    """Estado de um circuito (cômodo) alocado sob demanda pelo registro."""
+
+    __slots__ = ("name", "buffer", "energy", "relay_on", "power_factor",
+                 "sources", "meta", "first_seen", "last_seen", "quality", "timeline")
+
+    def __init__(self, name: str, capacity: int, schedule: TariffSchedule, power_factor: float):
+        self.name = name
+        self.buffer = RoomBuffer(capacity)
+        self.energy = EnergyAccumulator(schedule)
+        self.relay_on = True
+        self.power_factor = power_factor
+        self.sources = set()    # "config", "room", "status"
+        self.meta = {}          # pino, sensor, canal_tensao (de energy/system/status)
+        self.first_seen = time.time()
+        self.last_seen = 0.0
+        self.quality = None     # última waveform.PowerQuality (se o ESP32 publicar bursts)
+        self.timeline = None    # clocksync.DeviceTimeline (criada pelo monitor na primeira leitura)
+
+
+class DeviceRegistry:
+    """
+    Registro dinâmico de circuitos.
+
+    Circuitos são descobertos pelos tópicos energy/room/<nome> e pelo array "reles"
+    de energy/system/status, e só então ganham buffer e integrador de energia.
+    Leituras (get / names / circuits) não travam; a criação é serializada por um lock
+    e avisa a GUI via on_new(circuit). seed(circuit), se dado, roda antes de o circuito
+    ficar visível (ex.: retomar os totais de energia do histórico).
+    """
+
+    def __init__(self, capacity: int, schedule: TariffSchedule, power_factors: dict | None = None,
+                 default_power_factor: float = 0.85, max_circuits: int = 2000, on_new=None,
+                 seed=None):
+        self.capacity = capacity
+        self.schedule = schedule
+        self.power_factors = dict(power_factors or {})
+        self.default_power_factor = default_power_factor
+        self.max_circuits = max_circuits
+        self.on_new = on_new
+        self.seed = seed
+        self.rejected = 0
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Circuit | None:
+        return self._circuits.get(name)
+
+    def ensure(self, name: str, source: str = "room") -> Circuit | None:
+        c = self._circuits.get(name)
+        if c is None:
+            with self._lock:
+                c = self._circuits.get(name)
+                if c is None:
+                    if not name or len(self._circuits) >= self.max_circuits:
+                        self.rejected += 1
+                        return None
+                    pf = self.power_factors.get(name, self.default_power_factor)
+                    c = Circuit(name, self.capacity, self.schedule, pf)
+                    if self.seed:
+                        self.seed(c)
+                    # copia-e-troca: quem está iterando a versão antiga não é afetado
+                    circuits = dict(self._circuits)
+                    circuits[name] = c
+                    self._circuits = circuits
+                    created = True
+                else:
+                    created = False
+            if created and self.on_new:
+                self.on_new(c)
+        c.sources.add(source)
+        return c
+
+    def update_from_status(self, status: dict) -> int:
+        """Registra/atualiza circuitos a partir do array "reles" de energy/system/status."""
+        n = 0
+        for item in status.get("reles") or ():
+            name = item.get("comodo")
+            c = self.ensure(name, "status") if name else None
+            if c is None:
+                continue
+            if "estado" in item:
+                c.relay_on = bool(item["estado"])
+            c.meta.update({k: v for k, v in item.items() if k not in ("comodo", "estado")})
+            n += 1
+        return n
+
+    def set_schedule(self, schedule: TariffSchedule):
+        self.schedule = schedule
+        for c in self._circuits.values():
+            c.energy.schedule = schedule
+
+    def names(self) -> list[str]:
+        return list(self._circuits)
+
+    def circuits(self) -> list[Circuit]:
+        return list(self._circuits.values())
+
+    def __contains__(self, name):
+        return name in self._circuits
+
+    def __len__(self):
+        return len(self._circuits)
@@ -0,0 +1,210 @@
+"""
+Despacho de comandos de relé com confirmação.
+
+O ESP32 não responde ao comando em si: a confirmação é o status retido que ele
+publica em energy/relay/status/<cômodo> depois de acionar o relé. Cada comando
+fica pendente até esse status chegar com o estado pedido.
+"""
+import threading
+import time
+from collections import deque
+
+from metrics import LATENCY_BUCKETS, ConsoleLog
+
+# Latência de ida e volta de um comando (s): rede + ESP32 + broker
+RTT_BUCKETS = LATENCY_BUCKETS + (2.5, 5.0, 10.0, 30.0)
+
+
+class PendingCommand:
+    __slots__ = ("circuit", "on", "first_sent", "last_sent", "attempts", "next_retry", "escalated")
+
+    def __init__(self, circuit, on, now):
+        self.circuit = circuit
+        self.on = on
+        self.first_sent = self.last_sent = now
+        self.attempts = 1
+        self.next_retry = now
+        self.escalated = False
+
+
+class RelayDispatcher:
+    """
+    - Comando igual a um já pendente para o mesmo circuito é descartado (coalescido);
+      comando oposto (ou repetido depois de escalado) substitui o pendente.
+    - Sem confirmação em `ack_timeout` s, reenvia com espera crescente
+      (ack_timeout * backoff^n) até `max_retries` reenvios.
+    - Um desligamento não confirmado em `deadline_s` é escalado para
+      energy/control/emergency (SHUTDOWN) e sai dos pendentes para `escalated`: não é
+      mais reenviado nem conta como pendente, mas um status OFF atrasado ainda é
+      confirmado. Um comando de ligar não é escalado: passado o prazo ele é só dado
+      como falho.
+    - on_event(tipo, circuito, ligar?, detalhe) recebe "acked", "retry", "escalated" e "failed".
+    """
+
+    def __init__(self, publish, ack_timeout: float = 1.0, backoff: float = 2.0, max_retries: int = 3,
+                 deadline_s: float = 10.0, on_event=None, metrics=None, clock=time.monotonic,
+                 log=None):
+        self.publish = publish          # publish(tópico, payload)
+        self.ack_timeout = ack_timeout
+        self.backoff = backoff
+        self.max_retries = max_retries
+        self.deadline_s = deadline_s
+        self.on_event = on_event
+        self.clock = clock
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+
+        self.pending = {}               # circuito -> PendingCommand
+        self.escalated = {}             # circuito -> PendingCommand escalado, sem confirmação
+        self.rtts = deque(maxlen=1000)  # últimas latências de ida e volta (s)
+        self.last_rtt = {}              # circuito -> s
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        if metrics is not None:
+            self._h_rtt = metrics.histogram("relay_command_rtt_seconds",
+                                            "Comando de relé -> status confirmado", buckets=RTT_BUCKETS)
+            self._c = {r: metrics.counter("relay_commands_total", "Comandos de relé por resultado", result=r)
+                       for r in ("sent", "coalesced", "acked", "retry", "escalated", "failed")}
+            metrics.gauge("relay_commands_pending", lambda: len(self.pending), "Comandos aguardando confirmação")
+            metrics.gauge("relay_commands_escalated", lambda: len(self.escalated),
+                          "Desligamentos escalados ainda sem confirmação")
+        else:
+            self._h_rtt = None
+            self._c = None
+
+    # ------------------------- ciclo de vida -------------------------
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="relay-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+
+    # ------------------------- comandos -------------------------
+    def command(self, circuit: str, on: bool) -> bool:
+        """Envia ON/OFF para um circuito. Devolve False se foi coalescido com um pendente."""
+        now = self.clock()
+        with self._cond:
+            cmd = self.pending.get(circuit)
+            if cmd is not None and cmd.on == on:
+                self._count("coalesced")
+                return False
+            cmd = self._track(circuit, on, now)
+        self._send(cmd)
+        self._count("sent")
+        return True
+
+    def track(self, circuit: str, on: bool):
+        """Acompanha um comando já publicado por fora (ex.: corte da proteção rápida)."""
+        with self._cond:
+            self._track(circuit, on, self.clock())
+        self._count("sent")
+
+    def command_all(self, circuits, on: bool):
+        """Comando geral (energy/control/relay), acompanhado circuito a circuito."""
+        now = self.clock()
+        with self._cond:
+            for name in circuits:
+                self._track(name, on, now)
+        self.publish("energy/control/relay", "ON" if on else "OFF")
+        self._count("sent")
+
+    def acknowledge(self, circuit: str, relay_on: bool):
+        """Status do relé recebido do ESP32 (energy/relay/status/<cômodo>)."""
+        with self._cond:
+            cmd = self.pending.get(circuit) or self.escalated.get(circuit)
+            if cmd is None or cmd.on != relay_on:
+                return
+            if cmd.escalated:
+                del self.escalated[circuit]
+            else:
+                del self.pending[circuit]
+        rtt = self.clock() - cmd.first_sent
+        self.rtts.append(rtt)
+        self.last_rtt[circuit] = rtt
+        if self._h_rtt is not None:
+            self._h_rtt.observe(rtt)
+        self._count("acked")
+        self._emit("acked", cmd, rtt)
+
+    # ------------------------- internos -------------------------
+    def _track(self, circuit, on, now):
+        # chamado com o lock
+        self.escalated.pop(circuit, None)
+        cmd = self.pending[circuit] = PendingCommand(circuit, on, now)
+        cmd.next_retry = now + self.ack_timeout
+        self._cond.notify()
+        return cmd
+
+    def _send(self, cmd):
+        self.publish(f"energy/control/{cmd.circuit}", "ON" if cmd.on else "OFF")
+
+    def _count(self, result):
+        if self._c is not None:
+            self._c[result].inc()
+
+    def _emit(self, kind, cmd, detail=None):
+        if self.on_event is not None:
+            try:
+                self.on_event(kind, cmd.circuit, cmd.on, detail)
+            except Exception as e:
+                self.log(f"[RELÉ] Erro no callback de evento: {e}", key="relay")
+
+    def _due(self, now):
+        """Separa, sob o lock, o que precisa ser reenviado, escalado ou abandonado."""
+        retry, escalate, failed = [], [], []
+        for name, cmd in list(self.pending.items()):
+            if now - cmd.first_sent >= self.deadline_s:
+                del self.pending[name]
+                if cmd.on:
+                    failed.append(cmd)
+                else:
+                    cmd.escalated = True
+                    self.escalated[name] = cmd
+                    escalate.append(cmd)
+            elif now >= cmd.next_retry and cmd.attempts <= self.max_retries:
+                cmd.attempts += 1
+                cmd.last_sent = now
+                cmd.next_retry = now + self.ack_timeout * self.backoff ** (cmd.attempts - 1)
+                retry.append(cmd)
+        return retry, escalate, failed
+
+    def _next_wakeup(self, now):
+        t = now + self.ack_timeout
+        for cmd in self.pending.values():
+            if cmd.attempts <= self.max_retries:
+                t = min(t, cmd.next_retry)
+            t = min(t, cmd.first_sent + self.deadline_s)
+        return max(0.01, t - now)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = self.clock()
+                retry, escalate, failed = self._due(now)
+                if not (retry or escalate or failed):
+                    self._cond.wait(self._next_wakeup(now) if self.pending else None)
+                    continue
+            for cmd in retry:
+                self._send(cmd)
+                self._count("retry")
+                self._emit("retry", cmd, cmd.attempts)
+            if escalate:
+                self.publish("energy/control/emergency", "SHUTDOWN")
+                for cmd in escalate:
+                    self._count("escalated")
+                    self._emit("escalated", cmd)
+            for cmd in failed:
+                self._count("failed")
+                self._emit("failed", cmd)
@@ -0,0 +1,321 @@
+"""
+Relatórios do histórico: kWh por dia, pico de demanda, excursões de tensão e cortes,
+por circuito, exportados em CSV ou Parquet.
+
+As amostras brutas do SQLite são copiadas uma vez para arquivos colunares
+(<db>_colunas/<circuito>/<AAAA-MM>/<coluna>.npy) e lidas por mmap: cada mês de cada
+circuito é uma tarefa independente num pool de processos, que só toca as páginas das
+colunas que usa. Nas execuções seguintes só os meses com amostras novas são recopiados.
+
+Uso:
+    python report.py --from 2026-01 --to 2026-12 --out relatorio.csv
+    python report.py --db energia.db --circuits sala,cozinha --format parquet --out rel.parquet
+"""
+import argparse
+import calendar
+import concurrent.futures
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from alerts import AlertEngine, ROOM_LIMITS
+from storage import MAX_GAP_S
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:     # Parquet é opcional
+    pyarrow = None
+
+COLUMNS = (("ts", "<f8"), ("voltage", "<f4"), ("current", "<f4"), ("power", "<f4"), ("relay", "i1"))
+V_VALID = 50.0          # abaixo disso é canal sem leitura, não subtensão (como no ESP32)
+DEMAND_S = 900          # demanda: média de 15 min, como a concessionária mede
+
+FIELDS = ("circuito", "data", "amostras", "kwh", "pico_w", "pico_demanda_kw", "hora_pico_demanda",
+          "v_min", "v_max", "subtensoes", "sobretensoes", "min_fora_faixa", "cortes", "desligamentos")
+
+
+# ------------------------- arquivos colunares -------------------------
+def month_start(year: int, month: int) -> float:
+    return time.mktime((year, month, 1, 0, 0, 0, 0, 0, -1))
+
+
+def month_of(ts: float) -> tuple[int, int]:
+    lt = time.localtime(ts)
+    return lt.tm_year, lt.tm_mon
+
+
+def next_month(year: int, month: int) -> tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def load_columns(path: str) -> dict:
+    return {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name, _ in COLUMNS}
+
+
+def _export_month(conn, room, a, b, path, mark, chunk=200_000):
+    """Copia as amostras [a, b) de um circuito para `path`, trocando o diretório no fim. Devolve n."""
+    (n,) = conn.execute("SELECT COUNT(*) FROM samples WHERE room = ? AND ts >= ? AND ts < ?",
+                        (room, a, b)).fetchone()
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    cols = {name: open_memmap(os.path.join(tmp, name + ".npy"), mode="w+", dtype=dt, shape=(n,))
+            for name, dt in COLUMNS}
+    rec = np.dtype([(name, dt) for name, dt in COLUMNS])
+    cur = conn.execute("SELECT ts, voltage, current, power, relay FROM samples "
+                       "WHERE room = ? AND ts >= ? AND ts < ? ORDER BY ts", (room, a, b))
+    k = 0
+    while k < n:
+        rows = cur.fetchmany(chunk)
+        if not rows:
+            break
+        block = np.array(rows, dtype=rec)
+        for name, _ in COLUMNS:
+            cols[name][k:k + len(block)] = block[name]
+        k += len(block)
+    for col in cols.values():
+        col.flush()
+    del cols
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"n": k, "mark": list(mark)}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return k
+
+
+def sync_columns(db_path: str, root: str, rooms=None, first=None, last=None, resync=False,
+                 log=print) -> list:
+    """
+    Atualiza os arquivos colunares a partir do SQLite. A marca de cada mês vem das
+    agregações de 1 h (soma de n e última hora, ~720 linhas pela chave primária, sem
+    varrer as amostras); o mês só é recopiado quando ela muda (amostras novas ou
+    retroativas) ou com resync. Devolve [(circuito, (ano, mês), dir)].
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        if rooms is None:
+            rooms = [r for (r,) in conn.execute("SELECT DISTINCT room FROM rollups WHERE res = 3600 ORDER BY room")]
+        out = []
+        for room in rooms:
+            lo, hi = conn.execute("SELECT MIN(bucket), MAX(bucket) FROM rollups WHERE res = 3600 AND room = ?",
+                                  (room,)).fetchone()
+            if lo is None:
+                continue
+            ym, end = month_of(lo), month_of(hi + 3599)
+            if first is not None and ym < first:
+                ym = first
+            if last is not None and end > last:
+                end = last
+            while ym <= end:
+                a, b = month_start(*ym), month_start(*next_month(*ym))
+                # horas que tocam o mês (fuso com meia hora: a hora da virada conta nos dois)
+                mark = conn.execute("SELECT COALESCE(SUM(n), 0), MAX(bucket) FROM rollups "
+                                    "WHERE res = 3600 AND room = ? AND bucket > ? AND bucket < ?",
+                                    (room, a - 3600, b)).fetchone()
+                path = os.path.join(root, room, f"{ym[0]:04d}-{ym[1]:02d}")
+                if mark[1] is not None:
+                    meta = os.path.join(path, "meta.json")
+                    n = None
+                    if not resync and os.path.exists(meta):
+                        with open(meta) as f:
+                            m = json.load(f)
+                        if m.get("mark") == list(mark):
+                            n = m["n"]
+                    if n is None:
+                        t0 = time.perf_counter()
+                        n = _export_month(conn, room, a, b, path, mark)
+                        log(f"  {room} {ym[0]:04d}-{ym[1]:02d}: exportado em {time.perf_counter() - t0:.1f} s")
+                    if n:
+                        out.append((room, ym, path))
+                ym = next_month(*ym)
+        return out
+    finally:
+        conn.close()
+
+
+# ------------------------- agregação (nos processos) -------------------------
+def _edges(flag, has_prev):
+    """Entradas na condição; com has_prev o primeiro elemento é só o estado anterior."""
+    n = int(np.count_nonzero(flag[1:] & ~flag[:-1]))
+    if not has_prev and len(flag) and flag[0]:
+        n += 1
+    return n
+
+
+def month_report(room: str, ym: tuple, path: str, v_low: float, v_high: float, i_cutoff: float) -> list:
+    """Uma linha por dia com amostras. Roda num processo do pool."""
+    c = load_columns(path)
+    ts, v, i, p, relay = c["ts"], c["voltage"], c["current"], c["power"], c["relay"]
+    n = len(ts)
+    if n == 0:
+        return []
+    year, month = ym
+    days = calendar.monthrange(year, month)[1]
+    starts = [time.mktime((year, month, d, 0, 0, 0, 0, 0, -1)) for d in range(1, days + 2)]
+    bounds = np.searchsorted(ts, starts)
+
+    rows = []
+    for d in range(days):
+        a, b = int(bounds[d]), int(bounds[d + 1])
+        if a == b:
+            continue
+        a0 = max(a - 1, 0)                  # amostra anterior: estado na virada do dia
+        b1 = min(b + 1, n)                  # próxima: intervalo que fecha o dia
+
+        t = np.asarray(ts[a:b1])
+        pw = np.asarray(p[a:b1])
+        dt = np.diff(t)
+        dt[(dt <= 0) | (dt > MAX_GAP_S)] = 0.0
+        pe = np.where(np.asarray(relay[a:b1]) == 0, 0.0, pw)     # mesma regra de storage/energy
+        wh = (pe[:-1] + pe[1:]) * dt / 7200.0                       # trapézio
+
+        q = ((t[:-1] - starts[d]) * (1.0 / DEMAND_S)).astype(np.intp)     # >= 0: truncar = piso
+        demand = np.bincount(q, weights=wh)
+        k_peak = int(demand.argmax()) if len(demand) else 0
+        peak_kw = float(demand[k_peak]) * 3600.0 / DEMAND_S / 1000.0 if len(demand) else 0.0
+
+        vv = np.asarray(v[a0:b])
+        valid = vv > V_VALID
+        low = valid & (vv < v_low)
+        high = valid & (vv > v_high)
+        out = (low | high)[a - a0:]
+        vday, vmask = vv[a - a0:], valid[a - a0:]
+        has_v = bool(vmask.any())
+
+        r = np.asarray(relay[a0:b])
+        off = np.flatnonzero((r[:-1] == 1) & (r[1:] == 0))
+        cuts = np.count_nonzero(np.asarray(i[a0:b - 1])[off] > i_cutoff)
+
+        rows.append({
+            "circuito": room,
+            "data": f"{year:04d}-{month:02d}-{d + 1:02d}",
+            "amostras": b - a,
+            "kwh": round(float(wh.sum()) / 1000.0, 4),
+            "pico_w": round(float(pw[:b - a].max()), 1),
+            "pico_demanda_kw": round(peak_kw, 3),
+            "hora_pico_demanda": time.strftime("%H:%M", time.localtime(starts[d] + k_peak * DEMAND_S)),
+            "v_min": round(float(vday.min(where=vmask, initial=np.inf)), 1) if has_v else None,
+            "v_max": round(float(vday.max(where=vmask, initial=-np.inf)), 1) if has_v else None,
+            "subtensoes": _edges(low, a0 < a),
+            "sobretensoes": _edges(high, a0 < a),
+            "min_fora_faixa": round(float(dt[:len(out)][out[:len(dt)]].sum()) / 60.0, 1),
+            "cortes": int(cuts),
+            "desligamentos": len(off),
+        })
+    return rows
+
+
+def build_report(tasks, workers: int | None = None) -> list:
+    """tasks: [(circuito, (ano, mês), dir)]. Agrega em paralelo e devolve as linhas ordenadas."""
+    engine = AlertEngine(ROOM_LIMITS)
+    args = []
+    for room, ym, path in tasks:
+        lim = engine.limits(room)
+        args.append((room, ym, path, lim.v_low, lim.v_high, lim.i_cutoff))
+    rows = []
+    if workers == 1:
+        for a in args:
+            rows.extend(month_report(*a))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            for part in pool.map(month_report, *zip(*args)) if args else ():
+                rows.extend(part)
+    rows.sort(key=lambda r: (r["circuito"], r["data"]))
+    return rows
+
+
+# ------------------------- exportação -------------------------
+def write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def write_parquet(rows, path):
+    if pyarrow is None:
+        raise RuntimeError("pyarrow não instalado (pip install pyarrow)")
+    table = pyarrow.table({name: [r[name] for r in rows] for name in FIELDS})
+    pyarrow.parquet.write_table(table, path)
+
+
+def summarize(rows) -> list:
+    """Totais do período por circuito (para o console)."""
+    out = {}
+    for r in rows:
+        s = out.setdefault(r["circuito"], {"circuito": r["circuito"], "dias": 0, "kwh": 0.0, "pico_demanda_kw": 0.0,
+                                           "excursoes": 0, "cortes": 0})
+        s["dias"] += 1
+        s["kwh"] += r["kwh"]
+        s["pico_demanda_kw"] = max(s["pico_demanda_kw"], r["pico_demanda_kw"])
+        s["excursoes"] += r["subtensoes"] + r["sobretensoes"]
+        s["cortes"] += r["cortes"]
+    return list(out.values())
+
+
+def _month_arg(text):
+    try:
+        y, m = text.split("-")
+        return int(y), int(m)
+    except ValueError:
+        raise argparse.ArgumentTypeError("use AAAA-MM")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Relatórios do histórico de energia")
+    ap.add_argument("--db", default="energia.db")
+    ap.add_argument("--columns", default=None, help="diretório dos arquivos colunares (padrão: <db>_colunas)")
+    ap.add_argument("--from", dest="first", type=_month_arg, default=None, metavar="AAAA-MM")
+    ap.add_argument("--to", dest="last", type=_month_arg, default=None, metavar="AAAA-MM")
+    ap.add_argument("--circuits", default=None, help="lista separada por vírgulas (padrão: todos)")
+    ap.add_argument("--out", default="relatorio.csv")
+    ap.add_argument("--format", choices=("csv", "parquet"), default=None,
+                    help="padrão: pela extensão de --out")
+    ap.add_argument("--workers", type=int, default=None, help="processos (padrão: nº de CPUs)")
+    ap.add_argument("--no-sync", action="store_true", help="usa os arquivos colunares como estão")
+    ap.add_argument("--resync", action="store_true", help="recopia todos os meses do SQLite")
+    args = ap.parse_args(argv)
+
+    root = args.columns or os.path.splitext(args.db)[0] + "_colunas"
+    rooms = args.circuits.split(",") if args.circuits else None
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+
+    t0 = time.perf_counter()
+    if args.no_sync:
+        tasks = []
+        for room in sorted(rooms or os.listdir(root)):
+            for name in sorted(os.listdir(os.path.join(root, room))):
+                ym = _month_arg(name)
+                if (args.first is None or ym >= args.first) and (args.last is None or ym <= args.last):
+                    tasks.append((room, ym, os.path.join(root, room, name)))
+    else:
+        if not os.path.exists(args.db):
+            print(f"Banco não encontrado: {args.db}")
+            return 1
+        print(f"Atualizando arquivos colunares em {root}...")
+        tasks = sync_columns(args.db, root, rooms, args.first, args.last, args.resync)
+    t1 = time.perf_counter()
+
+    rows = build_report(tasks, args.workers)
+    t2 = time.perf_counter()
+    (write_parquet if fmt == "parquet" else write_csv)(rows, args.out)
+
+    n = sum(r["amostras"] for r in rows)
+    print(f"{len(rows)} linhas ({n:,} amostras, {len(tasks)} meses-circuito) -> {args.out}")
+    print(f"  sincronização {t1 - t0:.1f} s, agregação {t2 - t1:.1f} s")
+    for s in summarize(rows):
+        print(f"  {s['circuito']:<16} {s['dias']:>4} dias  {s['kwh']:10.2f} kWh  pico {s['pico_demanda_kw']:6.2f} kW  "
+              f"excursões {s['excursoes']:>4}  cortes {s['cortes']:>3}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
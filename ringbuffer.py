@@ -0,0 +1,121 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+# Bits de falha (coluna "faults")
+FAULT_CURRENT = 0x01   # falha_corrente
+FAULT_VOLTAGE = 0x02   # falha_tensao
+
+# (nome da coluna, typecode do array)
+COLUMNS = (
+    ("timestamp", "d"),   # time.time() do host
+    ("voltage", "f"),
+    ("current", "f"),
+    ("power", "f"),
+    ("relay", "b"),       # 1 = carga ligada, 0 = desligada, -1 = desconhecido
+    ("faults", "B"),      # FAULT_CURRENT | FAULT_VOLTAGE
+)
+
+
+class RoomBuffer:
+    """
+    Buffer circular colunar (um array de tipo fixo por coluna) para as leituras de um cômodo.
+
+    Cada valor é gravado duas vezes (posição i e i + capacity). Assim as últimas N
+    amostras sempre formam um trecho contíguo do array e podem ser devolvidas como
+    memoryview, sem cópia, mesmo depois de o buffer dar a volta.
+
+    Validade: um memoryview das últimas n amostras continua intacto por capacity - n
+    appends; depois disso a cópia de baixo começa a sobrescrever o início dele. Por isso
+    trechos com menos de `copy_margin` appends de folga (janela quase do tamanho do
+    buffer) são devolvidos como cópia. Quem guarda um view além de copy_margin appends
+    (~copy_margin / taxa de amostras segundos) precisa copiar.
+
+    Memória por amostra: 2 x (8 + 4 + 4 + 4 + 1 + 1) = 44 bytes
+    (contra ~1,5 kB de um dict com o JSON decodificado do ESP32).
+    Com a capacidade padrão de 36 000 amostras (5 h a 2 Hz) são ~1,5 MB por cômodo.
+    """
+
+    def __init__(self, capacity: int = 36000, copy_margin: int | None = None):
+        if capacity <= 0:
+            raise ValueError("capacity deve ser > 0")
+        self.capacity = capacity
+        self.copy_margin = max(1, capacity // 10) if copy_margin is None else copy_margin
+        self._cols = {name: array(code, bytes(array(code).itemsize * 2 * capacity))
+                      for name, code in COLUMNS}
+        self._views = {name: memoryview(col) for name, col in self._cols.items()}
+        self._next = 0      # próxima posição de escrita (0..capacity-1)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    # ----------------------------- escrita -----------------------------
+    def append(self, timestamp: float, voltage: float, current: float, power: float,
+               relay: int = -1, faults: int = 0):
+        with self._lock:
+            i = self._next
+            j = i + self.capacity
+            c = self._cols
+            c["timestamp"][i] = c["timestamp"][j] = timestamp
+            c["voltage"][i] = c["voltage"][j] = voltage
+            c["current"][i] = c["current"][j] = current
+            c["power"][i] = c["power"][j] = power
+            c["relay"][i] = c["relay"][j] = relay
+            c["faults"][i] = c["faults"][j] = faults
+            self._next = i + 1 if i + 1 < self.capacity else 0
+            if self._count < self.capacity:
+                self._count += 1
+
+    # ----------------------------- leitura -----------------------------
+    def __len__(self):
+        return self._count
+
+    def _span(self, n: int) -> tuple[int, int]:
+        n = min(n, self._count)
+        end = self._next + self.capacity
+        return end - n, end
+
+    def _slice(self, name: str, start: int, end: int) -> memoryview:
+        # chamado com o lock; perto da capacidade o view seria sobrescrito logo: copia
+        if end - start > self.capacity - self.copy_margin:
+            return memoryview(self._cols[name][start:end])
+        return self._views[name][start:end]
+
+    def last(self, n: int) -> dict:
+        """Últimas n amostras como {coluna: memoryview} (sem cópia, salvo perto da capacidade)."""
+        with self._lock:
+            start, end = self._span(n)
+            return {name: self._slice(name, start, end) for name in self._views}
+
+    def column(self, name: str, n: int | None = None) -> memoryview:
+        with self._lock:
+            start, end = self._span(self._count if n is None else n)
+            return self._slice(name, start, end)
+
+    def since(self, t0: float) -> dict:
+        """Amostras com timestamp >= t0 (timestamps de chegada são crescentes)."""
+        with self._lock:
+            start, end = self._span(self._count)
+            ts = self._views["timestamp"]
+            k = bisect_left(ts, t0, start, end)
+            return {name: self._slice(name, k, end) for name in self._views}
+
+    def latest(self, name: str, default=None):
+        with self._lock:
+            if not self._count:
+                return default
+            return self._cols[name][self._next + self.capacity - 1]
+
+    def oldest(self, name: str, default=None):
+        with self._lock:
+            if not self._count:
+                return default
+            return self._cols[name][self._next + self.capacity - self._count]
+
+    # ----------------------------- memória -----------------------------
+    @staticmethod
+    def bytes_per_sample() -> int:
+        return 2 * sum(array(code).itemsize for _, code in COLUMNS)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.itemsize * len(col) for col in self._cols.values())
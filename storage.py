@@ -0,0 +1,388 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import ConsoleLog
+
+# Resoluções das agregações (segundos)
+ROLLUP_RESOLUTIONS = (1, 60, 3600)
+
+# Intervalo máximo entre duas amostras considerado na integração de energia.
+# Acima disso (broker fora, ESP32 desligado) o trecho não é contabilizado.
+# A regra é a mesma de energy.EnergyAccumulator: trapézio, relé desligado conta 0 W.
+MAX_GAP_S = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    room    TEXT    NOT NULL,
+    ts      REAL    NOT NULL,
+    voltage REAL,
+    current REAL,
+    power   REAL,
+    relay   INTEGER,
+    faults  INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_samples_room_ts ON samples(room, ts);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    res       INTEGER NOT NULL,
+    room      TEXT    NOT NULL,
+    bucket    REAL    NOT NULL,
+    n         INTEGER NOT NULL,
+    v_min REAL, v_max REAL, v_mean REAL,
+    i_min REAL, i_max REAL, i_mean REAL,
+    p_min REAL, p_max REAL, p_mean REAL,
+    energy_wh REAL,
+    PRIMARY KEY (res, room, bucket)
+) WITHOUT ROWID;
+"""
+
+# Agregações refeitas a partir das amostras brutas depois de um preenchimento retroativo.
+# A energia usa a amostra anterior em ordem de tempo (LAG), como _update_rollups faz ao vivo.
+_RECOMPUTE = """
+WITH r AS (
+    SELECT ts, voltage AS v, current AS i, power AS p, CASE WHEN relay = 0 THEN 0.0 ELSE power END AS e
+    FROM samples WHERE room = ? AND ts >= ? AND ts < ?),
+s AS (SELECT *, LAG(ts) OVER w AS pts, LAG(e) OVER w AS pe FROM r WINDOW w AS (ORDER BY ts))
+SELECT ?, ?, CAST(ts / ? AS INTEGER) * ? AS b, COUNT(*), MIN(v), MAX(v), AVG(v), MIN(i), MAX(i), AVG(i),
+       MIN(p), MAX(p), AVG(p),
+       SUM(CASE WHEN ts - pts > 0 AND ts - pts <= ? THEN (pe + e) * (ts - pts) / 7200.0 ELSE 0 END)
+FROM s WHERE ts >= ? GROUP BY b
+"""
+
+ROLLUP_FIELDS = ("bucket", "n", "v_min", "v_max", "v_mean", "i_min", "i_max", "i_mean",
+                 "p_min", "p_max", "p_mean", "energy_wh")
+
+
+class _Bucket:
+    """Acumulador de um intervalo (1 s / 1 min / 1 h) de um cômodo."""
+
+    __slots__ = ("start", "n", "v_min", "v_max", "v_sum", "i_min", "i_max", "i_sum",
+                 "p_min", "p_max", "p_sum", "energy_wh")
+
+    def __init__(self, start, v, i, p):
+        self.start = start
+        self.n = 1
+        self.v_min = self.v_max = self.v_sum = v
+        self.i_min = self.i_max = self.i_sum = i
+        self.p_min = self.p_max = self.p_sum = p
+        self.energy_wh = 0.0
+
+    @classmethod
+    def from_row(cls, row):
+        """Reabre um bucket a partir da linha gravada (res, room, bucket, n, ...)."""
+        (_, _, start, n, v_min, v_max, v_mean, i_min, i_max, i_mean, p_min, p_max, p_mean, energy) = row
+        b = cls.__new__(cls)
+        b.start, b.n, b.energy_wh = start, n, energy
+        b.v_min, b.v_max, b.v_sum = v_min, v_max, v_mean * n
+        b.i_min, b.i_max, b.i_sum = i_min, i_max, i_mean * n
+        b.p_min, b.p_max, b.p_sum = p_min, p_max, p_mean * n
+        return b
+
+    def add(self, v, i, p):
+        self.n += 1
+        self.v_sum += v
+        self.i_sum += i
+        self.p_sum += p
+        if v < self.v_min: self.v_min = v
+        if v > self.v_max: self.v_max = v
+        if i < self.i_min: self.i_min = i
+        if i > self.i_max: self.i_max = i
+        if p < self.p_min: self.p_min = p
+        if p > self.p_max: self.p_max = p
+
+    def row(self, res, room):
+        n = self.n
+        return (res, room, self.start, n,
+                self.v_min, self.v_max, self.v_sum / n,
+                self.i_min, self.i_max, self.i_sum / n,
+                self.p_min, self.p_max, self.p_sum / n,
+                self.energy_wh)
+
+
+class _Backfill:
+    __slots__ = ("room", "rows")
+
+    def __init__(self, room, rows):
+        self.room = room
+        self.rows = rows
+
+
+class TimeSeriesStore:
+    """
+    Histórico persistente em SQLite (modo WAL).
+
+    add() só enfileira; uma thread de escrita grava em lotes (uma transação por lote)
+    e mantém as agregações de 1 s, 1 min e 1 h por cômodo durante a ingestão.
+    Consultas longas usam as agregações e nunca varrem as amostras brutas.
+
+    add() espera amostras em ordem de tempo por cômodo. Amostras antigas (lote
+    reenviado depois de uma queda) vão por add_backfill(): as agregações do trecho
+    são refeitas a partir das amostras brutas.
+    """
+
+    def __init__(self, path: str = "energia.db", batch_size: int = 2000,
+                 flush_interval: float = 1.0, keep_raw: bool = True, log=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.keep_raw = keep_raw
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+
+        self._queue = queue.Queue()
+        self._open = {}     # (res, room) -> _Bucket aberto
+        self._last = {}     # room -> (ts, potência efetiva) da última amostra (energia)
+        self._resumed = set()   # cômodos já retomados do banco desde que o gravador abriu
+        self._dirty = False
+        self.written = 0
+
+        self._read_conn = self._connect()
+        self._read_conn.executescript(SCHEMA)
+        self._read_lock = threading.Lock()
+
+        self._running = True
+        self._writer = threading.Thread(target=self._write_loop, name="ts-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ----------------------------- ingestão -----------------------------
+    def add(self, room: str, ts: float, voltage: float, current: float, power: float,
+            relay: int = -1, faults: int = 0):
+        self._queue.put((room, ts, voltage, current, power, relay, faults))
+
+    def add_backfill(self, room: str, rows):
+        """rows: [(ts, voltage, current, power, relay, faults)] fora da sequência ao vivo."""
+        if rows:
+            self._queue.put(_Backfill(room, sorted(rows)))
+
+    def pending(self) -> int:
+        """Amostras ainda na fila do gravador."""
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = 5.0):
+        """Bloqueia até tudo que foi enfileirado até agora estar gravado."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._writer.join(10.0)
+        self._read_conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        raw, rollups = [], []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ()
+
+            if item is None or isinstance(item, threading.Event):
+                self._write_batch(conn, raw, rollups, final=item is None)
+                raw, rollups = [], []
+                deadline = time.monotonic() + self.flush_interval
+                if item is None:
+                    break
+                item.set()
+                continue
+
+            if isinstance(item, _Backfill):
+                self._write_batch(conn, raw, rollups)
+                raw, rollups = [], []
+                self._write_backfill(conn, item)
+                continue
+
+            if item:
+                if self.keep_raw:
+                    raw.append(item)
+                if item[0] not in self._resumed:
+                    self._resume(conn, item[0], item[1])
+                self._update_rollups(item, rollups)
+
+            if len(raw) >= self.batch_size or time.monotonic() >= deadline:
+                self._write_batch(conn, raw, rollups)
+                raw, rollups = [], []
+                deadline = time.monotonic() + self.flush_interval
+        conn.close()
+
+    def _resume(self, conn, room, ts):
+        """
+        Primeira amostra do cômodo desde que o gravador abriu (reinício do monitor):
+        reabre os buckets que já estão no banco, senão o INSERT OR REPLACE do bucket
+        novo apagaria o que foi gravado antes, e continua a energia da última amostra.
+        """
+        self._resumed.add(room)
+        try:
+            for res in ROLLUP_RESOLUTIONS:
+                if (res, room) in self._open:
+                    continue
+                row = conn.execute("SELECT * FROM rollups WHERE res = ? AND room = ? AND bucket = ?",
+                                   (res, room, ts - (ts % res))).fetchone()
+                if row is not None:
+                    self._open[(res, room)] = _Bucket.from_row(row)
+            if room not in self._last and self.keep_raw:
+                row = conn.execute("SELECT ts, power, relay FROM samples WHERE room = ? AND ts <= ? "
+                                   "ORDER BY ts DESC LIMIT 1", (room, ts)).fetchone()
+                if row is not None:
+                    self._last[room] = (row[0], 0.0 if row[2] == 0 else row[1])
+        except sqlite3.Error as e:
+            self.log(f"[STORE] Erro ao retomar {room}: {e}", key="store")
+
+    def _update_rollups(self, item, out):
+        room, ts, v, i, p, relay = item[:6]
+        self._dirty = True
+        e = 0.0 if relay == 0 else p
+        prev = self._last.get(room)
+        self._last[room] = (ts, e)
+        energy = 0.0
+        if prev is not None:
+            dt = ts - prev[0]
+            if 0 < dt <= MAX_GAP_S:
+                energy = (prev[1] + e) * dt / 7200.0   # Wh (trapézio)
+
+        for res in ROLLUP_RESOLUTIONS:
+            start = ts - (ts % res)
+            key = (res, room)
+            b = self._open.get(key)
+            if b is None or b.start != start:
+                if b is not None:
+                    out.append(b.row(res, room))
+                b = self._open[key] = _Bucket(start, v, i, p)
+            else:
+                b.add(v, i, p)
+            b.energy_wh += energy
+
+    def _write_batch(self, conn, raw, rollups, final=False):
+        # buckets ainda abertos também são gravados (e sobrescritos no próximo lote),
+        # assim as consultas enxergam a hora/minuto corrente
+        if self._dirty:
+            rollups.extend(b.row(res, room) for (res, room), b in self._open.items())
+            self._dirty = False
+        if final:
+            self._open.clear()
+        if not raw and not rollups:
+            return
+        try:
+            with conn:
+                if raw:
+                    conn.executemany("INSERT INTO samples VALUES (?,?,?,?,?,?,?)", raw)
+                if rollups:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO rollups VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)", rollups)
+            self.written += len(raw)
+        except sqlite3.Error as e:
+            self.log(f"[STORE] Erro ao gravar lote: {e}", key="store")
+
+    def _write_backfill(self, conn, item):
+        room, rows = item.room, item.rows
+        # a energia da primeira amostra ao vivo depois do trecho depende da última do trecho
+        t_min, t_max = rows[0][0], rows[-1][0] + MAX_GAP_S
+        try:
+            with conn:
+                if self.keep_raw:
+                    conn.executemany("INSERT INTO samples VALUES (?,?,?,?,?,?,?)",
+                                     [(room,) + tuple(r) for r in rows])
+                for res in ROLLUP_RESOLUTIONS:
+                    lo = t_min - (t_min % res)
+                    hi = t_max - (t_max % res) + res
+                    if self.keep_raw:
+                        out = conn.execute(_RECOMPUTE, (room, lo - MAX_GAP_S, hi, res, room, res, res,
+                                                        MAX_GAP_S, lo)).fetchall()
+                    else:
+                        out = self._merge_rows(conn, res, room, rows)
+                    conn.executemany("INSERT OR REPLACE INTO rollups VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)", out)
+                    # o bucket aberto da ingestão ao vivo continua a partir do valor refeito
+                    b = self._open.get((res, room))
+                    if b is not None and lo <= b.start < hi:
+                        for row in out:
+                            if row[2] == b.start:
+                                self._open[(res, room)] = _Bucket.from_row(row)
+            self.written += len(rows) if self.keep_raw else 0
+        except sqlite3.Error as e:
+            self.log(f"[STORE] Erro ao gravar preenchimento retroativo: {e}", key="store")
+
+    def _merge_rows(self, conn, res, room, rows):
+        # sem amostras brutas: soma as leituras aos buckets existentes (a energia do trecho não é refeita)
+        merged = {}
+        for ts, v, i, p, *_ in rows:
+            start = ts - (ts % res)
+            b = merged.get(start)
+            if b is None:
+                old = self._open.get((res, room))
+                if old is None or old.start != start:
+                    row = conn.execute("SELECT * FROM rollups WHERE res = ? AND room = ? AND bucket = ?",
+                                       (res, room, start)).fetchone()
+                    old = _Bucket.from_row(row) if row is not None else None
+                if old is None:
+                    merged[start] = _Bucket(start, v, i, p)
+                    continue
+                b = merged[start] = old
+            b.add(v, i, p)
+        return [b.row(res, room) for b in merged.values()]
+
+    # ----------------------------- consultas -----------------------------
+    @staticmethod
+    def pick_resolution(span_s: float) -> int:
+        """0 = amostras brutas; senão a resolução da agregação em segundos."""
+        if span_s > 7 * 86400:
+            return 3600
+        if span_s > 6 * 3600:
+            return 60
+        if span_s > 600:
+            return 1
+        return 0
+
+    def query(self, room: str, t0: float, t1: float, resolution: int | None = None) -> list:
+        """
+        Resolução 0 -> [(ts, voltage, current, power, relay, faults), ...]
+        Resolução 1/60/3600 -> [(bucket, n, v_min, v_max, v_mean, ..., energy_wh), ...]
+        """
+        if resolution is None:
+            resolution = self.pick_resolution(t1 - t0)
+        with self._read_lock:
+            if resolution == 0:
+                cur = self._read_conn.execute(
+                    "SELECT ts, voltage, current, power, relay, faults FROM samples "
+                    "WHERE room = ? AND ts >= ? AND ts < ? ORDER BY ts", (room, t0, t1))
+            else:
+                cur = self._read_conn.execute(
+                    f"SELECT {', '.join(ROLLUP_FIELDS)} FROM rollups "
+                    "WHERE res = ? AND room = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                    (resolution, room, t0, t1))
+            return cur.fetchall()
+
+    def energy_wh(self, room: str, t0: float, t1: float) -> float:
+        """Energia no intervalo: buckets de 1 h no miolo, 1 min e 1 s nas bordas."""
+        with self._read_lock:
+            return self._energy(room, t0, t1, (3600, 60, 1))
+
+    def _energy(self, room, a, b, levels):
+        if b <= a or not levels:
+            return 0.0
+        res = levels[0]
+        lo = a + (-a % res)
+        hi = b - (b % res)
+        if hi <= lo:
+            return self._energy(room, a, b, levels[1:])
+        (e,) = self._read_conn.execute(
+            "SELECT COALESCE(SUM(energy_wh), 0) FROM rollups "
+            "WHERE res = ? AND room = ? AND bucket >= ? AND bucket < ?",
+            (res, room, lo, hi)).fetchone()
+        return e + self._energy(room, a, lo, levels[1:]) + self._energy(room, hi, b, levels[1:])
+
+    def rooms(self) -> list[str]:
+        with self._read_lock:
+            return [r for (r,) in self._read_conn.execute(
+                "SELECT DISTINCT room FROM rollups WHERE res = 3600 ORDER BY room")]
@@ -0,0 +1,63 @@
+"""Caminho rápido de proteção: limite de latência, um OFF por corte e rearme com histerese."""
+import time
+
+from monitor_core import EnergyMonitorCore
+from protection import ProtectionFastPath
+
+CUTOFF_A = 10.0
+BOUND_S = EnergyMonitorCore.PROTECTION_BOUND_MS / 1000.0
+
+
+def reading(current: float) -> bytes:
+    return (b'{"comodo":"sala","tensao":127.0,"corrente":%.3f,"timestamp":1,"relay_estado":true,'
+            b'"canal_tensao":0,"pino_corrente":32,"falha_corrente":false,"falha_tensao":false}' % current)
+
+
+def fast_path(i_hyst: float = 0.05):
+    published = []
+    prot = ProtectionFastPath(lambda topic, payload: published.append((topic, payload, time.perf_counter())),
+                              lambda circuit: CUTOFF_A, i_hyst=i_hyst)
+    return prot, published
+
+
+def test_trip_latency_within_bound():
+    prot, published = fast_path()
+    arrivals = []
+    for k in range(200):
+        t = time.perf_counter()
+        assert prot.check(f"energy/room/c{k}", reading(25.0), t)
+        arrivals.append(t)
+    assert len(published) == 200
+    worst = max(t_pub - t for (_, _, t_pub), t in zip(published, arrivals))
+    assert worst < BOUND_S, f"chegada->OFF {worst * 1000:.3f} ms > {EnergyMonitorCore.PROTECTION_BOUND_MS} ms"
+
+
+def test_one_off_per_trip():
+    prot, published = fast_path()
+    for current in (2.0, 12.0, 15.0, 30.0, 11.0):
+        prot.check("energy/room/sala", reading(current), time.perf_counter())
+    assert [(topic, payload) for topic, payload, _ in published] == [("energy/control/sala", "OFF")]
+    assert prot.tripped("sala")
+
+
+def test_hysteresis_rearms():
+    prot, published = fast_path(i_hyst=0.05)
+    now = time.perf_counter
+    assert prot.check("energy/room/sala", reading(12.0), now())
+    # entre o rearme (9,5 A) e o corte (10 A): continua disparado, sem novo OFF
+    assert not prot.check("energy/room/sala", reading(9.8), now())
+    assert prot.tripped("sala")
+    assert not prot.check("energy/room/sala", reading(12.0), now())
+    # abaixo do rearme: volta a armar e um novo excesso corta de novo
+    assert not prot.check("energy/room/sala", reading(9.0), now())
+    assert not prot.tripped("sala")
+    assert prot.check("energy/room/sala", reading(12.0), now())
+    assert len(published) == 2
+
+
+def test_batches_and_other_circuits_unaffected():
+    prot, published = fast_path()
+    assert not prot.check("energy/room/sala/batch", reading(50.0), time.perf_counter())
+    assert prot.check("energy/room/sala", reading(50.0), time.perf_counter())
+    assert prot.check("energy/room/quarto", reading(50.0), time.perf_counter())
+    assert [topic for topic, _, _ in published] == ["energy/control/sala", "energy/control/quarto"]
@@ -0,0 +1,111 @@
+"""
+Modelo de tela com marcação do que mudou (dirty tracking).
+
+Workers e timers gravam valores já formatados por chave; a thread do Tk chama take()
+uma vez por quadro e recebe só as chaves cujo valor difere do que está na tela.
+Várias mudanças da mesma chave dentro de um quadro viram uma só operação de widget,
+e um valor que vai e volta (A -> B -> A) não gera operação nenhuma.
+
+Não importa tkinter: o mesmo modelo é usado pelo benchmark sem janela.
+"""
+import threading
+
+_MISSING = object()
+
+
+class ViewModel:
+    def __init__(self):
+        self._values = {}           # chave -> último valor gravado
+        self._shown = {}            # chave -> valor que está no widget
+        self._dirty = {}            # chaves alteradas desde o último take() (dict mantém a ordem)
+        self._lock = threading.Lock()
+        self.writes = 0             # set() recebidos
+        self.changes = 0            # valores entregues por take() (= operações de widget)
+
+    def set(self, key, value) -> bool:
+        with self._lock:
+            self.writes += 1
+            if self._values.get(key, _MISSING) == value:
+                return False
+            self._values[key] = value
+            self._dirty[key] = None
+            return True
+
+    def update(self, items) -> int:
+        """set() de vários pares (chave, valor) com uma só aquisição do lock."""
+        changed = 0
+        with self._lock:
+            for key, value in items:
+                self.writes += 1
+                if self._values.get(key, _MISSING) != value:
+                    self._values[key] = value
+                    self._dirty[key] = None
+                    changed += 1
+        return changed
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def mark_shown(self, key, value):
+        """O widget acabou de ser criado já mostrando `value`."""
+        with self._lock:
+            self._values[key] = self._shown[key] = value
+            self._dirty.pop(key, None)
+
+    def take(self) -> dict:
+        """Chaves cujo valor difere do que está na tela; passam a contar como exibidas."""
+        with self._lock:
+            if not self._dirty:
+                return {}
+            dirty, self._dirty = self._dirty, {}
+            out = {}
+            for key in dirty:
+                value = self._values[key]
+                if self._shown.get(key, _MISSING) != value:
+                    self._shown[key] = out[key] = value
+            self.changes += len(out)
+        return out
+
+
+class DashboardView(ViewModel):
+    """
+    Chaves do painel:
+      ("custo", cômodo, coluna)  texto da célula (coluna 1..6 da tabela de custos)
+      ("total", nome)            texto dos totais (potencia, custo_hora, custo_dia, custo_mes)
+      ("rele", cômodo)           True/False
+      ("potencia",)              texto do indicador de potência atual
+      ("cor_potencia",)          cor do indicador
+    """
+
+    def refresh_costs(self, circuits, now: float) -> int:
+        items = []
+        total_power = total_cost_hour = total_cost_day = total_cost_month = 0.0
+        for circuit in circuits:
+            acc = circuit.energy
+            if acc.last_ts is None:
+                continue
+            cost_hour = acc.cost_per_hour(now)
+            total_power += acc.last_power
+            total_cost_hour += cost_hour
+            total_cost_day += acc.day_cost
+            total_cost_month += acc.month_cost
+            cells = (f"{acc.last_power:.1f}", f"{cost_hour:.4f}", f"{acc.day_kwh:.3f}", f"{acc.day_cost:.2f}",
+                     f"{acc.month_kwh:.2f}", f"{acc.month_cost:.2f}")
+            items.extend((("custo", circuit.name, col), text) for col, text in enumerate(cells, 1))
+        items += [(("total", "potencia"), f"Potência Total: {total_power:.1f} W"),
+                  (("total", "custo_hora"), f"Custo por Hora: R$ {total_cost_hour:.4f}"),
+                  (("total", "custo_dia"), f"Custo Hoje: R$ {total_cost_day:.2f}"),
+                  (("total", "custo_mes"), f"Custo no Mês: R$ {total_cost_month:.2f}")]
+        return self.update(items)
+
+    def refresh_relays(self, circuits) -> int:
+        return self.update((("rele", c.name), c.relay_on) for c in circuits)
+
+    def set_power(self, watts: float):
+        if watts >= 1000:
+            color = "red"
+        elif watts >= 200:
+            color = "orange"
+        else:
+            color = "green"
+        self.update(((("potencia",), f"{watts:.1f} W"), (("cor_potencia",), color)))
@@ -0,0 +1,279 @@
+"""
+Análise de forma de onda: RMS verdadeiro, potências ativa/reativa/aparente,
+fator de potência medido e distorção harmônica, a partir dos bursts de ADC
+publicados em energy/room/<cômodo>/waveform (formato em decoders.py).
+
+Os bursts são agrupados por tamanho e analisados em bloco (uma FFT 2D por grupo).
+O ESP32 lê tensão (via multiplexador) e corrente alternadamente, então a corrente
+vem atrasada de `atraso_i`; o atraso é compensado na fase de cada bin da FFT.
+"""
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from decoders import decode_waveform
+from metrics import ConsoleLog
+
+FUNDAMENTAL_RANGE = (45.0, 65.0)     # Hz; rede de 60 Hz (aceita 50 Hz também)
+HARMONICS = 25
+
+
+class PowerQuality:
+    __slots__ = ("ts", "freq", "vrms", "irms", "p", "q", "s", "pf", "dpf", "thd_v", "thd_i")
+
+    def __init__(self, ts, freq, vrms, irms, p, q, s, pf, dpf, thd_v, thd_i):
+        self.ts = ts
+        self.freq = freq        # Hz (fundamental)
+        self.vrms = vrms        # V (RMS verdadeiro)
+        self.irms = irms        # A
+        self.p = p              # W  (ativa)
+        self.q = q              # var (reativa da fundamental; > 0 indutiva)
+        self.s = s              # VA (aparente, Vrms * Irms)
+        self.pf = pf            # P / S (inclui o efeito das harmônicas)
+        self.dpf = dpf          # cos(φ) da fundamental
+        self.thd_v = thd_v      # fração (0.05 = 5 %)
+        self.thd_i = thd_i
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"PowerQuality(f={self.freq:.2f} Hz, V={self.vrms:.1f}, I={self.irms:.3f}, P={self.p:.1f} W, "
+                f"Q={self.q:.1f} var, S={self.s:.1f} VA, FP={self.pf:.3f}, THDv={self.thd_v:.1%}, "
+                f"THDi={self.thd_i:.1%})")
+
+
+def analyze_block(v, i, fs, skew, harmonics: int = HARMONICS) -> dict:
+    """
+    v, i: matrizes (bursts × n) em volts e ampères; fs, skew: vetores por burst.
+    Devolve um dict de vetores (um valor por burst).
+
+    Fundamental, reativa e harmônicas usam janela de Hann e somam ±2 bins em torno de
+    cada pico, porque o burst raramente tem um número inteiro de ciclos. RMS e potência
+    ativa são médias no tempo só sobre o maior número inteiro de ciclos do burst (pela
+    fundamental estimada); sobre o burst inteiro o ciclo partido erra ~1 %.
+    """
+    v = v - v.mean(axis=1, keepdims=True)
+    i = i - i.mean(axis=1, keepdims=True)
+    m, n = v.shape
+    nb = n // 2 + 1
+    k = np.arange(nb)
+    freqs = k[None, :] * (fs[:, None] / n)
+    # corrente lida `skew` s depois da tensão: volta a fase de cada bin
+    shift = np.exp(-2j * np.pi * freqs * skew[:, None])
+
+    # Parseval para sinais reais: bins internos contam em dobro
+    w = np.full(nb, 2.0)
+    w[0] = 1.0
+    if n % 2 == 0:
+        w[-1] = 1.0
+    n2 = float(n) * n
+
+    hann = np.hanning(n)
+    norm = n2 * (hann ** 2).mean()
+    Vw = np.fft.rfft(v * hann, axis=1)
+    Iw = np.fft.rfft(i * hann, axis=1) * shift
+    vv = w * (Vw.real ** 2 + Vw.imag ** 2)
+    ii = w * (Iw.real ** 2 + Iw.imag ** 2)
+    rows = np.arange(m)[:, None]
+
+    # fundamental: pico da tensão na faixa da rede, refinado pelos 3 bins em torno dele
+    # (estimador próprio da janela de Hann: 2 (a2 - a0) / (a0 + 2 a1 + a2))
+    lo, hi = FUNDAMENTAL_RANGE
+    k1 = np.where((freqs >= lo) & (freqs <= hi), vv, -1.0).argmax(axis=1).clip(1, nb - 2)
+    a0, a1, a2 = (np.sqrt(vv[np.arange(m), k1 + d] / w[k1 + d]) for d in (-1, 0, 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = np.nan_to_num(2 * (a2 - a0) / (a0 + 2 * a1 + a2)).clip(-1.0, 1.0)
+    k1f = k1 + delta
+
+    # RMS e P sobre ciclos inteiros: k1f é o número de ciclos no burst; a amostra em
+    # que o último ciclo fecha entra com peso fracionário
+    cycles = np.floor(k1f)
+    span = np.where(cycles >= 1, cycles * n / k1f, n).clip(1, n)
+    mask = (span[:, None] - np.arange(n)[None, :]).clip(0.0, 1.0)
+    i_s = np.fft.irfft(np.fft.rfft(i, axis=1) * shift, n, axis=1)
+    vc = v - (v * mask).sum(axis=1, keepdims=True) / span[:, None]
+    ic = i_s - (i_s * mask).sum(axis=1, keepdims=True) / span[:, None]
+    vrms = np.sqrt((vc * vc * mask).sum(axis=1) / span)
+    irms = np.sqrt((ic * ic * mask).sum(axis=1) / span)
+    p = (vc * ic * mask).sum(axis=1) / span
+    s = vrms * irms
+
+    # energia de cada harmônica (bin central ± 2)
+    h = np.arange(1, harmonics + 1)
+    kh = np.rint(k1f[:, None] * h[None, :]).astype(np.intp)
+    valid = kh + 2 < nb
+    near = (np.where(valid, kh, 0)[:, :, None] + np.arange(-2, 3)).clip(0, nb - 1)
+    ev = np.where(valid, vv[rows[:, :, None], near].sum(axis=2), 0.0)
+    ei = np.where(valid, ii[rows[:, :, None], near].sum(axis=2), 0.0)
+
+    # potência da fundamental (ativa e reativa) pelo espectro cruzado com janela
+    vi1 = (w * Vw * Iw.conj())[rows, near[:, 0, :]].sum(axis=1) / norm
+    p1, q = vi1.real, vi1.imag
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        thd_v = np.sqrt(ev[:, 1:].sum(axis=1) / ev[:, 0])
+        thd_i = np.sqrt(ei[:, 1:].sum(axis=1) / ei[:, 0])
+        pf = np.where(s > 0, p / s, 0.0)
+        dpf = np.where(np.hypot(p1, q) > 0, p1 / np.hypot(p1, q), 0.0)
+
+    return {"freq": k1f * fs / n, "vrms": vrms, "irms": irms, "p": p, "q": q, "s": s, "pf": pf,
+            "dpf": dpf, "thd_v": np.nan_to_num(thd_v), "thd_i": np.nan_to_num(thd_i)}
+
+
+def analyze_payloads(items) -> list:
+    """
+    items: [(circuito, ts, payload), ...]. Roda no pool (thread ou processo):
+    decodifica, agrupa por tamanho e analisa cada grupo em bloco.
+    Devolve [(circuito, ts, dict de floats | None se inválido), ...].
+    """
+    groups = {}
+    out = []
+    for circuit, ts, payload in items:
+        try:
+            burst = decode_waveform(payload)
+        except (ValueError, TypeError):
+            out.append((circuit, ts, None))
+            continue
+        groups.setdefault(len(burst.v_counts), []).append((circuit, ts, burst))
+    for n, group in groups.items():
+        if n < 16:
+            out.extend((c, ts, None) for c, ts, _ in group)
+            continue
+        v = np.empty((len(group), n))
+        i = np.empty((len(group), n))
+        for row, (_, _, b) in enumerate(group):
+            v[row] = np.frombuffer(b.v_counts, dtype="<u2")
+            v[row] *= b.v_gain
+            i[row] = np.frombuffer(b.i_counts, dtype="<u2")
+            i[row] *= b.i_gain
+        fs = np.array([b.sample_rate for _, _, b in group])
+        skew = np.array([b.skew_s for _, _, b in group])
+        res = analyze_block(v, i, fs, skew)
+        for row, (c, ts, _) in enumerate(group):
+            out.append((c, ts, {key: float(val[row]) for key, val in res.items()}))
+    return out
+
+
+class WaveformAnalyzer:
+    """
+    Recebe bursts no worker de ingestão (submit só enfileira) e analisa em lotes num
+    pool de `workers` processos (ou threads), sem segurar a ingestão.
+
+    A cada `batch_interval` s os bursts pendentes são divididos entre os workers.
+    Com mais de `max_pending` bursts esperando, os mais antigos são descartados.
+    on_result(circuito, PowerQuality) é chamado na thread de coleta do pool.
+    """
+
+    def __init__(self, on_result, workers: int = 2, processes: bool = True, batch_interval: float = 0.05,
+                 max_pending: int = 2000, metrics=None, log=None):
+        self.on_result = on_result
+        self.workers = max(1, workers)
+        self.processes = processes
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending
+        self.log = log or ConsoleLog().log     # log(linha, key=...) limitado por segundo
+        self.analyzed = 0
+        self.invalid = 0
+        self.dropped = 0
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pool = None
+        self._thread = None
+        self._running = False
+
+        if metrics is not None:
+            self._h_batch = metrics.histogram("waveform_batch_seconds", "Análise de um lote de bursts",
+                                              buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                                       0.5, 1.0))
+            self._c_bursts = metrics.counter("waveform_bursts_total", "Bursts de forma de onda analisados")
+            metrics.gauge("waveform_pending", lambda: len(self._pending), "Bursts aguardando análise")
+        else:
+            self._h_batch = self._c_bursts = None
+
+    # ------------------------- ciclo de vida -------------------------
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._batch_loop, name="waveform-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self):
+        # criado no primeiro burst: quem não usa forma de onda não paga os processos
+        if self._pool is None:
+            if self.processes:
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="waveform")
+        return self._pool
+
+    # ------------------------- entrada -------------------------
+    def submit(self, circuit: str, payload: bytes, ts: float | None = None):
+        with self._lock:
+            self._pending.append((circuit, time.time() if ts is None else ts, bytes(payload)))
+            if len(self._pending) > self.max_pending:
+                excess = len(self._pending) - self.max_pending
+                del self._pending[:excess]
+                self.dropped += excess
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera os bursts enfileirados até agora serem analisados (benchmark)."""
+        target = self.analyzed + self.invalid + len(self._pending)
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        while self.analyzed + self.invalid + self.dropped < target:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    # ------------------------- lotes -------------------------
+    def _batch_loop(self):
+        while self._running:
+            self._wake.wait(self.batch_interval)
+            self._wake.clear()
+            with self._lock:
+                items, self._pending = self._pending, []
+            if not items:
+                continue
+            pool = self._get_pool()
+            size = -(-len(items) // self.workers)
+            for start in range(0, len(items), size):
+                fut = pool.submit(analyze_payloads, items[start:start + size])
+                fut.add_done_callback(self._make_done(time.perf_counter()))
+
+    def _make_done(self, t0):
+        def done(fut):
+            try:
+                results = fut.result()
+            except Exception as e:
+                self.log(f"[FORMA DE ONDA] Erro na análise: {e}", key="waveform")
+                return
+            if self._h_batch is not None:
+                self._h_batch.observe(time.perf_counter() - t0)
+            for circuit, ts, r in results:
+                if r is None:
+                    self.invalid += 1
+                    continue
+                self.analyzed += 1
+                if self._c_bursts is not None:
+                    self._c_bursts.inc()
+                self.on_result(circuit, PowerQuality(ts=ts, **r))
+        return done